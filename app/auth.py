@@ -1,15 +1,20 @@
 from __future__ import annotations
 
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from hashlib import sha256
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 import jwt
 from jwt import PyJWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
-from . import schemas
+from src.timing import stage
+
+from . import metrics, schemas
 from .config import settings
 
 ALGORITHM = "HS256"
@@ -36,6 +41,100 @@ def _load_fake_user_store() -> Dict[str, Dict[str, str]]:
 
 _USER_STORE = _load_fake_user_store()
 
+TOKEN_CACHE_REQUESTS = metrics.REGISTRY.counter(
+    "pricepilot_auth_token_cache_requests_total",
+    "Verified-token cache lookups by result.",
+    ("result",),
+)
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of already verified tokens keyed by their SHA-256 digest.
+
+    Entries expire together with the token's ``exp`` claim, and the whole cache
+    is flushed when ``settings.secret_key`` changes, so rotating the key revokes
+    every cached token. Each flush starts a new generation: a caller records
+    ``generation()`` before verifying and passes it to ``put``, so a result
+    verified against a key that rotated away in the meantime is not cached.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, Tuple[schemas.User, float]]" = OrderedDict()
+        self._secret_key = settings.secret_key
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _check_secret(self) -> None:
+        if self._secret_key != settings.secret_key:
+            self._entries.clear()
+            self._secret_key = settings.secret_key
+            self._generation += 1
+
+    def generation(self) -> int:
+        with self._lock:
+            self._check_secret()
+            return self._generation
+
+    def get(self, token: str) -> Optional[schemas.User]:
+        if self.maxsize <= 0:
+            return None
+        digest = sha256(token.encode("utf-8")).digest()
+        with self._lock:
+            self._check_secret()
+            entry = self._entries.get(digest)
+            if entry is None:
+                TOKEN_CACHE_REQUESTS.inc(result="miss")
+                return None
+            user, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[digest]
+                TOKEN_CACHE_REQUESTS.inc(result="expired")
+                return None
+            self._entries.move_to_end(digest)
+        TOKEN_CACHE_REQUESTS.inc(result="hit")
+        return user
+
+    def put(self, token: str, user: schemas.User, expires_at: float, generation: int) -> None:
+        if self.maxsize <= 0:
+            return
+        digest = sha256(token.encode("utf-8")).digest()
+        with self._lock:
+            self._check_secret()
+            if generation != self._generation:
+                # Flushed while the token was being verified; the result may be stale
+                return
+            self._entries[digest] = (user, expires_at)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_TOKEN_CACHE = VerifiedTokenCache(settings.auth_token_cache_size)
+
+
+def clear_token_cache() -> None:
+    """Drop every cached verification result (e.g. after revoking tokens)."""
+    _TOKEN_CACHE.clear()
+
+
+def _token_cache_collector():
+    yield "# HELP pricepilot_auth_token_cache_entries Tokens currently held in the verified-token cache."
+    yield "# TYPE pricepilot_auth_token_cache_entries gauge"
+    yield f"pricepilot_auth_token_cache_entries {len(_TOKEN_CACHE)}"
+
+
+metrics.REGISTRY.register_collector(_token_cache_collector)
+
 
 def authenticate_user(username: str, password: str) -> Optional[schemas.User]:
     normalized = _normalize_identifier(username)
@@ -59,6 +158,26 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 
 def get_current_user(token: str = Depends(oauth2_scheme)) -> schemas.User:
+    with stage("auth"):
+        return _resolve_user(token)
+
+
+def is_admin(user: schemas.User) -> bool:
+    return _normalize_identifier(user.email) in settings.admin_emails
+
+
+def get_admin_user(user: schemas.User = Depends(get_current_user)) -> schemas.User:
+    if not is_admin(user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return user
+
+
+def _resolve_user(token: str) -> schemas.User:
+    cached = _TOKEN_CACHE.get(token)
+    if cached is not None:
+        return cached
+    generation = _TOKEN_CACHE.generation()
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -76,4 +195,8 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> schemas.User:
     record = _USER_STORE.get(normalized)
     if not record:
         raise credentials_exception
-    return schemas.User(email=record["email"])
+    user = schemas.User(email=record["email"])
+    expires_at = payload.get("exp")
+    if isinstance(expires_at, (int, float)):
+        _TOKEN_CACHE.put(token, user, float(expires_at), generation)
+    return user
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BoundedWorker:
+    """
+    Daemon thread that drains a bounded queue in batches.
+
+    ``submit`` never blocks: when the queue is full the item is dropped and
+    counted, so request handlers only pay for a ``put_nowait``.
+
+    ``tick``, if given, is called on the worker thread whenever the queue stays
+    empty for ``tick_interval`` seconds, for time-based housekeeping that must
+    also happen without traffic.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[List[Any]], None],
+        maxsize: int = 10_000,
+        max_batch: int = 256,
+        tick: Optional[Callable[[], None]] = None,
+        tick_interval: float = 1.0,
+    ) -> None:
+        self.name = name
+        self.handler = handler
+        self.max_batch = max_batch
+        self.tick = tick
+        self.tick_interval = tick_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def submit(self, item: Any) -> bool:
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Process what is already queued, then stop the thread."""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout=timeout)
+
+    def _next(self) -> Any:
+        if self.tick is None:
+            return self._queue.get()
+        while True:
+            try:
+                return self._queue.get(timeout=self.tick_interval)
+            except queue.Empty:
+                try:
+                    self.tick()
+                except Exception as exc:
+                    logger.warning("Background worker %s tick failed: %s", self.name, exc, exc_info=True)
+
+    def _run(self) -> None:
+        while True:
+            item = self._next()
+            batch = []
+            while item is not _STOP:
+                batch.append(item)
+                if len(batch) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self.handler(batch)
+                    self.processed += len(batch)
+                except Exception as exc:
+                    self.errors += len(batch)
+                    logger.warning("Background worker %s failed: %s", self.name, exc, exc_info=True)
+            if item is _STOP:
+                return
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+WORKERS: Dict[str, BoundedWorker] = {}
+
+
+def register(worker: BoundedWorker) -> BoundedWorker:
+    WORKERS[worker.name] = worker
+    return worker
+
+
+def stop_all(timeout: float = 5.0) -> None:
+    for worker in list(WORKERS.values()):
+        worker.stop(timeout)
+
+
+def _workers_collector():
+    if not WORKERS:
+        return
+    rows = [(name, worker.stats()) for name, worker in sorted(WORKERS.items())]
+    yield "# HELP pricepilot_background_queue_depth Items waiting in a background worker queue."
+    yield "# TYPE pricepilot_background_queue_depth gauge"
+    for name, state in rows:
+        yield f'pricepilot_background_queue_depth{{worker="{name}"}} {state["queued"]}'
+    yield "# HELP pricepilot_background_items_total Background items by outcome."
+    yield "# TYPE pricepilot_background_items_total counter"
+    for name, state in rows:
+        for outcome in ("processed", "dropped", "errors"):
+            yield f'pricepilot_background_items_total{{worker="{name}",outcome="{outcome}"}} {state[outcome]}'
+
+
+metrics.REGISTRY.register_collector(_workers_collector)
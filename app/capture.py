@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from src.atomic_write import atomic_open
+
+from . import background, schemas
+from .config import settings
+
+
+def compress_segment(closed: Path) -> Path:
+    """Gzip a closed segment next to it and remove the original."""
+    compressed = Path(f"{closed}.gz")
+    with closed.open("rb") as source, atomic_open(compressed, "wb") as raw:
+        with gzip.GzipFile(filename=closed.name, mode="wb", fileobj=raw) as target:
+            shutil.copyfileobj(source, target)
+    closed.unlink()
+    return compressed
+
+
+def _compress_segments(paths: List[Path]) -> None:
+    for path in paths:
+        compress_segment(path)
+
+
+class SegmentWriter:
+    """
+    Appends JSONL lines to an active segment and rotates it by size or age.
+
+    Closed segments are renamed with a timestamp and gzipped next to the
+    active file: ``requests.jsonl`` -> ``requests-20250101-120000.jsonl.gz``.
+    ``compressor`` receives each closed segment to gzip on another thread;
+    without it the segment is compressed inline.
+
+    Not thread-safe: ``write``, ``tick`` and ``close`` are called from one thread.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int,
+        max_age_seconds: float,
+        compress: bool = True,
+        compressor: Optional[Callable[[Path], Any]] = None,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.compress = compress
+        self.compressor = compressor
+        self._handle = None
+        self._opened_at = 0.0
+        self.segments_closed = 0
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._handle = self.path.open("a", encoding="utf-8")
+        self._opened_at = time.monotonic()
+
+    def _due(self) -> bool:
+        if self._handle is None:
+            return False
+        size = self._handle.tell()
+        if size == 0:
+            return False
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        return bool(self.max_age_seconds) and time.monotonic() - self._opened_at >= self.max_age_seconds
+
+    def _closed_name(self) -> Path:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        candidate = self.path.with_name(f"{self.path.stem}-{stamp}{self.path.suffix}")
+        counter = 1
+        while candidate.exists() or Path(f"{candidate}.gz").exists():
+            candidate = self.path.with_name(f"{self.path.stem}-{stamp}-{counter}{self.path.suffix}")
+            counter += 1
+        return candidate
+
+    def rotate(self) -> Optional[Path]:
+        if self._handle is None:
+            return None
+        self._handle.close()
+        self._handle = None
+        closed = self._closed_name()
+        os.replace(self.path, closed)
+        self.segments_closed += 1
+        if not self.compress:
+            return closed
+        if self.compressor is not None:
+            self.compressor(closed)
+            return closed
+        return compress_segment(closed)
+
+    def tick(self) -> None:
+        """Rotate by age without waiting for the next write, so idle segments are closed too."""
+        if self._due():
+            self.rotate()
+
+    def write(self, lines: List[str]) -> None:
+        if self._due():
+            self.rotate()
+        if self._handle is None:
+            self._open()
+        self._handle.write("".join(lines))
+        self._handle.flush()
+
+    def close(self) -> None:
+        """Close the active segment; a non-empty one is rotated rather than left for the next start."""
+        if self._handle is None:
+            return
+        if self._handle.tell() > 0:
+            self.rotate()
+        else:
+            self._handle.close()
+            self._handle = None
+
+
+def _summarize(response: Optional[schemas.ModelResponse], latency_s: float) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {"latency_ms": round(latency_s * 1000.0, 3)}
+    if response is not None:
+        optimal = response.optimal_price
+        summary.update(
+            optimal_price=optimal.price,
+            probability_percent=optimal.probability_percent,
+            expected_value=optimal.expected_value,
+            zone_id=optimal.zone_id,
+            model_version=response.analysis.model_version,
+        )
+    return summary
+
+
+class RequestCapture:
+    """
+    Opt-in capture of pricing requests and response summaries to JSONL.
+
+    ``record`` only enqueues; serialization and file I/O happen on a
+    background worker, and records are dropped when its queue is full. The
+    worker also checks the segment's age once a second while idle. Closed
+    segments are gzipped by a second worker, so compression never holds up
+    writing.
+    """
+
+    def __init__(self, writer: SegmentWriter, queue_size: int) -> None:
+        self.writer = writer
+        self.compressor: Optional[background.BoundedWorker] = None
+        if writer.compress and writer.compressor is None:
+            self.compressor = background.register(
+                background.BoundedWorker("capture-compress", _compress_segments, maxsize=64, max_batch=1)
+            )
+            writer.compressor = self.compressor.submit
+        self.worker = background.register(
+            background.BoundedWorker(
+                "capture", self._write_batch, maxsize=queue_size, max_batch=512, tick=writer.tick
+            )
+        )
+
+    def record(
+        self,
+        order: schemas.OrderRequest,
+        response: Optional[schemas.ModelResponse],
+        latency_s: float,
+        error: Optional[str] = None,
+    ) -> bool:
+        return self.worker.submit((time.time(), order, response, latency_s, error))
+
+    def _write_batch(self, batch: List[Any]) -> None:
+        lines = []
+        for timestamp, order, response, latency_s, error in batch:
+            record: Dict[str, Any] = {
+                "ts": datetime.fromtimestamp(timestamp).isoformat(timespec="milliseconds"),
+                "order": order.model_dump(mode="json", exclude_none=True),
+                "response": _summarize(response, latency_s),
+            }
+            if error is not None:
+                record["error"] = error
+            lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+        self.writer.write(lines)
+
+    def close(self, timeout: float = 30.0) -> None:
+        """Flush queued records, rotate the active segment and wait for its compression."""
+        self.worker.stop()
+        self.writer.close()
+        if self.compressor is not None:
+            self.compressor.stop(timeout)
+
+
+_capture: Optional[RequestCapture] = None
+
+
+def get_capture() -> Optional[RequestCapture]:
+    """Shared capture instance, or None when CAPTURE_ENABLED is off."""
+    global _capture
+    if not settings.capture_enabled:
+        return None
+    if _capture is None:
+        writer = SegmentWriter(
+            Path(settings.capture_path),
+            max_bytes=settings.capture_max_bytes,
+            max_age_seconds=settings.capture_rotate_seconds,
+        )
+        _capture = RequestCapture(writer, settings.capture_queue_size)
+    return _capture
+
+
+def shutdown() -> None:
+    global _capture
+    if _capture is not None:
+        _capture.close()
+        _capture = None
@@ -23,6 +23,7 @@ def _env_bool(key: str, default: bool) -> bool:
 class Settings:
     secret_key: str = os.getenv("SECRET_KEY", "super-secret-key")
     access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+    auth_token_cache_size: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "1024"))
     test_user_email: str = os.getenv("TEST_USER_EMAIL", "demo@example.com")
     test_user_password: str = os.getenv("TEST_USER_PASSWORD", "demo")
     cors_allow_origins: List[str] = field(
@@ -39,6 +40,37 @@ class Settings:
     ml_module_path: str = os.getenv("PRICING_ML_MODULE", "src.recommend_price").strip()
     ml_callable_name: str = os.getenv("PRICING_ML_CALLABLE", "recommend_price").strip()
     ml_allow_stub_fallback: bool = _env_bool("PRICING_ML_ALLOW_STUB_FALLBACK", False)
+    fast_path_enabled: bool = _env_bool("PRICING_FAST_PATH_ENABLED", True)
+    fast_callable_name: str = os.getenv("PRICING_FAST_CALLABLE", "recommend_price_fast").strip()
+    fast_path_max_inflight: int = int(os.getenv("PRICING_FAST_PATH_MAX_INFLIGHT", "0"))
+    coalesce_enabled: bool = _env_bool("PRICING_COALESCE_ENABLED", True)
+    default_deadline_ms: float = float(os.getenv("PRICING_DEFAULT_DEADLINE_MS", "0"))
+    rate_limit_rps: float = float(os.getenv("RATE_LIMIT_RPS", "0"))
+    rate_limit_burst: float = float(os.getenv("RATE_LIMIT_BURST", "20"))
+    rate_limit_max_clients: int = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+    metrics_enabled: bool = _env_bool("METRICS_ENABLED", True)
+    timing_header_enabled: bool = _env_bool("TIMING_HEADER_ENABLED", False)
+    model_dir: str = os.getenv("MODEL_DIR", "models")
+    model_watch_interval: float = float(os.getenv("MODEL_WATCH_INTERVAL", "30"))
+    segment_model_cache_mb: float = float(os.getenv("SEGMENT_MODEL_CACHE_MB", "256"))
+    history_snapshot_interval: float = float(os.getenv("HISTORY_SNAPSHOT_INTERVAL", "60"))
+    outcomes_tail_path: str = os.getenv("OUTCOMES_TAIL_PATH", "").strip()
+    drift_monitor_enabled: bool = _env_bool("DRIFT_MONITOR_ENABLED", True)
+    drift_window_seconds: float = float(os.getenv("DRIFT_WINDOW_SECONDS", "3600"))
+    drift_queue_size: int = int(os.getenv("DRIFT_QUEUE_SIZE", "10000"))
+    shadow_model_version: str = os.getenv("SHADOW_MODEL_VERSION", "").strip()
+    shadow_sample_rate: float = float(os.getenv("SHADOW_SAMPLE_RATE", "0.05"))
+    shadow_queue_size: int = int(os.getenv("SHADOW_QUEUE_SIZE", "64"))
+    capture_enabled: bool = _env_bool("CAPTURE_ENABLED", False)
+    capture_path: str = os.getenv("CAPTURE_PATH", "capture/requests.jsonl")
+    capture_max_bytes: int = int(os.getenv("CAPTURE_MAX_BYTES", str(64 * 1024 * 1024)))
+    capture_rotate_seconds: float = float(os.getenv("CAPTURE_ROTATE_SECONDS", "3600"))
+    capture_queue_size: int = int(os.getenv("CAPTURE_QUEUE_SIZE", "10000"))
+    admin_emails: List[str] = field(
+        default_factory=lambda: [
+            item.strip().lower() for item in os.getenv("ADMIN_EMAILS", "").split(",") if item.strip()
+        ]
+    )
 
 
 settings = Settings()
@@ -1,22 +1,22 @@
 from __future__ import annotations
 
-import json
 import os
 from pathlib import Path
+from time import perf_counter
+from typing import Optional
 
-from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi import BackgroundTasks, Depends, FastAPI, Header, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response
 from fastapi.security import OAuth2PasswordRequestForm
 
-from . import auth, schemas, services
+from . import auth, background, capture, metrics, profiler, ratelimit, schemas, services, webui
 from .config import settings
 
 WEBUI_DIR = Path(__file__).resolve().parent.parent / "webui"
 WEBUI_STATIC_DIR = WEBUI_DIR / "static"
 WEBUI_INDEX_FILE = WEBUI_DIR / "templates" / "index.html"
-CONFIG_PLACEHOLDER = "<!--__WEBUI_CONFIG__-->"
 
 
 def ensure_history_cache(force_rebuild: bool = False) -> None:
@@ -66,6 +66,85 @@ def ensure_history_cache(force_rebuild: bool = False) -> None:
         print("[WARN] Будут использоваться средние значения.")
 
 
+def start_model_store() -> None:
+    """
+    Загружает и прогревает активную версию модели до приёма трафика,
+    запускает слежение за MODEL_DIR/CURRENT, задаёт бюджет памяти моделей сегментов
+    и загружает теневого кандидата (SHADOW_MODEL_VERSION).
+    """
+    try:
+        store = services.get_model_store()
+    except Exception as e:
+        print(f"[WARN] ML-модуль не загружен, хранилище моделей недоступно: {e}")
+        return
+    if store is None:
+        return
+
+    store.configure(models_dir=settings.model_dir)
+    try:
+        store.reload()
+    except Exception as e:
+        print(f"[WARN] Не удалось загрузить модель при старте: {e}")
+    store.start_watching(settings.model_watch_interval)
+
+    router = services.get_segment_router()
+    if router is not None:
+        router.configure(
+            max_bytes=int(settings.segment_model_cache_mb * 1024 * 1024),
+            refresh_interval=settings.model_watch_interval if settings.model_watch_interval > 0 else None,
+        )
+
+    scorer = services.get_shadow_scorer()
+    if scorer is not None:
+        scorer.configure(sample_rate=settings.shadow_sample_rate)
+        if settings.shadow_model_version:
+            try:
+                scorer.load_candidate(settings.shadow_model_version)
+                print(f"[MODEL] Теневой кандидат: {settings.shadow_model_version}")
+            except Exception as e:
+                print(f"[WARN] Не удалось загрузить теневого кандидата {settings.shadow_model_version}: {e}")
+
+
+def start_history_ingest() -> None:
+    """
+    Загружает историю в память и запускает фоновые снимки
+    (и чтение OUTCOMES_TAIL_PATH, если задан).
+    """
+    try:
+        store = services.get_history_store()
+    except Exception as e:
+        print(f"[WARN] ML-модуль не загружен, онлайн-история недоступна: {e}")
+        return
+    if store is None:
+        return
+
+    store.ensure_loaded()
+    store.start_background(
+        settings.history_snapshot_interval,
+        tail_path=settings.outcomes_tail_path or None,
+    )
+
+
+def _require_model_store():
+    store = services.get_model_store()
+    if store is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="ML module does not expose a model store",
+        )
+    return store
+
+
+def _require_shadow_scorer():
+    scorer = services.get_shadow_scorer()
+    if scorer is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="ML module does not expose a shadow scorer",
+        )
+    return scorer
+
+
 def create_app() -> FastAPI:
     application = FastAPI(
         title="Pricing Recommendation API",
@@ -80,8 +159,13 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
-    if WEBUI_STATIC_DIR.exists():
-        application.mount("/assets", StaticFiles(directory=WEBUI_STATIC_DIR), name="webui-assets")
+    if settings.metrics_enabled:
+        application.add_middleware(
+            metrics.TimingMiddleware,
+            timing_header=settings.timing_header_enabled,
+        )
+
+    webui_bundle = webui.WebUIBundle(WEBUI_STATIC_DIR, WEBUI_INDEX_FILE)
 
     @application.on_event("startup")
     async def startup_event():
@@ -93,12 +177,33 @@ def create_app() -> FastAPI:
         print("ЗАПУСК API PRICEPILOT")
         print("="*70)
         ensure_history_cache()
+        start_history_ingest()
+        start_model_store()
+        services.preload_handlers()
+        webui_bundle.build()
         print("="*70 + "\n")
 
+    @application.on_event("shutdown")
+    async def shutdown_event():
+        store = services.loaded_model_store()
+        if store is not None:
+            store.stop_watching()
+        history = services.loaded_history_store()
+        if history is not None:
+            history.stop_background()
+        capture.shutdown()
+        background.stop_all()
+
     @application.get("/health", tags=["health"])
     async def health_check() -> dict[str, str]:
         return {"status": "ok"}
 
+    @application.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint() -> Response:
+        if not settings.metrics_enabled:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics disabled")
+        return Response(metrics.render_latest(), media_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
     @application.post(
         "/auth/token",
         response_model=schemas.Token,
@@ -123,39 +228,175 @@ def create_app() -> FastAPI:
     )
     async def price_recommendation(
         order: schemas.OrderRequest,
-        _current_user: schemas.User = Depends(auth.get_current_user),
+        background_tasks: BackgroundTasks,
+        current_user: schemas.User = Depends(ratelimit.rate_limited_user),
+        pricing_mode: Optional[str] = Header(None, alias="X-Pricing-Mode"),
+        deadline_ms: Optional[float] = Header(None, alias="X-Deadline-Ms", gt=0, le=60000),
+        profile_request: bool = Header(False, alias="X-Profile"),
     ) -> schemas.ModelResponse:
+        if profile_request and not auth.is_admin(current_user):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+        recorder = capture.get_capture()
+        started = perf_counter()
         try:
-            return await services.call_pricing_model(order)
+            response = await services.call_pricing_model(
+                order,
+                fast=(pricing_mode or "").lower() == "fast",
+                deadline_ms=deadline_ms,
+                profile=profile_request,
+                background_tasks=background_tasks,
+            )
         except Exception as exc:  # pragma: no cover - defensive until real integration
+            if recorder is not None:
+                recorder.record(order, None, perf_counter() - started, error=str(exc))
             raise HTTPException(
                 status_code=status.HTTP_502_BAD_GATEWAY,
                 detail=f"Failed to retrieve recommendation: {exc}",
             ) from exc
+        if recorder is not None:
+            recorder.record(order, response, perf_counter() - started)
+        return response
+
+    @application.post(
+        "/api/v1/outcomes",
+        response_model=schemas.OutcomeIngestResult,
+        tags=["history"],
+    )
+    async def ingest_outcomes(
+        batch: schemas.OutcomeBatch,
+        _current_user: schemas.User = Depends(auth.get_current_user),
+    ) -> schemas.OutcomeIngestResult:
+        store = services.get_history_store()
+        if store is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="ML module does not expose a history store",
+            )
+        # O(1) per outcome: applied inline, files are written by the background snapshot.
+        accepted = store.record_outcomes([outcome.model_dump() for outcome in batch.outcomes])
+        state = store.status()
+        return schemas.OutcomeIngestResult(
+            accepted=accepted,
+            users=state["users"],
+            drivers=state["drivers"],
+            pending_snapshot=state["pending"],
+        )
 
-    @application.get("/", include_in_schema=False, response_class=HTMLResponse)
-    async def serve_frontend() -> HTMLResponse:
-        if not WEBUI_INDEX_FILE.exists():
+    @application.get("/admin/models", response_model=schemas.ModelStoreStatus, tags=["admin"])
+    async def model_status(
+        _admin: schemas.User = Depends(auth.get_admin_user),
+    ) -> schemas.ModelStoreStatus:
+        router = services.get_segment_router()
+        return schemas.ModelStoreStatus(
+            **_require_model_store().status(),
+            segments=router.status() if router is not None else None,
+        )
+
+    @application.post("/admin/models/reload", response_model=schemas.ModelReloadResult, tags=["admin"])
+    async def reload_model(
+        request: Optional[schemas.ModelReloadRequest] = None,
+        _admin: schemas.User = Depends(auth.get_admin_user),
+    ) -> schemas.ModelReloadResult:
+        store = _require_model_store()
+        request = request or schemas.ModelReloadRequest()
+        # Loading, parity check and warm-up run off the event loop; traffic keeps
+        # using the current version until the atomic swap at the end.
+        try:
+            result = await run_in_threadpool(store.reload, request.version, request.force)
+        except FileNotFoundError as exc:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+        except Exception as exc:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Web UI index file not found",
+                detail=f"Model reload failed: {exc}",
+            ) from exc
+        return schemas.ModelReloadResult(**result)
+
+    @application.get("/admin/shadow", response_model=schemas.ShadowStatus, tags=["admin"])
+    async def shadow_status(
+        _admin: schemas.User = Depends(auth.get_admin_user),
+    ) -> schemas.ShadowStatus:
+        return schemas.ShadowStatus(**_require_shadow_scorer().status())
+
+    @application.post("/admin/shadow", response_model=schemas.ShadowStatus, tags=["admin"])
+    async def configure_shadow(
+        request: schemas.ShadowConfigRequest,
+        _admin: schemas.User = Depends(auth.get_admin_user),
+    ) -> schemas.ShadowStatus:
+        scorer = _require_shadow_scorer()
+        scorer.configure(sample_rate=request.sample_rate)
+        if "version" in request.model_fields_set:
+            # Loading and the smoke test run off the event loop, like /admin/models/reload
+            try:
+                await run_in_threadpool(scorer.load_candidate, request.version)
+            except FileNotFoundError as exc:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+            except ValueError as exc:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+            except Exception as exc:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Shadow candidate load failed: {exc}",
+                ) from exc
+        return schemas.ShadowStatus(**scorer.status())
+
+    @application.get("/admin/drift", response_model=schemas.DriftReport, tags=["admin"])
+    async def drift_report(
+        _admin: schemas.User = Depends(auth.get_admin_user),
+    ) -> schemas.DriftReport:
+        monitor = services.get_drift_monitor()
+        if monitor is None or not settings.drift_monitor_enabled:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Drift monitor disabled")
+        return schemas.DriftReport(**monitor.report())
+
+    @application.get("/admin/profile", response_class=PlainTextResponse, tags=["admin"])
+    async def sample_profile(
+        seconds: float = Query(5.0, gt=0, le=profiler.MAX_SAMPLE_SECONDS),
+        interval_ms: float = Query(profiler.DEFAULT_INTERVAL_MS, ge=1, le=1000),
+        _admin: schemas.User = Depends(auth.get_admin_user),
+    ) -> PlainTextResponse:
+        # The sampler sleeps between samples in a worker thread; the event loop keeps serving
+        try:
+            result = await run_in_threadpool(profiler.SAMPLER.sample, seconds, interval_ms / 1000.0)
+        except profiler.ProfilerBusy as exc:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+        return PlainTextResponse(
+            profiler.collapsed(result["stacks"]),
+            headers={"X-Profile-Samples": str(result["samples"])},
+        )
+
+    @application.get("/admin/profile/request", response_class=PlainTextResponse, tags=["admin"])
+    async def request_profile(
+        _admin: schemas.User = Depends(auth.get_admin_user),
+    ) -> PlainTextResponse:
+        captured = profiler.last_request_profile()
+        if captured is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No request has been profiled yet (send X-Profile: true)",
             )
+        return PlainTextResponse(
+            captured["report"], headers={"X-Profile-Captured-At": captured["captured_at"]}
+        )
+
+    @application.api_route("/assets/{asset_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+    async def serve_asset(asset_path: str, request: Request) -> Response:
+        response = webui_bundle.serve_asset(request, asset_path)
+        if response is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+        return response
 
-        raw_html = WEBUI_INDEX_FILE.read_text(encoding="utf-8")
-        config_payload = {
-            "backendBase": settings.webui_backend_base,
-            "tokenPath": settings.webui_token_path,
-            "pricingPath": settings.webui_pricing_path,
-            "username": settings.webui_username,
-            "password": settings.webui_password,
-            "includeCredentials": settings.webui_include_credentials,
-        }
-        config_script = f"<script>window.__WEBUI_CONFIG__ = {json.dumps(config_payload)};</script>"
-        if CONFIG_PLACEHOLDER in raw_html:
-            rendered_html = raw_html.replace(CONFIG_PLACEHOLDER, config_script, 1)
-        else:
-            rendered_html = raw_html.replace("</head>", f"{config_script}</head>", 1)
-        return HTMLResponse(rendered_html)
+    @application.api_route("/", methods=["GET", "HEAD"], include_in_schema=False, response_class=HTMLResponse)
+    async def serve_frontend(request: Request) -> Response:
+        response = webui_bundle.serve_index(request)
+        if response is None:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Web UI index file not found",
+            )
+        return response
 
     return application
 
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MAX_SAMPLE_SECONDS = 60.0
+DEFAULT_INTERVAL_MS = 5.0
+PROFILE_TOP_FUNCTIONS = 40
+
+
+class ProfilerBusy(RuntimeError):
+    """Another sampling session is already running."""
+
+
+def _frame_label(code: Any) -> str:
+    filename = code.co_filename
+    marker = "site-packages" + os.sep
+    if marker in filename:
+        filename = filename.split(marker, 1)[1]
+    elif filename.startswith(ROOT):
+        filename = os.path.relpath(filename, ROOT)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of every thread with ``sys._current_frames``.
+
+    Nothing is installed while no session runs: a session is a loop in the
+    calling thread that wakes every ``interval`` seconds, so the serving
+    threads pay only for the GIL hand-offs during the session itself.
+    Only one session runs at a time.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+    def sample(self, seconds: float, interval: float = DEFAULT_INTERVAL_MS / 1000.0) -> Dict[str, Any]:
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profiling session is already running")
+        try:
+            return self._sample(min(seconds, MAX_SAMPLE_SECONDS), interval)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float, interval: float) -> Dict[str, Any]:
+        own_thread = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks: Counter = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own_thread:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(ident) or f"thread-{ident}")
+                stacks[";".join(reversed(labels))] += 1
+            samples += 1
+            time.sleep(interval)
+        return {"samples": samples, "seconds": time.perf_counter() - started, "stacks": stacks}
+
+
+def collapsed(stacks: Counter) -> str:
+    """Collapsed-stack text (``root;...;leaf count`` per line) for flamegraph.pl / speedscope."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+SAMPLER = StackSampler()
+
+# Most recent per-request cProfile report (pstats text)
+_last_request_profile: Optional[Dict[str, str]] = None
+_request_profile_lock = threading.Lock()
+
+
+def last_request_profile() -> Optional[Dict[str, str]]:
+    return _last_request_profile
+
+
+def profiled(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a synchronous handler so one call runs under cProfile; the report replaces the last one."""
+
+    def run(*args: Any, **kwargs: Any) -> Any:
+        global _last_request_profile
+        # Only one cProfile can be active per process: a concurrent flagged call runs unprofiled
+        if not _request_profile_lock.acquire(blocking=False):
+            return func(*args, **kwargs)
+        try:
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(func, *args, **kwargs)
+            finally:
+                buffer = io.StringIO()
+                pstats.Stats(profile, stream=buffer).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+                _last_request_profile = {
+                    "captured_at": datetime.now().isoformat(timespec="seconds"),
+                    "report": buffer.getvalue(),
+                }
+        finally:
+            _request_profile_lock.release()
+
+    return run
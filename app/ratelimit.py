@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+
+from . import auth, metrics, schemas
+from .config import settings
+
+RATE_LIMITED = metrics.REGISTRY.counter(
+    "pricepilot_rate_limited_total",
+    "Pricing requests rejected by the per-client rate limit.",
+)
+
+
+class TokenBucketLimiter:
+    """
+    Per-client token buckets: ``burst`` requests at once, refilled at ``rate`` per second.
+
+    Each client costs one ``(tokens, updated_at)`` entry, refilled lazily on
+    access. At most ``max_clients`` entries are kept; the least recently seen
+    client is forgotten first and starts again with a full bucket. ``clock`` is
+    ``time.monotonic`` unless a test substitutes its own.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        max_clients: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_clients = max_clients
+        self.clock = clock
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, client: str, now: Optional[float] = None) -> float:
+        """Take one token; returns 0.0 if allowed, otherwise seconds until a token is available."""
+        if not self.enabled:
+            return 0.0
+        now = self.clock() if now is None else now
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens >= 1.0:
+                tokens -= 1.0
+                wait = 0.0
+            else:
+                wait = (1.0 - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+LIMITER = TokenBucketLimiter(
+    settings.rate_limit_rps, settings.rate_limit_burst, settings.rate_limit_max_clients
+)
+
+
+def _limiter_collector():
+    yield "# HELP pricepilot_rate_limit_clients Clients currently tracked by the pricing rate limiter."
+    yield "# TYPE pricepilot_rate_limit_clients gauge"
+    yield f"pricepilot_rate_limit_clients {len(LIMITER)}"
+
+
+metrics.REGISTRY.register_collector(_limiter_collector)
+
+
+async def rate_limited_user(user: schemas.User = Depends(auth.get_current_user)) -> schemas.User:
+    """``get_current_user`` plus the per-client limit, keyed by the user the token's ``sub`` resolves to."""
+    wait = LIMITER.acquire(user.email)
+    if wait > 0:
+        RATE_LIMITED.inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+    return user
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 from enum import Enum
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
-from pydantic import BaseModel, Field, confloat, conint
+from pydantic import BaseModel, Field, confloat, conint, model_validator
 
 
 class PlatformEnum(str, Enum):
@@ -12,6 +12,39 @@ class PlatformEnum(str, Enum):
     web = "web"
 
 
+class ZoneThresholdSet(BaseModel):
+    """Нижние границы вероятности принятия (доли 0..1) для зон."""
+    green: float = Field(0.70, gt=0, le=1)
+    yellow_low: float = Field(0.50, gt=0, le=1)
+    yellow_high: float = Field(0.30, gt=0, le=1)
+
+    @model_validator(mode="after")
+    def _check_order(self) -> "ZoneThresholdSet":
+        if not self.green > self.yellow_low > self.yellow_high:
+            raise ValueError("zone thresholds must satisfy green > yellow_low > yellow_high")
+        return self
+
+
+class PricingScenario(BaseModel):
+    """Стратегия выбора цены; все сценарии оцениваются на одной кривой вероятности."""
+    name: Optional[str] = Field(None, max_length=64)
+    ev_weight: float = Field(0.7, ge=0, description="Вес нормированного ожидаемого дохода")
+    probability_weight: float = Field(0.3, ge=0, description="Вес нормированной вероятности принятия")
+    zone_thresholds: ZoneThresholdSet = Field(default_factory=ZoneThresholdSet)
+    min_profit_margin: Optional[float] = Field(
+        None,
+        ge=0,
+        description="Минимальная маржа над стоимостью топлива (0.3 = +30%); если задана, "
+        "оптимальная цена не опускается ниже этого порога",
+    )
+
+    @model_validator(mode="after")
+    def _check_weights(self) -> "PricingScenario":
+        if self.ev_weight + self.probability_weight <= 0:
+            raise ValueError("ev_weight + probability_weight must be positive")
+        return self
+
+
 class OrderRequest(BaseModel):
     order_timestamp: int = Field(..., gt=0, description="Unix timestamp of the order in seconds.")
     distance_in_meters: int = Field(..., ge=0)
@@ -31,6 +64,15 @@ class OrderRequest(BaseModel):
     user_id: Optional[int] = Field(None, description="ID пользователя для персонализации")
     driver_id: Optional[int] = Field(None, description="ID водителя для персонализации")
 
+    # Город заказа: выбирает модель сегмента (models/segments/city-<город>...), признаком не является
+    city: Optional[str] = Field(None, max_length=64, description="Город заказа")
+
+    # Сравнение стратегий: каждая оценивается на одной и той же кривой вероятности
+    scenarios: Optional[List[PricingScenario]] = Field(None, max_length=20)
+
+    # Бюджет времени на расчёт; заголовок X-Deadline-Ms задаёт то же самое (берётся меньшее)
+    deadline_ms: Optional[float] = Field(None, gt=0, le=60000, description="Дедлайн расчёта, мс")
+
 
 class PriceRange(BaseModel):
     min: float = Field(..., ge=0)
@@ -71,6 +113,21 @@ class ModelAnalysis(BaseModel):
     scan_range: ScanRange
     timestamp: str
     price_increment: Optional[float] = Field(None, ge=0)
+    model_version: Optional[str] = Field(None, description="Версия модели, посчитавшей ответ")
+    model_kind: Optional[Literal["full", "surrogate"]] = Field(
+        None, description="full — основная модель, surrogate — быстрый путь по суррогатной модели"
+    )
+    price_points: Optional[int] = Field(None, ge=0, description="Точек на кривой, по которой выбрана цена")
+    degraded: Optional[bool] = Field(
+        None, description="Ответ посчитан упрощённо: пониженное разрешение или суррогатная модель"
+    )
+    degraded_reason: Optional[Literal["budget", "deadline", "surrogate", "fallback"]] = Field(
+        None,
+        description="budget — разрешение понижено заранее по оценке времени, "
+        "deadline — дедлайн истёк посреди поиска, ответ по уже посчитанным точкам, "
+        "surrogate — быстрый путь по суррогатной модели, "
+        "fallback — суррогат вместо упавшей основной модели",
+    )
 
 
 class PriceProbability(BaseModel):
@@ -108,12 +165,105 @@ class FuelEconomics(BaseModel):
     net_profit_from_optimal: float = Field(..., description="Чистая прибыль от оптимальной цены")
 
 
+class ScenarioResult(BaseModel):
+    name: str
+    strategy: PricingScenario
+    zones: List[Zone]
+    optimal_price: OptimalPrice
+    zone_thresholds: Optional[ZoneThresholds] = None
+    fuel_economics: FuelEconomics
+
+
 class ModelResponse(BaseModel):
     zones: List[Zone]
     optimal_price: OptimalPrice
     zone_thresholds: Optional[ZoneThresholds] = None
     fuel_economics: FuelEconomics
     analysis: ModelAnalysis
+    scenarios: Optional[List[ScenarioResult]] = None
+
+
+class ModelReloadRequest(BaseModel):
+    version: Optional[str] = Field(None, description="Имя версии в MODEL_DIR; по умолчанию — из CURRENT")
+    force: bool = False
+
+
+class ModelReloadResult(BaseModel):
+    status: str
+    version: str
+    previous: Optional[str] = None
+    load_seconds: float
+
+
+class ModelStoreStatus(BaseModel):
+    active_version: Optional[str] = None
+    loaded_at: Optional[str] = None
+    current_pointer: Optional[str] = None
+    available_versions: List[str] = []
+    reloads: Dict[str, int] = {}
+    last_error: Optional[str] = None
+    segments: Optional[Dict[str, Any]] = None
+
+
+class ShadowStatus(BaseModel):
+    candidate_version: Optional[str] = None
+    loaded_at: Optional[str] = None
+    sample_rate: float = 0.0
+    counts: Dict[str, int] = {}
+    zone_flip_rate: Optional[float] = None
+    mean_price_delta_pct: Optional[float] = None
+    mean_abs_price_delta_pct: Optional[float] = None
+    mean_probability_mae: Optional[float] = None
+    last_error: Optional[str] = None
+
+
+class ShadowConfigRequest(BaseModel):
+    version: Optional[str] = Field(None, description="Версия-кандидат в MODEL_DIR; null отключает теневую оценку")
+    sample_rate: Optional[float] = Field(None, ge=0, le=1, description="Доля запросов для теневой оценки")
+
+
+class TenderOutcome(BaseModel):
+    """Исход тендера для онлайн-обновления истории (поля как в train.csv)."""
+    is_done: Literal["done", "cancel"]
+    price_bid_local: confloat(gt=0)
+    price_start_local: confloat(gt=0)
+    user_id: Optional[int] = None
+    driver_id: Optional[int] = None
+
+    @model_validator(mode="after")
+    def _check_participants(self) -> "TenderOutcome":
+        if self.user_id is None and self.driver_id is None:
+            raise ValueError("user_id or driver_id is required")
+        return self
+
+
+class OutcomeBatch(BaseModel):
+    outcomes: List[TenderOutcome] = Field(..., min_length=1, max_length=1000)
+
+
+class OutcomeIngestResult(BaseModel):
+    accepted: int
+    users: int
+    drivers: int
+    pending_snapshot: int
+
+
+class DriftFeature(BaseModel):
+    psi: Optional[float] = None
+    level: Optional[Literal["stable", "warning", "alert"]] = Field(
+        None, description="stable, warning (PSI > 0.1) или alert (PSI > 0.25); null, пока наблюдений мало"
+    )
+    count: int = 0
+    missing: Optional[int] = None
+    live: Optional[Dict[str, Optional[float]]] = None
+    reference: Optional[Dict[str, float]] = None
+
+
+class DriftReport(BaseModel):
+    model: Optional[str] = None
+    observations: int = 0
+    window_seconds: Optional[float] = None
+    features: Dict[str, DriftFeature] = {}
 
 
 class User(BaseModel):
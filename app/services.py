@@ -1,14 +1,23 @@
 from __future__ import annotations
 
+import asyncio
 from copy import deepcopy
 from datetime import datetime
 import importlib
 import inspect
+import json
 import logging
+import sys
 from functools import lru_cache
+from time import perf_counter
 from typing import Any, Awaitable, Callable, Dict, Optional, Union
 
-from . import schemas
+from fastapi import BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+
+from src.timing import stage
+
+from . import background, metrics, profiler, schemas
 from .config import settings
 
 logger = logging.getLogger(__name__)
@@ -152,6 +161,248 @@ def _load_ml_callable() -> Optional[ModelCallable]:
     return handler  # type: ignore[return-value]
 
 
+def _ml_module_attribute(name: str, import_module: bool = True) -> Optional[Any]:
+    if not settings.ml_module_path:
+        return None
+    if import_module:
+        module = importlib.import_module(settings.ml_module_path)
+    else:
+        module = sys.modules.get(settings.ml_module_path)
+    return getattr(module, name, None)
+
+
+def get_model_store() -> Optional[Any]:
+    """Versioned model store exposed by the ML module as ``MODEL_STORE``, if any."""
+    return _ml_module_attribute("MODEL_STORE")
+
+
+def loaded_model_store() -> Optional[Any]:
+    """Like get_model_store, but never imports the ML module (safe for scrapes and shutdown)."""
+    return _ml_module_attribute("MODEL_STORE", import_module=False)
+
+
+def get_segment_router() -> Optional[Any]:
+    """Per-segment model router exposed by the ML module as ``SEGMENT_ROUTER``, if any."""
+    return _ml_module_attribute("SEGMENT_ROUTER")
+
+
+def loaded_segment_router() -> Optional[Any]:
+    return _ml_module_attribute("SEGMENT_ROUTER", import_module=False)
+
+
+def get_shadow_scorer() -> Optional[Any]:
+    """Candidate-model shadow scorer exposed by the ML module as ``SHADOW_SCORER``, if any."""
+    return _ml_module_attribute("SHADOW_SCORER")
+
+
+def loaded_shadow_scorer() -> Optional[Any]:
+    return _ml_module_attribute("SHADOW_SCORER", import_module=False)
+
+
+def get_history_store() -> Optional[Any]:
+    """Incremental user/driver history exposed by the ML module as ``HISTORY_STORE``, if any."""
+    return _ml_module_attribute("HISTORY_STORE")
+
+
+def loaded_history_store() -> Optional[Any]:
+    return _ml_module_attribute("HISTORY_STORE", import_module=False)
+
+
+def get_drift_monitor() -> Optional[Any]:
+    """Drift monitor exposed by the ML module as ``DRIFT_MONITOR``, if any."""
+    return _ml_module_attribute("DRIFT_MONITOR")
+
+
+def loaded_drift_monitor() -> Optional[Any]:
+    return _ml_module_attribute("DRIFT_MONITOR", import_module=False)
+
+
+_drift_worker: Optional[background.BoundedWorker] = None
+
+
+def _observe_drift(batch: list) -> None:
+    monitor = loaded_drift_monitor()
+    if monitor is None:
+        return
+    for order_dict, price, probability in batch:
+        monitor.observe(order_dict, optimal_price=price, probability=probability)
+
+
+def _submit_drift_observation(order_dict: Dict[str, Any], response: schemas.ModelResponse) -> None:
+    """Hand the scored order to the drift worker; never blocks the request."""
+    global _drift_worker
+    if not settings.drift_monitor_enabled:
+        return
+    if _drift_worker is None:
+        monitor = loaded_drift_monitor()
+        if monitor is None:
+            return
+        monitor.configure(window_seconds=settings.drift_window_seconds)
+        _drift_worker = background.register(
+            background.BoundedWorker("drift", _observe_drift, maxsize=settings.drift_queue_size)
+        )
+    optimal = response.optimal_price
+    _drift_worker.submit((order_dict, optimal.price, optimal.probability_percent / 100.0))
+
+
+SHADOW_PRICE_DELTA = metrics.REGISTRY.histogram(
+    "pricepilot_shadow_price_delta_pct",
+    "Candidate optimal price minus the served optimal price, percent of the served price.",
+    ["candidate"],
+    buckets=(-20.0, -10.0, -5.0, -2.0, -1.0, 0.0, 1.0, 2.0, 5.0, 10.0, 20.0),
+)
+SHADOW_PROBABILITY_MAE = metrics.REGISTRY.histogram(
+    "pricepilot_shadow_probability_mae",
+    "Mean absolute difference between the candidate and served acceptance curves.",
+    ["candidate"],
+    buckets=(0.005, 0.01, 0.02, 0.05, 0.1, 0.2),
+)
+SHADOW_ZONE_FLIPS = metrics.REGISTRY.counter(
+    "pricepilot_shadow_zone_flips_total",
+    "Shadow-scored requests whose optimal price zone differs between the candidate and the served model.",
+    ["candidate"],
+)
+SHADOW_SCORED = metrics.REGISTRY.counter(
+    "pricepilot_shadow_scored_total",
+    "Requests re-scored by the shadow candidate, by result.",
+    ["candidate", "result"],
+)
+
+_shadow_worker: Optional[background.BoundedWorker] = None
+
+
+def _score_shadow(batch: list) -> None:
+    scorer = loaded_shadow_scorer()
+    if scorer is None:
+        return
+    for order_dict, capture in batch:
+        candidate = scorer.candidate
+        if candidate is None:
+            return
+        try:
+            comparison = scorer.score(order_dict, capture["curve"], capture["optimal_price"])
+        except Exception as exc:
+            SHADOW_SCORED.inc(candidate=candidate.version, result="failed")
+            logger.warning("Shadow scoring failed: %s", exc)
+            continue
+        if comparison is None:
+            continue
+        version = comparison["candidate"]
+        SHADOW_SCORED.inc(candidate=version, result="scored")
+        SHADOW_PRICE_DELTA.observe(comparison["price_delta_pct"], candidate=version)
+        SHADOW_PROBABILITY_MAE.observe(comparison["probability_mae"], candidate=version)
+        if comparison["zone_flip"]:
+            SHADOW_ZONE_FLIPS.inc(candidate=version)
+
+
+def _shadow_slot() -> Optional[Dict[str, Any]]:
+    """Empty capture slot for the handler to fill if this request is sampled for shadow scoring."""
+    scorer = loaded_shadow_scorer()
+    return {} if scorer is not None and scorer.sampled() else None
+
+
+def _submit_shadow(order_dict: Dict[str, Any], capture: Dict[str, Any]) -> None:
+    """Queue a captured curve for the candidate; drops it when the queue is full."""
+    global _shadow_worker
+    if _shadow_worker is None:
+        _shadow_worker = background.register(
+            background.BoundedWorker("shadow", _score_shadow, maxsize=settings.shadow_queue_size, max_batch=8)
+        )
+    _shadow_worker.submit((order_dict, capture))
+
+
+def _model_store_collector():
+    store = loaded_model_store()
+    if store is None:
+        return
+    version = store.active_version
+    yield "# HELP pricepilot_model_info Active pricing model version."
+    yield "# TYPE pricepilot_model_info gauge"
+    if version is not None:
+        yield f'pricepilot_model_info{{version="{metrics.escape_label_value(version)}"}} 1'
+    yield "# HELP pricepilot_model_reloads_total Model reload attempts by result."
+    yield "# TYPE pricepilot_model_reloads_total counter"
+    for result, count in sorted(store.reload_counts.items()):
+        yield f'pricepilot_model_reloads_total{{result="{result}"}} {count}'
+
+
+metrics.REGISTRY.register_collector(_model_store_collector)
+
+
+def _segment_router_collector():
+    router = loaded_segment_router()
+    if router is None:
+        return
+    state = router.status()
+    yield "# HELP pricepilot_segment_models_loaded Segment models held in memory."
+    yield "# TYPE pricepilot_segment_models_loaded gauge"
+    yield f"pricepilot_segment_models_loaded {len(state['loaded'])}"
+    yield "# HELP pricepilot_segment_models_bytes Estimated memory of loaded segment models and the budget."
+    yield "# TYPE pricepilot_segment_models_bytes gauge"
+    yield f'pricepilot_segment_models_bytes{{kind="used"}} {state["bytes"]}'
+    yield f'pricepilot_segment_models_bytes{{kind="budget"}} {state["max_bytes"]}'
+    yield "# HELP pricepilot_segment_model_events_total Segment model lookups and loads by event."
+    yield "# TYPE pricepilot_segment_model_events_total counter"
+    for event, count in sorted(state["counts"].items()):
+        yield f'pricepilot_segment_model_events_total{{event="{event}"}} {count}'
+
+
+metrics.REGISTRY.register_collector(_segment_router_collector)
+
+
+def _history_store_collector():
+    store = loaded_history_store()
+    if store is None:
+        return
+    state = store.status()
+    yield "# HELP pricepilot_history_outcomes_total Tender outcomes applied to the in-memory history."
+    yield "# TYPE pricepilot_history_outcomes_total counter"
+    yield f"pricepilot_history_outcomes_total {state['outcomes_total']}"
+    yield "# HELP pricepilot_history_entities Users and drivers with history statistics."
+    yield "# TYPE pricepilot_history_entities gauge"
+    yield f'pricepilot_history_entities{{kind="user"}} {state["users"]}'
+    yield f'pricepilot_history_entities{{kind="driver"}} {state["drivers"]}'
+    yield "# HELP pricepilot_history_pending_outcomes Outcomes not yet written to the cache files."
+    yield "# TYPE pricepilot_history_pending_outcomes gauge"
+    yield f"pricepilot_history_pending_outcomes {state['pending']}"
+    yield "# HELP pricepilot_history_snapshots_total Write-behind snapshots of the history cache by result."
+    yield "# TYPE pricepilot_history_snapshots_total counter"
+    for result, count in sorted(state["snapshots"].items()):
+        yield f'pricepilot_history_snapshots_total{{result="{result}"}} {count}'
+
+
+metrics.REGISTRY.register_collector(_history_store_collector)
+
+
+def _drift_collector():
+    monitor = loaded_drift_monitor()
+    if monitor is None or not settings.drift_monitor_enabled:
+        return
+    report = monitor.report()
+    yield "# HELP pricepilot_drift_observations Scored orders in the current drift window."
+    yield "# TYPE pricepilot_drift_observations gauge"
+    yield f"pricepilot_drift_observations {report['observations']}"
+    features = sorted(report["features"].items())
+    yield "# HELP pricepilot_drift_psi Population stability index of live traffic against the training profile."
+    yield "# TYPE pricepilot_drift_psi gauge"
+    for name, entry in features:
+        if entry["psi"] is not None:
+            yield f'pricepilot_drift_psi{{feature="{name}"}} {entry["psi"]:.6g}'
+    yield "# HELP pricepilot_drift_quantile Live (source=live) and training (source=reference) quantiles."
+    yield "# TYPE pricepilot_drift_quantile gauge"
+    for name, entry in features:
+        for source in ("live", "reference"):
+            for quantile, value in (entry.get(source) or {}).items():
+                if value is not None:
+                    yield (
+                        f'pricepilot_drift_quantile{{feature="{name}",quantile="{quantile}",'
+                        f'source="{source}"}} {value:.6g}'
+                    )
+
+
+metrics.REGISTRY.register_collector(_drift_collector)
+
+
 def _build_stub_response(order: schemas.OrderRequest) -> schemas.ModelResponse:
     response_copy = deepcopy(DUMMY_RESPONSE)
     analysis = response_copy["analysis"]
@@ -175,10 +426,201 @@ def _coerce_model_response(result: ModelPayload) -> schemas.ModelResponse:
     )
 
 
-async def call_pricing_model(order: schemas.OrderRequest) -> schemas.ModelResponse:
+@lru_cache(maxsize=1)
+def _load_fast_callable() -> Optional[ModelCallable]:
+    """Surrogate fast path exposed by the ML module as ``PRICING_FAST_CALLABLE``, if any."""
+    if not settings.fast_path_enabled or not settings.fast_callable_name:
+        return None
+    try:
+        handler = _ml_module_attribute(settings.fast_callable_name)
+    except Exception as exc:
+        logger.warning("Fast path unavailable: %s", exc)
+        return None
+    return handler if callable(handler) else None
+
+
+def preload_handlers() -> None:
+    """Resolve the pricing callables at startup so the first request does not import the ML module."""
+    try:
+        _load_ml_callable()
+    except Exception as exc:
+        logger.warning("ML handler unavailable at startup: %s", exc)
+    _load_fast_callable()
+
+
+# Full-model computations currently running; only touched from the event loop
+_inflight = 0
+FAST_PATH_COUNTS: Dict[str, int] = {"client": 0, "overload": 0, "fallback": 0}
+
+
+def _fast_path_collector():
+    yield "# HELP pricepilot_pricing_inflight Full-model pricing computations in progress."
+    yield "# TYPE pricepilot_pricing_inflight gauge"
+    yield f"pricepilot_pricing_inflight {_inflight}"
+    yield "# HELP pricepilot_fast_path_total Requests served by the surrogate fast path by reason."
+    yield "# TYPE pricepilot_fast_path_total counter"
+    for reason, count in FAST_PATH_COUNTS.items():
+        yield f'pricepilot_fast_path_total{{reason="{reason}"}} {count}'
+
+
+metrics.REGISTRY.register_collector(_fast_path_collector)
+
+
+DEGRADED_COUNTS: Dict[str, int] = {"budget": 0, "deadline": 0, "surrogate": 0, "fallback": 0}
+
+
+def _degraded_collector():
+    yield "# HELP pricepilot_degraded_total Responses computed at reduced resolution or by the surrogate, by reason."
+    yield "# TYPE pricepilot_degraded_total counter"
+    for reason, count in DEGRADED_COUNTS.items():
+        yield f'pricepilot_degraded_total{{reason="{reason}"}} {count}'
+
+
+metrics.REGISTRY.register_collector(_degraded_collector)
+
+
+# Shared computations by canonical order key; only touched from the event loop
+_coalescing: Dict[str, "asyncio.Task[schemas.ModelResponse]"] = {}
+COALESCED_COUNT = 0
+
+
+def _coalesce_collector():
+    yield "# HELP pricepilot_pricing_coalescing Distinct pricing computations currently shared by concurrent requests."
+    yield "# TYPE pricepilot_pricing_coalescing gauge"
+    yield f"pricepilot_pricing_coalescing {len(_coalescing)}"
+    yield "# HELP pricepilot_pricing_coalesced_total Requests answered by an identical request's in-flight computation."
+    yield "# TYPE pricepilot_pricing_coalesced_total counter"
+    yield f"pricepilot_pricing_coalesced_total {COALESCED_COUNT}"
+
+
+metrics.REGISTRY.register_collector(_coalesce_collector)
+
+
+def _coalesce_key(order_dict: Dict[str, Any], fast: bool) -> str:
+    """
+    Canonical key of everything the result depends on.
+
+    Driver and user fields (``driver_id``, ``driver_rating``, car, pickup, ``user_id``)
+    are model features, so they are part of the key: only the same driver's repeated
+    request for the same order (retries, double submits) shares a computation. A
+    broadcast order priced by N different drivers still runs N computations.
+    ``deadline_ms`` and the fast flag are included too.
+    """
+    return json.dumps([fast, order_dict], sort_keys=True, default=str)
+
+
+async def _single_flight(key: str, compute: Callable[[], Awaitable[schemas.ModelResponse]]) -> schemas.ModelResponse:
+    """Await the in-flight computation for ``key``, or start one that later identical requests join."""
+    global COALESCED_COUNT
+    task = _coalescing.get(key)
+    if task is not None:
+        COALESCED_COUNT += 1
+    else:
+        task = asyncio.ensure_future(compute())
+        _coalescing[key] = task
+        task.add_done_callback(lambda _: _coalescing.pop(key, None))
+    # A disconnecting client cancels only its own wait, not the computation others share
+    return await asyncio.shield(task)
+
+
+def _effective_deadline_ms(order: schemas.OrderRequest, header_ms: Optional[float]) -> Optional[float]:
+    """Tightest of the body field, the X-Deadline-Ms header and PRICING_DEFAULT_DEADLINE_MS."""
+    candidates = [value for value in (order.deadline_ms, header_ms, settings.default_deadline_ms) if value]
+    return min(candidates) if candidates else None
+
+
+async def _call_full_model(handler: ModelCallable, order_dict: Dict[str, Any]) -> schemas.ModelResponse:
+    global _inflight
+    _inflight += 1
+    try:
+        with stage("pricing_model"):
+            if inspect.iscoroutinefunction(handler):
+                result = await handler(order_dict, output_json=False)
+            else:
+                # CPU-bound: keep the event loop free so overload is visible and health checks answer
+                result = await run_in_threadpool(handler, order_dict, output_json=False)
+    finally:
+        _inflight -= 1
+    with stage("coerce_response"):
+        return _coerce_model_response(result)
+
+
+async def _call_fast_path(handler: ModelCallable, order_dict: Dict[str, Any], reason: str) -> schemas.ModelResponse:
+    with stage("fast_path"):
+        if inspect.iscoroutinefunction(handler):
+            result = await handler(order_dict, output_json=False)
+        else:
+            # Same executor as the full model: the event loop never runs pricing code
+            result = await run_in_threadpool(handler, order_dict, output_json=False)
+    FAST_PATH_COUNTS[reason] += 1
+    with stage("coerce_response"):
+        response = _coerce_model_response(result)
+    # Surrogate curves are approximate whatever the handler reports
+    response.analysis.degraded = True
+    response.analysis.degraded_reason = "fallback" if reason == "fallback" else "surrogate"
+    return response
+
+
+async def _price_order(
+    handler: ModelCallable, order_dict: Dict[str, Any], fast: bool
+) -> schemas.ModelResponse:
+    fast_handler = _load_fast_callable()
+    reason = None
+    if fast_handler is not None:
+        limit = settings.fast_path_max_inflight
+        if fast:
+            reason = "client"
+        elif limit > 0 and _inflight >= limit:
+            reason = "overload"
+    if reason is not None:
+        try:
+            return await _call_fast_path(fast_handler, order_dict, reason)
+        except Exception as exc:
+            # e.g. the active model version was trained without a surrogate
+            logger.warning("Fast path failed, using the full model: %s", exc)
+            fast_handler = None
+    try:
+        return await _call_full_model(handler, order_dict)
+    except Exception as exc:
+        if fast_handler is None:
+            raise
+        logger.error("ML handler failed, serving the surrogate fast path: %s", exc, exc_info=True)
+        return await _call_fast_path(fast_handler, order_dict, "fallback")
+
+
+async def call_pricing_model(
+    order: schemas.OrderRequest,
+    fast: bool = False,
+    deadline_ms: Optional[float] = None,
+    profile: bool = False,
+    background_tasks: Optional[BackgroundTasks] = None,
+) -> schemas.ModelResponse:
     """
     Call real ML module if configured, otherwise return stub response.
+
+    The surrogate fast path (if the ML module provides one) serves the request
+    when the client asks for it (``fast``), when more than
+    PRICING_FAST_PATH_MAX_INFLIGHT full computations are running, and instead
+    of failing when the full model raises. It runs in the same thread pool as the
+    full model, and its responses are marked ``degraded`` (reason ``surrogate``,
+    or ``fallback`` when it replaced a failed full computation).
+
+    A deadline (``deadline_ms`` from the header, the order body or the default)
+    is passed to the handler as ``deadline_at`` on the ``perf_counter`` clock, so
+    time spent queueing for a worker thread counts against it.
+
+    Concurrent identical requests (the same driver's retries of one order)
+    share a single computation, see ``_coalesce_key``.
+
+    ``profile`` runs this request's own full-model computation under cProfile
+    (see ``profiler.profiled``).
+
+    A sampled share of full-model requests is re-scored by the shadow candidate
+    (``SHADOW_SCORER``): the handler keeps the curve's feature rows, and they are
+    queued for the shadow worker from ``background_tasks``, i.e. after the
+    response has been sent.
     """
+    started = perf_counter()
     try:
         handler = _load_ml_callable()
     except Exception as exc:
@@ -192,14 +634,36 @@ async def call_pricing_model(order: schemas.OrderRequest) -> schemas.ModelRespon
 
     try:
         # Convert OrderRequest to dict format expected by ML module
-        order_dict = _convert_order_to_dict(order)
-        
-        # Call handler with output_json=False to get dict instead of JSON string
-        result = handler(order_dict, output_json=False)
-        
-        if inspect.isawaitable(result):
-            result = await result  # type: ignore[assignment]
-        return _coerce_model_response(result)
+        with stage("convert_order"):
+            order_dict = _convert_order_to_dict(order)
+            budget_ms = _effective_deadline_ms(order, deadline_ms)
+            if budget_ms is not None:
+                order_dict["deadline_ms"] = budget_ms
+            profile = profile and not inspect.iscoroutinefunction(handler)
+            key = _coalesce_key(order_dict, fast) if settings.coalesce_enabled and not profile else None
+            if budget_ms is not None:
+                order_dict["deadline_at"] = started + budget_ms / 1000.0
+            shadow = _shadow_slot()
+            if shadow is not None:
+                order_dict["shadow"] = shadow
+        if profile:
+            response = await _call_full_model(profiler.profiled(handler), order_dict)
+        elif key is None:
+            response = await _price_order(handler, order_dict, fast)
+        else:
+            response = await _single_flight(key, lambda: _price_order(handler, order_dict, fast))
+        reason = response.analysis.degraded_reason
+        if reason in DEGRADED_COUNTS:
+            DEGRADED_COUNTS[reason] += 1
+        # Filled only if this request's own full-model computation ran (not coalesced, not fast path)
+        capture = order_dict.pop("shadow", None)
+        if capture:
+            if background_tasks is not None:
+                background_tasks.add_task(_submit_shadow, order_dict, capture)
+            else:
+                _submit_shadow(order_dict, capture)
+        _submit_drift_observation(order_dict, response)
+        return response
     except Exception as exc:
         if settings.ml_allow_stub_fallback:
             logger.error("ML handler failed, falling back to stub: %s", exc, exc_info=True)
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request, Response, status
+
+from .config import settings
+
+try:  # optional: brotli variants are only produced when the package is installed
+    import brotli  # type: ignore[import-not-found]
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+ASSETS_PREFIX = "/assets/"
+CONFIG_PLACEHOLDER = "<!--__WEBUI_CONFIG__-->"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+TEXT_SUFFIXES = {".css", ".js", ".html"}
+# A compressed variant is kept only if it saves at least this share of bytes.
+MIN_COMPRESSION_GAIN = 0.1
+
+
+def _opaque_tag(tag: str) -> str:
+    """Entity tag without the weak prefix, for weak comparison (RFC 9110, 8.8.3.2)."""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+@dataclass
+class CachedAsset:
+    """One static payload with its precomputed encodings and validators."""
+
+    body: bytes
+    media_type: str
+    digest: str
+    encodings: Dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, body: bytes, media_type: str) -> "CachedAsset":
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        asset = cls(body=body, media_type=media_type, digest=digest)
+        asset._precompress()
+        return asset
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        # Each encoding is a different byte sequence, so it gets its own strong tag.
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def _precompress(self) -> None:
+        limit = len(self.body) * (1.0 - MIN_COMPRESSION_GAIN)
+        candidates: List[Tuple[str, bytes]] = [("gzip", gzip.compress(self.body, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            candidates.append(("br", brotli.compress(self.body, quality=11)))
+        for encoding, payload in candidates:
+            if len(payload) < limit:
+                self.encodings[encoding] = payload
+
+    def pick_encoding(self, accept_encoding: str) -> Tuple[Optional[str], bytes]:
+        accepted = {part.split(";", 1)[0].strip().lower() for part in accept_encoding.split(",")}
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in self.encodings:
+                return encoding, self.encodings[encoding]
+        return None, self.body
+
+    @staticmethod
+    def matches(if_none_match: str, etag: str) -> bool:
+        """If-None-Match check: ``*`` or any listed tag, compared weakly."""
+        if if_none_match.strip() == "*":
+            return True
+        return _opaque_tag(etag) in {_opaque_tag(tag) for tag in if_none_match.split(",") if tag.strip()}
+
+    def respond(self, request: Request, cache_control: str) -> Response:
+        encoding, payload = self.pick_encoding(request.headers.get("accept-encoding", ""))
+        headers = {
+            "ETag": self.etag_for(encoding),
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if self.matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(payload))
+            return Response(media_type=self.media_type, headers=headers)
+        return Response(content=payload, media_type=self.media_type, headers=headers)
+
+
+def _hashed_name(relative: str, body: bytes) -> str:
+    path = Path(relative)
+    digest = hashlib.sha256(body).hexdigest()[:12]
+    return str(path.with_name(f"{path.stem}.{digest}{path.suffix}")).replace("\\", "/")
+
+
+def _rewrite_urls(text: str, url_map: Dict[str, str]) -> str:
+    for original, hashed in url_map.items():
+        text = text.replace(original, hashed)
+    return text
+
+
+class WebUIBundle:
+    """
+    Renders the web UI once and keeps every static asset in memory.
+
+    Assets are reachable both by their original path (revalidated via ETag)
+    and by a content-hashed path that is served with an immutable cache
+    header; the rendered index and CSS reference the hashed paths.
+    """
+
+    def __init__(self, static_dir: Path, index_file: Path) -> None:
+        self.static_dir = static_dir
+        self.index_file = index_file
+        self.index: Optional[CachedAsset] = None
+        self._assets: Dict[str, Tuple[CachedAsset, bool]] = {}
+        self._built = False
+        self._lock = threading.Lock()
+
+    def ensure_built(self) -> None:
+        if not self._built:
+            self.build()
+
+    def build(self) -> None:
+        with self._lock:
+            if self._built:
+                return
+            url_map = self._build_assets()
+            self.index = self._render_index(url_map)
+            self._built = True
+
+    def _build_assets(self) -> Dict[str, str]:
+        url_map: Dict[str, str] = {}
+        if not self.static_dir.exists():
+            return url_map
+
+        files = sorted(p for p in self.static_dir.rglob("*") if p.is_file())
+        # Binary assets first so that CSS/JS can reference their hashed URLs.
+        files.sort(key=lambda p: p.suffix in TEXT_SUFFIXES)
+        for file_path in files:
+            relative = file_path.relative_to(self.static_dir).as_posix()
+            body = file_path.read_bytes()
+            if file_path.suffix in TEXT_SUFFIXES:
+                body = _rewrite_urls(body.decode("utf-8"), url_map).encode("utf-8")
+            media_type = mimetypes.guess_type(file_path.name)[0] or "application/octet-stream"
+            if media_type.startswith("text/") or media_type.endswith("javascript"):
+                media_type += "; charset=utf-8"
+
+            asset = CachedAsset.build(body, media_type)
+            hashed = _hashed_name(relative, body)
+            self._assets[relative] = (asset, False)
+            self._assets[hashed] = (asset, True)
+            url_map[f"{ASSETS_PREFIX}{relative}"] = f"{ASSETS_PREFIX}{hashed}"
+        return url_map
+
+    def _render_index(self, url_map: Dict[str, str]) -> Optional[CachedAsset]:
+        if not self.index_file.exists():
+            return None
+
+        raw_html = self.index_file.read_text(encoding="utf-8")
+        config_payload = {
+            "backendBase": settings.webui_backend_base,
+            "tokenPath": settings.webui_token_path,
+            "pricingPath": settings.webui_pricing_path,
+            "username": settings.webui_username,
+            "password": settings.webui_password,
+            "includeCredentials": settings.webui_include_credentials,
+        }
+        config_script = f"<script>window.__WEBUI_CONFIG__ = {json.dumps(config_payload)};</script>"
+        if CONFIG_PLACEHOLDER in raw_html:
+            rendered_html = raw_html.replace(CONFIG_PLACEHOLDER, config_script, 1)
+        else:
+            rendered_html = raw_html.replace("</head>", f"{config_script}</head>", 1)
+        rendered_html = _rewrite_urls(rendered_html, url_map)
+        return CachedAsset.build(rendered_html.encode("utf-8"), "text/html; charset=utf-8")
+
+    def lookup(self, relative: str) -> Optional[Tuple[CachedAsset, bool]]:
+        self.ensure_built()
+        return self._assets.get(relative)
+
+    def serve_asset(self, request: Request, relative: str) -> Optional[Response]:
+        found = self.lookup(relative)
+        if found is None:
+            return None
+        asset, immutable = found
+        return asset.respond(request, IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL)
+
+    def serve_index(self, request: Request) -> Optional[Response]:
+        self.ensure_built()
+        if self.index is None:
+            return None
+        return self.index.respond(request, REVALIDATE_CACHE_CONTROL)
@@ -48,6 +48,9 @@ docker run -d ^
     -v "%cd%\simple-train shorted.csv:/app/simple-train shorted.csv:ro" ^
     -v "%cd%\model_enhanced.joblib:/app/model_enhanced.joblib:ro" ^
     -v "%cd%\feature_names.joblib:/app/feature_names.joblib:ro" ^
+    -v "%cd%\feature_stats.joblib:/app/feature_stats.joblib:ro" ^
+    -v "%cd%\model_bundle:/app/model_bundle:ro" ^
+    -v "%cd%\models:/app/models:ro" ^
     pricepilot:latest
 
 if %errorlevel% neq 0 (
@@ -38,6 +38,9 @@ docker run -d \
     -v "$(pwd)/simple-train shorted.csv:/app/simple-train shorted.csv:ro" \
     -v "$(pwd)/model_enhanced.joblib:/app/model_enhanced.joblib:ro" \
     -v "$(pwd)/feature_names.joblib:/app/feature_names.joblib:ro" \
+    -v "$(pwd)/feature_stats.joblib:/app/feature_stats.joblib:ro" \
+    -v "$(pwd)/model_bundle:/app/model_bundle:ro" \
+    -v "$(pwd)/models:/app/models:ro" \
     pricepilot:latest
 
 echo "🎉 PricePilot запущен!"
@@ -5,13 +5,14 @@ from datetime import datetime
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from train_model import train_model
 from recommend_price import recommend_price
 
 def main():
     model_path = "model_enhanced.joblib"
     
     if not os.path.exists(model_path):
+        # Стек обучения (sklearn, xgboost) нужен только при отсутствии модели
+        from train_model import train_model
         try:
             train_model(train_path="simple-train.csv", use_gpu=False)
         except Exception as e:
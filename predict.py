@@ -12,7 +12,8 @@ import sys
 # Добавляем путь к модулям
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from src.train_model import build_enhanced_features, train_model
+from src.feature_stats import load_feature_stats
+from src.model_bundle import bundle_dir_for, bundle_exists, load_model_bundle
 
 def predict_test_data(
     test_path="test.csv",
@@ -46,6 +47,8 @@ def predict_test_data(
         
         if train_if_missing:
             print("📚 Обучаем модель на train данных...")
+            # Модуль обучения нужен только здесь
+            from src.train_model import train_model
             try:
                 model, _ = train_model(
                     train_path="simple-train.csv",
@@ -68,9 +71,12 @@ def predict_test_data(
     # ============================================================
     # 2. Загрузка модели
     # ============================================================
-    print(f"\n📦 Загрузка модели из {model_path}...")
+    # Нативный бандл рядом с моделью грузится без sklearn (см. src/model_bundle.py)
+    bundle_dir = bundle_dir_for(model_path)
+    source = bundle_dir if bundle_exists(bundle_dir) else model_path
+    print(f"\n📦 Загрузка модели из {source}...")
     try:
-        model = joblib.load(model_path)
+        model = load_model_bundle(bundle_dir) if source == bundle_dir else joblib.load(model_path)
         print("✅ Модель загружена успешно")
     except Exception as e:
         print(f"❌ ОШИБКА при загрузке модели: {e}")
@@ -115,8 +121,13 @@ def predict_test_data(
     # 4. Создание признаков
     # ============================================================
     print("\n🔧 Создание признаков для тестовых данных...")
+    # Признаки строятся тем же кодом, что при обучении (sklearn/xgboost он не импортирует)
+    from src.train_model import build_enhanced_features
+    feature_stats = load_feature_stats(model_path)
+    if feature_stats is None:
+        print("   ⚠️  feature_stats.joblib не найден: статистики заполнения считаются по тестовым данным")
     try:
-        X_test = build_enhanced_features(df_test)
+        X_test = build_enhanced_features(df_test, feature_stats=feature_stats)
         print(f"✅ Создано {X_test.shape[1]} признаков для {X_test.shape[0]} записей")
         
         # Статистика по признакам качества
@@ -244,7 +255,8 @@ def predict_test_data(
     
     return result
 
-if __name__ == "__main__":
+def main(argv=None):
+    """Точка входа CLI (python predict.py, pricepilot.py predict)."""
     import argparse
     
     parser = argparse.ArgumentParser(
@@ -280,7 +292,7 @@ if __name__ == "__main__":
         help="Не обучать модель, если она отсутствует"
     )
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     try:
         result = predict_test_data(
@@ -306,3 +318,5 @@ if __name__ == "__main__":
         traceback.print_exc()
         sys.exit(1)
 
+if __name__ == "__main__":
+    main()
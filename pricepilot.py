@@ -0,0 +1,75 @@
+"""
+Единая точка входа PricePilot.
+
+    python pricepilot.py train [--slim] [--monotone-price] ...   # обучение (src/train_model.py)
+    python pricepilot.py build-cache [CSV]                        # кэш истории
+    python pricepilot.py predict [--test_path ...]                # предсказания (predict.py)
+    python pricepilot.py serve [--host ...] [--port ...]          # API (uvicorn)
+    python pricepilot.py bench [--cases ...]                      # бенчмарки (scripts/benchmark.py)
+
+Модуль подкоманды импортируется только при её запуске: `--help` и `serve`
+не загружают стек обучения (sklearn, xgboost), `predict` — только то,
+что нужно для инференса.
+"""
+
+import argparse
+import importlib
+import sys
+
+
+def _delegate(module_name):
+    """Подкоманда, передающая оставшиеся аргументы в main(argv) модуля."""
+    def run(argv):
+        return importlib.import_module(module_name).main(argv)
+    return run
+
+
+def _build_cache(argv):
+    parser = argparse.ArgumentParser(prog='pricepilot.py build-cache', description='Построение кэша истории')
+    parser.add_argument('csv_path', nargs='?', default='simple-train.csv', help='CSV с историей заказов')
+    args = parser.parse_args(argv)
+
+    from src.build_history_cache import main as build_cache_main
+    build_cache_main(args.csv_path)
+    return 0
+
+
+def _serve(argv):
+    parser = argparse.ArgumentParser(prog='pricepilot.py serve', description='Запуск API и веб-интерфейса')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--reload', action='store_true', help='Перезапуск при изменении кода')
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    uvicorn.run('app.main:app', host=args.host, port=args.port, reload=args.reload, workers=args.workers)
+    return 0
+
+
+COMMANDS = {
+    'train': (_delegate('src.train_model'), 'обучение модели'),
+    'build-cache': (_build_cache, 'кэш истории пользователей и водителей'),
+    'predict': (_delegate('predict'), 'предсказания для тестового CSV'),
+    'serve': (_serve, 'API и веб-интерфейс'),
+    'bench': (_delegate('scripts.benchmark'), 'бенчмарки латентности и времени импорта'),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='pricepilot.py',
+        description='PricePilot: обучение, кэш истории, предсказания, API и бенчмарки',
+        epilog='\n'.join(f'  {name:<12} {help_text}' for name, (_, help_text) in COMMANDS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('command', choices=list(COMMANDS), metavar='command', help='подкоманда (см. ниже)')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='аргументы подкоманды (`<command> --help`)')
+    args = parser.parse_args(argv)
+
+    handler, _ = COMMANDS[args.command]
+    return handler(args.args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
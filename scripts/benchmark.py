@@ -0,0 +1,520 @@
+"""
+Reproducible latency/throughput benchmarks for the pricing pipeline.
+
+Generates a small synthetic training set, trains a model on it with the
+regular training code and measures:
+
+* ``find_optimal_price`` at several ``num_points`` values;
+* ``build_enhanced_features`` at 10k/100k/1M rows;
+* history cache build, lookups and online outcome ingestion;
+* import time of the serving, training and CLI entry points in a fresh
+  interpreter (and which heavy libraries each one loads);
+* model cold-start load time and artifact size (joblib vs native bundle);
+* end-to-end API throughput through an in-process ASGI client.
+
+Results are printed/saved as JSON and can be compared against a saved
+baseline (exit code 1 on regression):
+
+    python scripts/benchmark.py --save-baseline benchmark_baseline.json
+    python scripts/benchmark.py --baseline benchmark_baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_NUM_POINTS = (100, 250, 500)
+DEFAULT_FEATURE_ROWS = (10_000, 100_000, 1_000_000)
+DEFAULT_CONCURRENCY = (1, 4, 16)
+
+SAMPLE_ORDER: Dict[str, Any] = {
+    "order_timestamp": 1718558240,
+    "distance_in_meters": 3404,
+    "duration_in_seconds": 486,
+    "pickup_in_meters": 790,
+    "pickup_in_seconds": 169,
+    "driver_rating": 5.0,
+    "platform": "android",
+    "price_start_local": 180.0,
+    "carname": "LADA",
+    "carmodel": "GRANTA",
+    "driver_reg_date": "2020-01-15",
+    "user_id": 7,
+    "driver_id": 11,
+}
+
+
+def generate_synthetic_orders(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Synthetic bids with the same schema as ``simple-train.csv``."""
+    rng = np.random.default_rng(seed)
+    order_ts = pd.Timestamp("2025-01-01") + pd.to_timedelta(
+        rng.integers(0, 86400 * 90, n_rows), unit="s"
+    )
+    tender_ts = order_ts + pd.to_timedelta(rng.integers(1, 180, n_rows), unit="s")
+    distance = rng.lognormal(mean=8.3, sigma=0.7, size=n_rows).clip(200, 60_000).astype(int)
+    duration = (distance / rng.uniform(4.0, 12.0, n_rows)).astype(int) + 30
+    start_price = np.round(100 + distance / 1000 * 15 + duration / 60 * 5, 0)
+    markup = rng.uniform(0.9, 2.0, n_rows)
+    bid_price = np.round(start_price * markup, 0)
+    accept_prob = 1.0 / (1.0 + np.exp(4.0 * (markup - 1.35)))
+    is_done = np.where(rng.random(n_rows) < accept_prob, "done", "cancel")
+    cars = np.array([("LADA", "Granta"), ("Renault", "Logan"), ("Toyota", "Camry"), ("LADA", "Vesta")])
+    car_idx = rng.integers(0, len(cars), n_rows)
+
+    return pd.DataFrame(
+        {
+            "order_id": rng.integers(0, max(n_rows // 4, 1), n_rows),
+            "order_timestamp": order_ts.astype(str),
+            "tender_timestamp": tender_ts.astype(str),
+            "driver_reg_date": (
+                pd.Timestamp("2018-01-01") + pd.to_timedelta(rng.integers(0, 2000, n_rows), unit="D")
+            ).astype(str),
+            "user_id": rng.integers(0, max(n_rows // 10, 1), n_rows),
+            "driver_id": rng.integers(0, max(n_rows // 20, 1), n_rows),
+            "distance_in_meters": distance,
+            "duration_in_seconds": duration,
+            "pickup_in_meters": rng.integers(100, 4000, n_rows),
+            "pickup_in_seconds": rng.integers(30, 900, n_rows),
+            "driver_rating": rng.choice([4.2, 4.6, 4.8, 4.9, 5.0], n_rows),
+            "carname": cars[car_idx, 0],
+            "carmodel": cars[car_idx, 1],
+            "platform": rng.choice(["android", "ios"], n_rows, p=[0.7, 0.3]),
+            "price_start_local": start_price,
+            "price_bid_local": bid_price,
+            "is_done": is_done,
+        }
+    )
+
+
+def _summarize(samples: Sequence[float]) -> Dict[str, float]:
+    values_ms = np.asarray(samples, dtype=float) * 1000.0
+    return {
+        "mean_ms": round(float(values_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(values_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(values_ms, 95)), 3),
+        "min_ms": round(float(values_ms.min()), 3),
+        "runs": len(values_ms),
+    }
+
+
+def _time_calls(func: Callable[[], Any], repeats: int, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return _summarize(samples)
+
+
+@contextlib.contextmanager
+def _quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def prepare_workspace(workdir: Path, train_rows: int, seed: int) -> None:
+    """Generate training data, train a model and build the history cache in ``workdir``."""
+    from src import build_history_cache
+    from src.train_model import train_model
+
+    workdir.mkdir(parents=True, exist_ok=True)
+    os.chdir(workdir)
+    if Path("model_enhanced.joblib").exists():
+        print(f"[BENCH] Используем готовые артефакты в {workdir}")
+        return
+
+    print(f"[BENCH] Синтетический датасет: {train_rows} строк -> {workdir}")
+    generate_synthetic_orders(train_rows, seed).to_csv("simple-train.csv", index=False)
+    with _quiet():
+        train_model(train_path="simple-train.csv", random_state=seed)
+        build_history_cache.main("simple-train.csv")
+
+
+def bench_find_optimal_price(num_points: Sequence[int], repeats: int) -> Dict[str, Any]:
+    from src.recommend_price import find_optimal_price, load_history_cache, load_pricing_model
+
+    model, feature_stats = load_pricing_model("model_enhanced.joblib")
+    with _quiet():
+        load_history_cache()
+    return {
+        str(points): _time_calls(
+            lambda: find_optimal_price(SAMPLE_ORDER, model, num_points=points, feature_stats=feature_stats),
+            repeats,
+        )
+        for points in num_points
+    }
+
+
+# (imports, load) per artifact format. Runtime libraries are imported up front so
+# that "load" isolates deserialization.
+_COLD_LOAD_SNIPPETS = {
+    "joblib": ("import joblib, xgboost, sklearn.calibration", "joblib.load('model_enhanced.joblib')"),
+    "bundle": ("import xgboost; from model_bundle import load_model_bundle", "load_model_bundle('model_bundle')"),
+}
+
+
+def _cold_load_seconds(imports: str, load: str) -> Dict[str, float]:
+    """Import and first-load time in a fresh interpreter (what a new pod pays)."""
+    code = (
+        "import sys, time; sys.path[:0] = [%r, %r]; t0 = time.perf_counter(); %s; "
+        "t1 = time.perf_counter(); %s; t2 = time.perf_counter(); print(t1 - t0, t2 - t1)"
+        % (str(ROOT), str(ROOT / "src"), imports, load)
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True, cwd=os.getcwd()
+    ).stdout
+    import_s, load_s = map(float, output.strip().splitlines()[-1].split())
+    return {"import": import_s, "load": load_s}
+
+
+def _cold_start(fmt: str, repeats: int) -> Dict[str, Any]:
+    runs = [_cold_load_seconds(*_COLD_LOAD_SNIPPETS[fmt]) for _ in range(repeats)]
+    return {
+        "import": _summarize([run["import"] for run in runs]),
+        "load": _summarize([run["load"] for run in runs]),
+        "total": _summarize([run["import"] + run["load"] for run in runs]),
+    }
+
+
+# Entry points whose import cost a fresh process pays (API pod, predict/train CLI)
+IMPORT_TARGETS = ("src.recommend_price", "app.main", "src.train_model", "pricepilot")
+# Libraries only the training path should load
+HEAVY_MODULES = ("sklearn", "xgboost", "scipy")
+
+
+def _import_seconds(module: str) -> Dict[str, Any]:
+    """Import time of one module in a fresh interpreter and the heavy libraries it loaded."""
+    code = (
+        "import sys, time; sys.path.insert(0, %r); t0 = time.perf_counter(); import %s; "
+        "t1 = time.perf_counter(); print(t1 - t0, ','.join(m for m in %r if m in sys.modules))"
+        % (str(ROOT), module, HEAVY_MODULES)
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True, cwd=os.getcwd()
+    ).stdout
+    seconds, _, loaded = output.strip().splitlines()[-1].partition(" ")
+    return {"seconds": float(seconds), "heavy_modules": [name for name in loaded.split(",") if name]}
+
+
+def bench_import_time(repeats: int) -> Dict[str, Any]:
+    results = {}
+    for module in IMPORT_TARGETS:
+        runs = [_import_seconds(module) for _ in range(repeats)]
+        results[module] = {
+            **_summarize([run["seconds"] for run in runs]),
+            "heavy_modules": runs[-1]["heavy_modules"],
+        }
+    return results
+
+
+def bench_model_load(repeats: int) -> Dict[str, Any]:
+    import joblib
+
+    from src.model_bundle import BUNDLE_DIRNAME, bundle_exists, bundle_size_bytes, load_model_bundle
+
+    results: Dict[str, Any] = {
+        "joblib": {
+            "size_bytes": os.path.getsize("model_enhanced.joblib"),
+            "cold_start": _cold_start("joblib", repeats),
+            "warm": _time_calls(lambda: joblib.load("model_enhanced.joblib"), repeats),
+        }
+    }
+    if bundle_exists(BUNDLE_DIRNAME):
+        results["bundle"] = {
+            "size_bytes": bundle_size_bytes(BUNDLE_DIRNAME),
+            "cold_start": _cold_start("bundle", repeats),
+            "warm": _time_calls(lambda: load_model_bundle(BUNDLE_DIRNAME), repeats),
+        }
+    return results
+
+
+def bench_build_enhanced_features(row_counts: Sequence[int], seed: int) -> Dict[str, Any]:
+    from src.train_model import build_enhanced_features
+
+    results = {}
+    for rows in row_counts:
+        frame = generate_synthetic_orders(rows, seed)
+        started = time.perf_counter()
+        build_enhanced_features(frame)
+        elapsed = time.perf_counter() - started
+        results[str(rows)] = {
+            "total_ms": round(elapsed * 1000.0, 3),
+            "rows_per_s": round(rows / elapsed, 1),
+        }
+    return results
+
+
+def bench_history_cache(rows: int, seed: int, repeats: int) -> Dict[str, Any]:
+    from src import build_history_cache, recommend_price
+    from src.history_store import HistoryStore
+
+    frame = generate_synthetic_orders(rows, seed)
+
+    def build() -> None:
+        with _quiet():
+            build_history_cache.calculate_user_history(frame)
+            build_history_cache.calculate_driver_history(frame)
+
+    with _quiet():
+        recommend_price.load_history_cache()
+    known_user = SAMPLE_ORDER["user_id"]
+    # Отдельный экземпляр: замер не трогает общий кэш и файлы снимков
+    live = HistoryStore(user_path=os.devnull, driver_path=os.devnull)
+    live.loaded = True
+    return {
+        "build": _time_calls(build, repeats=3, warmup=0),
+        "user_lookup_hit": _time_calls(lambda: recommend_price.get_user_features(known_user), repeats),
+        "user_lookup_miss": _time_calls(lambda: recommend_price.get_user_features(-1), repeats),
+        "driver_lookup_hit": _time_calls(
+            lambda: recommend_price.get_driver_features(SAMPLE_ORDER["driver_id"]), repeats
+        ),
+        "outcome_ingest": _time_calls(
+            lambda: live.record_outcome("done", 250.0, 180.0, user_id=known_user, driver_id=SAMPLE_ORDER["driver_id"]),
+            repeats,
+        ),
+    }
+
+
+def _bench_order(index: int, identical: bool) -> Dict[str, Any]:
+    """SAMPLE_ORDER, made distinct per request unless ``identical`` (which coalescing deduplicates)."""
+    if identical:
+        return dict(SAMPLE_ORDER)
+    return {**SAMPLE_ORDER, "distance_in_meters": SAMPLE_ORDER["distance_in_meters"] + index}
+
+
+async def _api_run(concurrency: int, total_requests: int, identical: bool = False) -> Dict[str, Any]:
+    import httpx
+
+    from app import services
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120.0) as client:
+        token_response = await client.post(
+            "/auth/token", data={"username": "demo@example.com", "password": "demo"}
+        )
+        token_response.raise_for_status()
+        headers = {"Authorization": f"Bearer {token_response.json()['access_token']}"}
+        coalesced_before = services.COALESCED_COUNT
+
+        latencies: List[float] = []
+        errors = 0
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for index in range(total_requests):
+            queue.put_nowait(index)
+
+        async def worker() -> None:
+            nonlocal errors
+            while True:
+                try:
+                    index = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.perf_counter()
+                response = await client.post(
+                    "/api/v1/orders/price-recommendation", json=_bench_order(index, identical), headers=headers
+                )
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    summary = _summarize(latencies)
+    summary.update(
+        {
+            "rps": round(total_requests / wall, 3),
+            "errors": errors,
+            "requests": total_requests,
+            "coalesced": services.COALESCED_COUNT - coalesced_before,
+        }
+    )
+    return summary
+
+
+def bench_api_throughput(
+    concurrency_levels: Sequence[int], requests_per_level: int, identical: bool = False
+) -> Dict[str, Any]:
+    """
+    Pricing throughput per concurrency level. By default every request carries a
+    distinct order, so nothing is coalesced; ``identical`` sends the same order
+    to measure single-flight deduplication instead.
+    """
+    return {
+        str(level): asyncio.run(_api_run(level, max(requests_per_level, level), identical))
+        for level in concurrency_levels
+    }
+
+
+def _run_case(name: str, func: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    print(f"[BENCH] {name}...")
+    try:
+        return func()
+    except Exception as exc:
+        traceback.print_exc()
+        return {"error": f"{type(exc).__name__}: {exc}"}
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="pricepilot-bench-"))
+    prepare_workspace(workdir.resolve(), args.train_rows, args.seed)
+
+    results: Dict[str, Any] = {}
+    results["find_optimal_price"] = _run_case(
+        "find_optimal_price", lambda: bench_find_optimal_price(args.num_points, args.repeats)
+    )
+    results["import_time"] = _run_case("import_time", lambda: bench_import_time(args.repeats))
+    results["model_load"] = _run_case("model_load", lambda: bench_model_load(args.repeats))
+    results["build_enhanced_features"] = _run_case(
+        "build_enhanced_features", lambda: bench_build_enhanced_features(args.feature_rows, args.seed)
+    )
+    results["history_cache"] = _run_case(
+        "history_cache", lambda: bench_history_cache(args.train_rows, args.seed, args.repeats * 20)
+    )
+    results["api_throughput"] = _run_case(
+        "api_throughput", lambda: bench_api_throughput(args.concurrency, args.api_requests)
+    )
+    results["api_throughput_coalesced"] = _run_case(
+        "api_throughput_coalesced",
+        lambda: bench_api_throughput(args.concurrency, args.api_requests, identical=True),
+    )
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "train_rows": args.train_rows,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def _flatten(prefix: str, value: Any, out: Dict[str, float]) -> None:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = float(value)
+
+
+def _failed_cases(prefix: str, value: Any, out: List[str]) -> None:
+    if isinstance(value, dict):
+        if "error" in value:
+            out.append(f"{prefix}: ошибка замера: {value['error']}")
+        for key, item in value.items():
+            _failed_cases(f"{prefix}.{key}" if prefix else key, item, out)
+
+
+def compare_with_baseline(
+    current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """
+    Compare latency (``*_ms``) and artifact size (``size_bytes``), lower is
+    better, and throughput (``rps``, ``rows_per_s``), higher is better.
+    A case that raised, a baseline metric missing from the current run and
+    a non-zero ``errors`` count are regressions too.
+    Returns regression messages.
+    """
+    current_flat: Dict[str, float] = {}
+    baseline_flat: Dict[str, float] = {}
+    _flatten("", current.get("results", {}), current_flat)
+    _flatten("", baseline.get("results", {}), baseline_flat)
+
+    regressions: List[str] = []
+    _failed_cases("", current.get("results", {}), regressions)
+    for key, value in sorted(current_flat.items()):
+        if key.rsplit(".", 1)[-1] == "errors" and value > 0:
+            regressions.append(f"{key}: {value:g} запросов с ошибкой")
+    for key, base_value in sorted(baseline_flat.items()):
+        if key not in current_flat:
+            regressions.append(f"{key}: нет в текущем прогоне (было {base_value:g})")
+            continue
+        if base_value <= 0:
+            continue
+        value = current_flat[key]
+        metric = key.rsplit(".", 1)[-1]
+        if metric in {"p50_ms", "p95_ms", "mean_ms", "total_ms", "size_bytes"}:
+            change = value / base_value - 1.0
+        elif metric in {"rps", "rows_per_s"}:
+            change = base_value / value - 1.0 if value > 0 else float("inf")
+        else:
+            continue
+        if change > tolerance:
+            regressions.append(f"{key}: {base_value:g} -> {value:g} ({change * 100:+.1f}% хуже)")
+    return regressions
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк латентности и пропускной способности PricePilot")
+    parser.add_argument("--workdir", help="Каталог для синтетических данных и артефактов (по умолчанию временный)")
+    parser.add_argument("--train-rows", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--num-points", type=int, nargs="+", default=list(DEFAULT_NUM_POINTS))
+    parser.add_argument("--feature-rows", type=int, nargs="+", default=list(DEFAULT_FEATURE_ROWS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=list(DEFAULT_CONCURRENCY))
+    parser.add_argument("--api-requests", type=int, default=16, help="Запросов на каждый уровень конкурентности")
+    parser.add_argument("--output", help="Сохранить результаты в JSON-файл")
+    parser.add_argument("--baseline", help="Сравнить с сохранённым baseline JSON")
+    parser.add_argument("--save-baseline", help="Сохранить результаты как новый baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимое ухудшение (0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    cwd = os.getcwd()
+    try:
+        report = run_benchmarks(args)
+    finally:
+        os.chdir(cwd)
+
+    rendered = json.dumps(report, indent=2, ensure_ascii=False)
+    print(rendered)
+    for target in (args.output, args.save_baseline):
+        if target:
+            Path(target).write_text(rendered + "\n", encoding="utf-8")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n[BENCH] Регрессии относительно {args.baseline}:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print(f"\n[BENCH] Регрессий относительно {args.baseline} нет (допуск {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,33 @@
+"""
+Mock frontend and load generator for the pricing API.
+
+    python scripts/mock_frontend.py                      # one request, prints the response
+    python scripts/mock_frontend.py load --rps 20 --duration 30
+    python scripts/mock_frontend.py load --mode closed --concurrency 8 --orders requests.jsonl
+
+Open-loop mode issues requests on a Poisson schedule at ``--rps`` regardless of
+how fast the server answers; closed-loop mode keeps ``--concurrency`` clients
+busy (optionally paced to ``--rps`` in total). The report contains
+p50/p95/p99 latency, error rate and throughput.
+"""
+
 from __future__ import annotations
 
+import argparse
+import asyncio
+import gzip
 import json
+import math
 import os
+import random
+import sys
+import time
+from collections import Counter
 from datetime import datetime
+from functools import lru_cache
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
 
 import httpx
 
@@ -12,6 +37,26 @@ TOKEN_URL = f"{API_BASE}/auth/token"
 USERNAME = os.getenv("API_USERNAME", "demo@example.com")
 PASSWORD = os.getenv("API_PASSWORD", "demo")
 
+# Hour-of-day weights with morning and evening peaks.
+_HOUR_WEIGHTS = [
+    1, 1, 1, 1, 1, 2, 4, 8, 9, 7, 5, 5,
+    6, 6, 5, 5, 6, 9, 10, 8, 6, 4, 3, 2,
+]
+_CARS = [("LADA", "GRANTA"), ("LADA", "VESTA"), ("Renault", "Logan"), ("Toyota", "Camry"), ("Kia", "Rio")]
+# Zipf exponent for user/driver activity: the id of rank r is picked with weight 1 / r**s.
+ZIPF_EXPONENT = 1.1
+
+
+@lru_cache(maxsize=8)
+def _zipf_cum_weights(pool: int, exponent: float = ZIPF_EXPONENT) -> List[float]:
+    return list(accumulate(1.0 / rank ** exponent for rank in range(1, pool + 1)))
+
+
+def zipf_id(rng: random.Random, pool: int) -> int:
+    """Id in ``[0, pool)`` drawn from a Zipf law: id 0 is the most active, id 1 half as active, ..."""
+    weights = _zipf_cum_weights(pool)
+    return rng.choices(range(pool), cum_weights=weights)[0]
+
 
 def build_order_payload() -> dict:
     return {
@@ -26,6 +71,65 @@ def build_order_payload() -> dict:
     }
 
 
+def synthesize_order(rng: random.Random, user_pool: int = 50_000, driver_pool: int = 10_000) -> dict:
+    """Random order with realistic distance, time-of-day and user-id distributions."""
+    distance = int(min(max(rng.lognormvariate(8.2, 0.7), 300), 60_000))
+    speed_mps = rng.uniform(4.0, 12.0)
+    duration = int(distance / speed_mps) + 30
+    pickup = int(min(max(rng.lognormvariate(6.8, 0.6), 50), 8_000))
+
+    now = datetime.now()
+    hour = rng.choices(range(24), weights=_HOUR_WEIGHTS)[0]
+    order_time = now.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+    carname, carmodel = rng.choice(_CARS)
+
+    return {
+        "order_timestamp": int(order_time.timestamp()),
+        "distance_in_meters": distance,
+        "duration_in_seconds": duration,
+        "pickup_in_meters": pickup,
+        "pickup_in_seconds": int(pickup / rng.uniform(4.0, 9.0)) + 20,
+        "driver_rating": round(rng.choice([4.5, 4.7, 4.8, 4.9, 5.0, 5.0]), 1),
+        "platform": rng.choices(["android", "ios", "web"], weights=[70, 25, 5])[0],
+        "price_start_local": float(round(100 + distance / 1000 * 15 + duration / 60 * 5)),
+        "carname": carname,
+        "carmodel": carmodel,
+        # Zipf: a small share of users and drivers produce most of the orders.
+        "user_id": zipf_id(rng, user_pool),
+        "driver_id": zipf_id(rng, driver_pool),
+    }
+
+
+def load_orders(path: Path) -> List[dict]:
+    """
+    Read orders from JSONL (optionally gzipped, e.g. rotated capture segments):
+    either plain order objects or capture records with an ``order`` key.
+    """
+    orders = []
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            order = record.get("order", record) if isinstance(record, dict) else None
+            if isinstance(order, dict) and "distance_in_meters" in order:
+                orders.append(order)
+    if not orders:
+        raise ValueError(f"No orders found in {path}")
+    return orders
+
+
+def order_stream(orders: Optional[Sequence[dict]], seed: int) -> Iterator[dict]:
+    rng = random.Random(seed)
+    if orders:
+        while True:
+            yield from orders
+    while True:
+        yield synthesize_order(rng)
+
+
 def obtain_access_token(client: httpx.Client) -> str:
     response = client.post(
         TOKEN_URL,
@@ -37,7 +141,178 @@ def obtain_access_token(client: httpx.Client) -> str:
     return token_payload["access_token"]
 
 
-def main() -> None:
+class TokenCache:
+    """Fetches a token once and shares it between all in-flight requests."""
+
+    def __init__(self, client: httpx.AsyncClient) -> None:
+        self._client = client
+        self._token: Optional[str] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self, refresh: bool = False) -> str:
+        if self._token is not None and not refresh:
+            return self._token
+        async with self._lock:
+            if self._token is None or refresh:
+                response = await self._client.post(
+                    TOKEN_URL,
+                    data={"username": USERNAME, "password": PASSWORD},
+                    headers={"Content-Type": "application/x-www-form-urlencoded"},
+                )
+                response.raise_for_status()
+                self._token = response.json()["access_token"]
+            return self._token
+
+
+class LoadStats:
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors = 0
+        self.dropped = 0
+
+    def record(self, latency: float, status: str, ok: bool) -> None:
+        self.latencies.append(latency)
+        self.statuses[status] += 1
+        if not ok:
+            self.errors += 1
+
+    def record_drop(self) -> None:
+        self.dropped += 1
+        self.statuses["dropped"] += 1
+
+    def report(self, wall_seconds: float, target_rps: Optional[float], mode: str) -> Dict[str, Any]:
+        total = len(self.latencies) + self.dropped
+        errors = self.errors + self.dropped
+        ordered = sorted(self.latencies)
+
+        def percentile(q: float) -> Optional[float]:
+            if not ordered:
+                return None
+            index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+            return round(ordered[index] * 1000.0, 2)
+
+        return {
+            "mode": mode,
+            "target_rps": target_rps,
+            "requests": total,
+            "errors": errors,
+            "dropped": self.dropped,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "throughput_rps": round(len(ordered) / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+            "latency_ms": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(ordered[-1] * 1000.0, 2) if ordered else None,
+            },
+            "statuses": dict(self.statuses),
+            "duration_s": round(wall_seconds, 2),
+        }
+
+
+async def _send(client: httpx.AsyncClient, tokens: TokenCache, payload: dict, stats: LoadStats) -> None:
+    started = time.perf_counter()
+    try:
+        token = await tokens.get()
+        response = await client.post(API_URL, json=payload, headers={"Authorization": f"Bearer {token}"})
+        if response.status_code == 401:
+            token = await tokens.get(refresh=True)
+            response = await client.post(API_URL, json=payload, headers={"Authorization": f"Bearer {token}"})
+        stats.record(time.perf_counter() - started, str(response.status_code), response.status_code == 200)
+    except httpx.HTTPError as exc:
+        stats.record(time.perf_counter() - started, type(exc).__name__, False)
+
+
+async def run_open_loop(
+    client: httpx.AsyncClient,
+    tokens: TokenCache,
+    orders: Iterator[dict],
+    rps: float,
+    duration: float,
+    max_inflight: int,
+    stats: LoadStats,
+    seed: int,
+) -> None:
+    rng = random.Random(seed)
+    inflight = asyncio.Semaphore(max_inflight)
+    tasks = set()
+    deadline = time.perf_counter() + duration
+    next_at = time.perf_counter()
+
+    async def fire(payload: dict) -> None:
+        try:
+            await _send(client, tokens, payload, stats)
+        finally:
+            inflight.release()
+
+    while True:
+        next_at += rng.expovariate(rps)
+        if next_at >= deadline:
+            break
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if inflight.locked():
+            # The server fell behind by more than max_inflight requests: count as a client-side drop.
+            stats.record_drop()
+            continue
+        await inflight.acquire()
+        task = asyncio.create_task(fire(next(orders)))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def run_closed_loop(
+    client: httpx.AsyncClient,
+    tokens: TokenCache,
+    orders: Iterator[dict],
+    concurrency: int,
+    duration: float,
+    rps: Optional[float],
+    stats: LoadStats,
+) -> None:
+    deadline = time.perf_counter() + duration
+    interval = concurrency / rps if rps else 0.0
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await _send(client, tokens, next(orders), stats)
+            if interval:
+                pause = interval - (time.perf_counter() - started)
+                if pause > 0:
+                    await asyncio.sleep(pause)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def run_load(args: argparse.Namespace) -> Dict[str, Any]:
+    orders = load_orders(Path(args.orders)) if args.orders else None
+    stream = order_stream(orders, args.seed)
+    pool = args.connections or max(args.concurrency, args.max_inflight if args.mode == "open" else 0, 1)
+    limits = httpx.Limits(max_connections=pool, max_keepalive_connections=pool)
+    stats = LoadStats()
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        tokens = TokenCache(client)
+        await tokens.get()
+        started = time.perf_counter()
+        if args.mode == "open":
+            await run_open_loop(
+                client, tokens, stream, args.rps, args.duration, args.max_inflight, stats, args.seed
+            )
+        else:
+            await run_closed_loop(client, tokens, stream, args.concurrency, args.duration, args.rps, stats)
+        wall = time.perf_counter() - started
+
+    return stats.report(wall, args.rps, args.mode)
+
+
+def run_once() -> None:
     payload = build_order_payload()
     with httpx.Client(timeout=10.0) as client:
         token = obtain_access_token(client)
@@ -50,5 +325,43 @@ def main() -> None:
         print(json.dumps(response.json(), indent=2, ensure_ascii=False))
 
 
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Mock frontend / load generator for the pricing API")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("once", help="Send one order and print the response (default)")
+
+    load = subparsers.add_parser("load", help="Generate load and report latency percentiles")
+    load.add_argument("--mode", choices=("open", "closed"), default="open")
+    load.add_argument("--rps", type=float, default=None, help="Target request rate (required for open loop)")
+    load.add_argument("--duration", type=float, default=30.0, help="Test duration in seconds")
+    load.add_argument("--concurrency", type=int, default=4, help="Closed-loop clients")
+    load.add_argument("--max-inflight", type=int, default=256, help="Open-loop cap on outstanding requests")
+    load.add_argument("--connections", type=int, default=None, help="Connection pool size")
+    load.add_argument("--orders", help="JSONL(.gz) file with orders to replay (e.g. capture/requests.jsonl)")
+    load.add_argument("--timeout", type=float, default=30.0)
+    load.add_argument("--seed", type=int, default=42)
+    load.add_argument("--output", help="Write the JSON report to this file")
+
+    args = parser.parse_args(argv)
+    if args.command == "load" and args.mode == "open" and not args.rps:
+        parser.error("--rps is required in open-loop mode")
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.command != "load":
+        run_once()
+        return
+
+    report = asyncio.run(run_load(args))
+    rendered = json.dumps(report, indent=2, ensure_ascii=False)
+    print(rendered)
+    if args.output:
+        Path(args.output).write_text(rendered + "\n", encoding="utf-8")
+    if report["requests"] == 0:
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     main()
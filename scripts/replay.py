@@ -0,0 +1,446 @@
+"""
+Offline replay of captured pricing traffic through one or two models.
+
+Reads capture segments written by the API (``CAPTURE_ENABLED=1``; plain or
+gzipped JSONL, capture records or bare orders), recomputes the price curve
+and the default-strategy recommendation for every order and, with
+``--candidate``, compares two model artifacts order by order:
+
+* distribution of optimal-price deltas (absolute and relative);
+* zone changes (share of orders plus a ``baseline->candidate`` matrix);
+* distribution of expected-value deltas.
+
+Orders are scored in batches (one model call per batch and grid, see
+``compute_price_curves``) across a pool of worker processes, each limited
+to one model thread. Every model is loaded once in the parent before the
+pool starts, so a broken artifact fails fast instead of crashing workers.
+History features come from ``user_history.joblib`` /
+``driver_history.joblib`` in the working directory, as in the API.
+
+Distributions are accumulated in log-spaced bins (``StreamingDistribution``),
+so memory does not grow with the number of replayed orders.
+
+    python scripts/replay.py capture/requests-*.jsonl.gz \\
+        --baseline models --candidate model_enhanced.joblib \\
+        --output replay_report.json --details replay_orders.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.model_store import CURRENT_FILENAME, ModelStore
+
+MODEL_FILENAME = "model_enhanced.joblib"
+REQUIRED_FIELDS = (
+    "order_timestamp", "distance_in_meters", "duration_in_seconds",
+    "pickup_in_meters", "pickup_in_seconds", "price_start_local",
+)
+# Request-only fields that are not part of the order itself
+IGNORED_FIELDS = ("scenarios",)
+PERCENTILES = (1, 10, 50, 90, 99)
+# Relative error of a reported percentile (log-spaced bins, see StreamingDistribution)
+BIN_PRECISION = 0.005
+# |value| below this is counted as zero
+ZERO_THRESHOLD = 1e-6
+
+# Per-process state, filled by _init_worker
+_MODELS: Dict[str, Tuple[Any, Any]] = {}
+_NUM_POINTS = 500
+_INIT_ERROR: Optional[str] = None
+
+
+def iter_orders(paths: Iterable[Path]) -> Iterator[dict]:
+    """Stream orders from JSONL/JSONL.gz files: capture records (``order`` key) or plain orders."""
+    for path in paths:
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                order = record.get("order", record) if isinstance(record, dict) else None
+                if isinstance(order, dict) and "distance_in_meters" in order:
+                    yield order
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def resolve_model_path(path: str) -> str:
+    """
+    Path of the model artifact behind ``path``.
+
+    Accepts a model file, a version directory holding ``model_enhanced.joblib``
+    (and/or ``model_bundle/``), a ``CURRENT`` pointer file, or a models/ root,
+    which is resolved through its ``CURRENT`` pointer like the API does.
+    """
+    if os.path.isfile(path) and os.path.basename(path) == CURRENT_FILENAME:
+        path = os.path.dirname(path) or "."
+    if not os.path.isdir(path):
+        return path
+    if os.path.exists(os.path.join(path, CURRENT_FILENAME)):
+        version = ModelStore(None, models_dir=path).current_pointer()
+        if version is None:
+            raise FileNotFoundError(f"Empty {CURRENT_FILENAME} pointer in {path}")
+        path = os.path.join(path, version)
+    return os.path.join(path, MODEL_FILENAME)
+
+
+def normalize_order(order: dict) -> dict:
+    """Bring a captured order to the dict the ML module receives from the API."""
+    missing = [field for field in REQUIRED_FIELDS if order.get(field) is None]
+    if missing:
+        raise ValueError(f"missing fields: {', '.join(missing)}")
+    normalized = {key: value for key, value in order.items() if key not in IGNORED_FIELDS}
+    normalized["driver_rating"] = float(normalized.get("driver_rating", 5.0))
+    normalized["price_start_local"] = float(normalized["price_start_local"])
+    return normalized
+
+
+def _limit_model_threads(model: Any) -> None:
+    """One xgboost thread per process: parallelism comes from the worker pool."""
+    booster = getattr(model, "booster", None)
+    if booster is not None:
+        booster.set_param({"nthread": 1})
+        return
+    for calibrated in getattr(model, "calibrated_classifiers_", []):
+        estimator = getattr(calibrated, "estimator", None)
+        if hasattr(estimator, "set_params"):
+            estimator.set_params(n_jobs=1)
+
+
+def load_models(model_paths: Dict[str, str]) -> Dict[str, Tuple[Any, Any]]:
+    """Load every model; raises with the label of the first one that does not load."""
+    from src.recommend_price import load_model_artifacts
+
+    models = {}
+    for label, path in model_paths.items():
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model not found ({label}): {path}")
+        try:
+            models[label] = load_model_artifacts(path)
+        except Exception as exc:
+            raise RuntimeError(f"Cannot load {label} model {path}: {type(exc).__name__}: {exc}") from exc
+    return models
+
+
+def _install_models(models: Dict[str, Tuple[Any, Any]], num_points: int, single_thread: bool) -> None:
+    global _NUM_POINTS
+    _NUM_POINTS = num_points
+    for model, _ in models.values():
+        if single_thread:
+            _limit_model_threads(model)
+    _MODELS.update(models)
+
+
+def _init_worker(model_paths: Dict[str, str], num_points: int, single_thread: bool) -> None:
+    global _INIT_ERROR
+    if single_thread:
+        os.environ["OMP_NUM_THREADS"] = "1"
+    # An exception here would make the pool respawn the worker forever:
+    # keep it and fail every chunk instead, which stops the run
+    try:
+        models = load_models(model_paths)
+    except Exception as exc:
+        _INIT_ERROR = str(exc)
+        return
+    _install_models(models, num_points, single_thread)
+
+
+def _score(orders: List[dict]) -> Dict[str, List[dict]]:
+    from src.recommend_price import build_order_features, compute_price_curves, evaluate_strategy
+
+    # Order features do not depend on the model: built once, shared by both
+    order_features = build_order_features(orders)
+    scored = {}
+    for label, (model, feature_stats) in _MODELS.items():
+        curves = compute_price_curves(
+            orders, model, num_points=_NUM_POINTS, feature_stats=feature_stats, order_features=order_features
+        )
+        scored[label] = [
+            evaluate_strategy(order, curve)["optimal_price"] for order, curve in zip(orders, curves)
+        ]
+    return scored
+
+
+def replay_chunk(chunk: List[dict]) -> List[dict]:
+    """
+    Score a chunk of raw orders with every loaded model.
+
+    Returns one entry per order: ``{label: optimal_price}`` or ``{"error": ...}``.
+    A failing batch is retried order by order so one bad order costs only itself.
+    """
+    if _INIT_ERROR is not None:
+        raise RuntimeError(f"Worker could not load models: {_INIT_ERROR}")
+    results: List[dict] = [{} for _ in chunk]
+    valid: List[Tuple[int, dict]] = []
+    for index, order in enumerate(chunk):
+        try:
+            valid.append((index, normalize_order(order)))
+        except (ValueError, TypeError) as exc:
+            results[index] = {"error": str(exc)}
+    if not valid:
+        return results
+
+    try:
+        scored = _score([order for _, order in valid])
+        for position, (index, _) in enumerate(valid):
+            results[index] = {label: optimal[position] for label, optimal in scored.items()}
+    except Exception:
+        for index, order in valid:
+            try:
+                scored = _score([order])
+                results[index] = {label: optimal[0] for label, optimal in scored.items()}
+            except Exception as exc:
+                results[index] = {"error": f"{type(exc).__name__}: {exc}"}
+    return results
+
+
+class StreamingDistribution:
+    """
+    Count, mean, std, min/max and percentiles of a stream in bounded memory.
+
+    Values go to log-spaced bins (separately for negative and positive values)
+    sized so that a percentile is reported with a relative error of at most
+    ``precision``; the number of bins is bounded by the range of magnitudes,
+    not by the number of values.
+    """
+
+    def __init__(self, precision: float = BIN_PRECISION) -> None:
+        self.gamma = (1.0 + precision) / (1.0 - precision)
+        self.log_gamma = math.log(self.gamma)
+        # (sign, bin index) -> count; sign 0 is the zero bin
+        self.bins: Dict[Tuple[int, int], int] = {}
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        value = float(value)
+        if abs(value) < ZERO_THRESHOLD:
+            key = (0, 0)
+        else:
+            key = (1 if value > 0 else -1, math.ceil(math.log(abs(value)) / self.log_gamma))
+        self.bins[key] = self.bins.get(key, 0) + 1
+        # Welford: mean and variance without keeping the values
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _bin_value(self, key: Tuple[int, int]) -> float:
+        sign, index = key
+        return sign * 2.0 * self.gamma ** index / (self.gamma + 1.0)
+
+    def percentiles(self, quantiles: Iterable[float]) -> List[float]:
+        ordered = sorted(self.bins.items(), key=lambda item: self._bin_value(item[0]))
+        results = []
+        for q in quantiles:
+            rank = q / 100.0 * (self.count - 1)
+            cumulative = 0
+            for key, count in ordered:
+                cumulative += count
+                if cumulative > rank:
+                    break
+            results.append(min(max(self._bin_value(key), self.min), self.max))
+        return results
+
+    def summary(self) -> Optional[Dict[str, float]]:
+        if not self.count:
+            return None
+        summary = {"count": self.count, "mean": self.mean, "std": math.sqrt(self._m2 / self.count)}
+        summary.update({f"p{q}": value for q, value in zip(PERCENTILES, self.percentiles(PERCENTILES))})
+        summary.update(min=self.min, max=self.max)
+        return {key: round(value, 4) for key, value in summary.items()}
+
+
+class ReplayReport:
+    """Accumulates per-order results into streaming distributions and zone counters."""
+
+    def __init__(self, labels: List[str]) -> None:
+        self.labels = labels
+        self.orders = 0
+        self.errors: Counter = Counter()
+        self.values: Dict[str, Dict[str, StreamingDistribution]] = {
+            label: {key: StreamingDistribution() for key in ("price", "probability_percent", "expected_value")}
+            for label in labels
+        }
+        self.zones: Dict[str, Counter] = {label: Counter() for label in labels}
+        self.deltas: Dict[str, StreamingDistribution] = {
+            key: StreamingDistribution() for key in ("price", "abs_price", "price_pct", "expected_value")
+        }
+        self.transitions: Counter = Counter()
+
+    def add(self, result: dict) -> None:
+        self.orders += 1
+        if "error" in result:
+            self.errors[result["error"]] += 1
+            return
+        for label in self.labels:
+            optimal = result[label]
+            for key, values in self.values[label].items():
+                values.add(optimal[key])
+            self.zones[label][str(optimal["zone_id"])] += 1
+        if len(self.labels) == 2:
+            baseline, candidate = (result[label] for label in self.labels)
+            delta = candidate["price"] - baseline["price"]
+            self.deltas["price"].add(delta)
+            self.deltas["abs_price"].add(abs(delta))
+            if baseline["price"]:
+                self.deltas["price_pct"].add(delta / baseline["price"] * 100.0)
+            self.deltas["expected_value"].add(candidate["expected_value"] - baseline["expected_value"])
+            self.transitions[f"{baseline['zone_id']}->{candidate['zone_id']}"] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        scored = self.orders - sum(self.errors.values())
+        report: Dict[str, Any] = {
+            "orders": self.orders,
+            "scored": scored,
+            "errors": sum(self.errors.values()),
+            "error_kinds": dict(self.errors.most_common(10)),
+            "models": {
+                label: {
+                    **{key: values.summary() for key, values in self.values[label].items()},
+                    "zones": dict(sorted(self.zones[label].items())),
+                }
+                for label in self.labels
+            },
+        }
+        if len(self.labels) == 2:
+            changed = sum(count for key, count in self.transitions.items() if key.split("->")[0] != key.split("->")[1])
+            report["comparison"] = {
+                "price_delta": self.deltas["price"].summary(),
+                "abs_price_delta": self.deltas["abs_price"].summary(),
+                "price_delta_pct": self.deltas["price_pct"].summary(),
+                "expected_value_delta": self.deltas["expected_value"].summary(),
+                "zone_change_rate": round(changed / scored, 6) if scored else None,
+                "zone_transitions": dict(sorted(self.transitions.items())),
+            }
+        return report
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    model_paths = {"baseline": resolve_model_path(args.baseline)}
+    if args.candidate:
+        model_paths["candidate"] = resolve_model_path(args.candidate)
+    # Validated in the parent: a model that does not load must not reach the pool
+    models = load_models(model_paths)
+
+    orders: Iterable[dict] = iter_orders(args.inputs)
+    if args.limit:
+        orders = islice(orders, args.limit)
+    chunks = chunked(orders, args.batch_size)
+
+    report = ReplayReport(list(model_paths))
+    details = args.details.open("w", encoding="utf-8") if args.details else None
+    started = time.perf_counter()
+    last_progress = started
+
+    def consume(results: List[dict]) -> None:
+        nonlocal last_progress
+        for result in results:
+            report.add(result)
+            if details is not None:
+                details.write(json.dumps(result, ensure_ascii=False) + "\n")
+        now = time.perf_counter()
+        if now - last_progress >= 10:
+            last_progress = now
+            rate = report.orders / (now - started)
+            print(f"[replay] {report.orders} orders, {rate:.0f} orders/s", file=sys.stderr)
+
+    try:
+        if args.workers <= 1:
+            _install_models(models, args.num_points, single_thread=False)
+            for chunk in chunks:
+                consume(replay_chunk(chunk))
+        else:
+            models.clear()
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(
+                args.workers, initializer=_init_worker, initargs=(model_paths, args.num_points, True)
+            ) as pool:
+                for results in pool.imap(replay_chunk, chunks, chunksize=1):
+                    consume(results)
+    finally:
+        if details is not None:
+            details.close()
+
+    elapsed = time.perf_counter() - started
+    summary = report.summary()
+    summary.update(
+        created_at=datetime.now().isoformat(timespec="seconds"),
+        inputs=[str(path) for path in args.inputs],
+        model_paths=model_paths,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        num_points=args.num_points,
+        elapsed_seconds=round(elapsed, 3),
+        orders_per_second=round(report.orders / elapsed, 1) if elapsed > 0 else None,
+    )
+    return summary
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay captured orders offline and compare two models.")
+    parser.add_argument("inputs", nargs="+", type=Path, help="Capture JSONL or JSONL.gz files")
+    parser.add_argument(
+        "--baseline", default=MODEL_FILENAME,
+        help="Model file, version directory, models/ root or its CURRENT pointer",
+    )
+    parser.add_argument("--candidate", help="Second model to compare against the baseline (same forms)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--batch-size", type=int, default=64, help="Orders per model call")
+    parser.add_argument("--num-points", type=int, default=500, help="Price grid points per order")
+    parser.add_argument("--limit", type=int, help="Replay only the first N orders")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here")
+    parser.add_argument("--details", type=Path, help="Write per-order results (JSONL) here")
+    args = parser.parse_args(argv)
+    if args.batch_size < 1 or args.num_points < 2:
+        parser.error("--batch-size must be >= 1 and --num-points >= 2")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    summary = run(args)
+    text = json.dumps(summary, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+        print(f"Report saved to {args.output}")
+    print(text)
+    return 0 if summary["scored"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
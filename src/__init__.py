@@ -1,4 +1,17 @@
-from . import train_model
-from . import recommend_price
+"""
+ML-модули PricePilot.
+
+Подмодули импортируются лениво (при первом обращении к src.train_model или
+src.recommend_price), поэтому `from src.timing import stage` в сервисе не тянет
+за собой стек обучения (sklearn, xgboost).
+"""
+
+import importlib
 
 __all__ = ['train_model', 'recommend_price']
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,43 @@
+"""
+Атомарная запись файлов артефактов и состояния.
+
+Содержимое пишется во временный файл рядом с целевым (<путь>.tmp) и подменяет
+его через os.replace, поэтому читатель (сервис, горячая замена модели, снимки
+истории) видит либо старую, либо новую версию файла целиком. При ошибке записи
+временный файл удаляется, целевой не меняется.
+
+Использование:
+    with atomic_open(path) as handle:            # текст, utf-8
+        json.dump(report, handle)
+    with atomic_open(path, "wb") as handle:      # байты, joblib.dump(value, handle) и т.п.
+        handle.write(payload)
+"""
+
+import os
+from contextlib import contextmanager
+
+TMP_SUFFIX = ".tmp"
+
+
+@contextmanager
+def atomic_open(path, mode="w", encoding="utf-8"):
+    """
+    Открывает временный файл для записи; при выходе без ошибки он заменяет path.
+
+    Args:
+        path: целевой файл
+        mode: 'w' (текст) или 'wb' (байты)
+        encoding: кодировка текстового режима
+
+    Yields:
+        Открытый файловый объект
+    """
+    tmp_path = f"{os.fspath(path)}{TMP_SUFFIX}"
+    try:
+        with open(tmp_path, mode, encoding=None if "b" in mode else encoding) as handle:
+            yield handle
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
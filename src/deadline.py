@@ -0,0 +1,128 @@
+"""
+Онлайн-оценки латентности этапов рекомендации и выбор разрешения сетки под дедлайн.
+
+Время этапа моделируется линейно по размеру работы:
+
+    секунды ≈ накладные расходы + стоимость единицы × размер
+
+(размер — число строк для вызова модели, число точек кривой для оценки
+стратегий). Коэффициенты подгоняются экспоненциально взвешенной регрессией
+по каждому наблюдению, поэтому оценки следуют за нагрузкой процесса
+(конкуренция за CPU, другая модель после горячей замены).
+"""
+
+import threading
+from time import perf_counter
+
+# Уровни разрешения: (точек грубой сетки, точек точной сетки); первый — полный расчёт
+RESOLUTION_LEVELS = ((150, 500), (100, 300), (60, 150), (30, 60))
+# Доля оставшегося бюджета, которую разрешено планировать (запас на ответ и сериализацию)
+BUDGET_SAFETY = 0.8
+# Вес нового наблюдения в оценках
+LATENCY_DECAY = 0.05
+
+
+class LatencyEstimator:
+    """
+    Экспоненциально взвешенная регрессия секунд по размеру работы.
+
+    Args:
+        overhead: априорные накладные расходы, с
+        per_unit: априорная стоимость единицы работы, с
+        prior_sizes: размеры двух псевдонаблюдений априорной оценки
+        decay: вес нового наблюдения
+    """
+
+    def __init__(self, overhead, per_unit, prior_sizes=(1.0, 1000.0), decay=LATENCY_DECAY):
+        self.prior_per_unit = per_unit
+        self.decay = decay
+        self.observations = 0
+        self._lock = threading.Lock()
+        # Взвешенные суммы: w, w·x, w·y, w·x², w·x·y
+        self._sums = [0.0] * 5
+        for size in prior_sizes:
+            self._add(size, overhead + per_unit * size, 1.0)
+
+    def _add(self, size, seconds, weight):
+        self._sums[0] += weight
+        self._sums[1] += weight * size
+        self._sums[2] += weight * seconds
+        self._sums[3] += weight * size * size
+        self._sums[4] += weight * size * seconds
+
+    def observe(self, size, seconds):
+        with self._lock:
+            self._sums = [value * (1.0 - self.decay) for value in self._sums]
+            self._add(float(size), float(seconds), self.decay)
+            self.observations += 1
+
+    def coefficients(self):
+        """(накладные расходы, стоимость единицы) по текущим суммам."""
+        with self._lock:
+            weight, sum_x, sum_y, sum_xx, sum_xy = self._sums
+        mean_x, mean_y = sum_x / weight, sum_y / weight
+        variance = sum_xx / weight - mean_x * mean_x
+        # Все наблюдения одного размера: наклон не определяется, берётся априорный
+        per_unit = (sum_xy / weight - mean_x * mean_y) / variance if variance > 1e-9 else self.prior_per_unit
+        per_unit = max(per_unit, 0.0)
+        return max(mean_y - per_unit * mean_x, 0.0), per_unit
+
+    def predict(self, size):
+        overhead, per_unit = self.coefficients()
+        return overhead + per_unit * size
+
+
+class StageTimer:
+    """Контекстный менеджер: время блока уходит в оценку латентности с заданным размером."""
+
+    def __init__(self, estimator, size):
+        self.estimator = estimator
+        self.size = size
+
+    def __enter__(self):
+        self._started = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.estimator.observe(self.size, perf_counter() - self._started)
+        return False
+
+
+def request_deadline(order_data):
+    """
+    Абсолютный дедлайн запроса по perf_counter или None.
+
+    Сервис передаёт deadline_at (отсчёт от приёма запроса); при прямом вызове
+    достаточно deadline_ms — бюджет отсчитывается с этого момента.
+    """
+    deadline_at = order_data.get('deadline_at')
+    if deadline_at is not None:
+        return float(deadline_at)
+    deadline_ms = order_data.get('deadline_ms')
+    if deadline_ms:
+        return perf_counter() + float(deadline_ms) / 1000.0
+    return None
+
+
+def remaining_seconds(deadline):
+    return None if deadline is None else deadline - perf_counter()
+
+
+def choose_resolution(remaining, predict_cost, levels=RESOLUTION_LEVELS, safety=BUDGET_SAFETY):
+    """
+    Самый подробный уровень, чья оценка времени укладывается в бюджет.
+
+    Args:
+        remaining: оставшийся бюджет, с (None — без дедлайна)
+        predict_cost: функция (грубая сетка, точная сетка) -> оценка секунд
+
+    Returns:
+        (грубая сетка, точная сетка, понижено ли разрешение)
+    """
+    if remaining is None:
+        return levels[0] + (False,)
+    for index, (coarse_points, num_points) in enumerate(levels):
+        if predict_cost(coarse_points, num_points) <= remaining * safety:
+            return coarse_points, num_points, index > 0
+    return levels[-1] + (True,)
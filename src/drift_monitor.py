@@ -0,0 +1,359 @@
+"""
+Онлайн-мониторинг дрейфа признаков и предсказаний с постоянной памятью.
+
+При обучении по отложенной выборке сохраняется эталонный профиль
+(drift_profile.json рядом с моделью): для каждого ключевого признака —
+границы бинов по квантилям и доли строк в бинах, для категорий — доли значений.
+
+В сервисе каждое оценённое предложение раскладывается по тем же бинам
+(фиксированное число счётчиков на признак, O(1) на запрос). Гистограммы
+с общими границами складываются, поэтому окна объединяются простым сложением.
+Расхождение с эталоном — PSI (population stability index) по каждому признаку.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+
+import numpy as np
+
+try:
+    from .atomic_write import atomic_open
+except ImportError:  # запуск как скрипт или через sys.path (main.py)
+    from atomic_write import atomic_open
+
+DRIFT_PROFILE_FILENAME = "drift_profile.json"
+PROFILE_FORMAT_VERSION = 2
+PROFILE_BINS = 10
+REPORT_QUANTILES = (0.5, 0.9)
+PSI_EPSILON = 1e-4
+# На малых выборках PSI шумит: ниже этого числа наблюдений он не считается
+MIN_PSI_OBSERVATIONS = 50
+# Пороги PSI: выше PSI_WARNING — заметный сдвиг, выше PSI_ALERT — сильный
+PSI_WARNING = 0.1
+PSI_ALERT = 0.25
+OTHER_CATEGORY = "__other__"
+
+# Сырые поля заказа, которые приходят в API и есть в train.csv
+MONITORED_FEATURES = (
+    'distance_in_meters',
+    'duration_in_seconds',
+    'pickup_in_meters',
+    'pickup_in_seconds',
+    'driver_rating',
+    'price_start_local',
+)
+MONITORED_CATEGORIES = ('platform',)
+# Сигналы рекомендации: вероятность принятия и наценка (цена / стартовая) в оптимуме.
+# Эталон строится тем же путём рекомендации на отложенных заказах (train_model)
+RECOMMENDATION_SIGNALS = ('acceptance_probability', 'bid_ratio')
+
+
+def _numeric_profile(values, bins):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return None
+    inner = np.quantile(values, np.linspace(0.0, 1.0, bins + 1)[1:-1])
+    edges = sorted(set(float(edge) for edge in inner))
+    # side='right' — те же бины, что и bisect_right в Histogram.update
+    counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+    return {
+        "edges": edges,
+        "reference": [float(count) / len(values) for count in counts],
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "quantiles": {str(q): float(np.quantile(values, q)) for q in REPORT_QUANTILES},
+    }
+
+
+def build_reference_profile(frame, recommendations=None, bins=PROFILE_BINS):
+    """
+    Строит эталонный профиль по отложенной выборке.
+
+    Args:
+        frame: DataFrame с сырыми полями заказа (MONITORED_FEATURES, platform)
+        recommendations: dict сигнал -> значения (RECOMMENDATION_SIGNALS), посчитанные
+                         рекомендацией на отложенных заказах — то же, что сервис
+                         наблюдает в ответах; без него сигналы не мониторятся
+        bins: число бинов (по квантилям) на признак
+
+    Returns:
+        dict профиля (сериализуется в JSON)
+    """
+    numeric = {}
+    for name in MONITORED_FEATURES:
+        if name in frame:
+            numeric[name] = _numeric_profile(frame[name].to_numpy(dtype=np.float64), bins)
+    for name in RECOMMENDATION_SIGNALS:
+        if recommendations and name in recommendations:
+            numeric[name] = _numeric_profile(recommendations[name], bins)
+
+    categorical = {}
+    for name in MONITORED_CATEGORIES:
+        if name in frame:
+            shares = frame[name].astype(str).value_counts(normalize=True)
+            categorical[name] = {"reference": {str(k): float(v) for k, v in shares.items()}}
+
+    return {
+        "format_version": PROFILE_FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "rows": int(len(frame)),
+        "numeric": {name: spec for name, spec in numeric.items() if spec is not None},
+        "categorical": categorical,
+    }
+
+
+def save_reference_profile(profile, path=DRIFT_PROFILE_FILENAME):
+    with atomic_open(path) as handle:
+        json.dump(profile, handle, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_reference_profile(path):
+    """Профиль из JSON; None, если файла нет (модель обучена до появления мониторинга)."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as handle:
+        profile = json.load(handle)
+    if profile.get("format_version") != PROFILE_FORMAT_VERSION:
+        print(f"[WARN] Неподдерживаемая версия профиля дрейфа: {path}")
+        return None
+    return profile
+
+
+def population_stability_index(actual, expected):
+    """PSI между наблюдаемыми и эталонными долями (пустые бины сглаживаются)."""
+    total = sum(actual)
+    if total == 0:
+        return None
+    psi = 0.0
+    for count, reference in zip(actual, expected):
+        observed = max(count / total, PSI_EPSILON)
+        reference = max(reference, PSI_EPSILON)
+        psi += (observed - reference) * math.log(observed / reference)
+    return psi
+
+
+def drift_level(psi):
+    """'stable', 'warning' (PSI > PSI_WARNING) или 'alert' (PSI > PSI_ALERT); None, если PSI не посчитан."""
+    if psi is None:
+        return None
+    if psi > PSI_ALERT:
+        return "alert"
+    return "warning" if psi > PSI_WARNING else "stable"
+
+
+class Histogram:
+    """Счётчики по фиксированным границам эталона; память не зависит от трафика."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.edges = spec["edges"]
+        self.counts = [0] * (len(self.edges) + 1)
+        self.missing = 0
+
+    def update(self, value):
+        if value is None or not math.isfinite(value):
+            self.missing += 1
+            return
+        self.counts[bisect_right(self.edges, value)] += 1
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.missing += other.missing
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def quantile(self, q):
+        """Оценка квантиля: линейная интерполяция внутри бина (крайние бины ограничены min/max эталона)."""
+        total = self.total
+        if total == 0:
+            return None
+        target = q * total
+        bounds = [min(self.spec["min"], self.edges[0]) if self.edges else self.spec["min"]]
+        bounds += self.edges
+        bounds.append(max(self.spec["max"], self.edges[-1]) if self.edges else self.spec["max"])
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= target:
+                share = (target - seen) / count
+                return bounds[index] + share * (bounds[index + 1] - bounds[index])
+            seen += count
+        return bounds[-1]
+
+    def psi(self):
+        return population_stability_index(self.counts, self.spec["reference"])
+
+
+class CategoryCounter:
+    """Счётчики эталонных категорий; всё остальное — в одну корзину OTHER_CATEGORY."""
+
+    def __init__(self, spec):
+        self.reference = spec["reference"]
+        self.counts = dict.fromkeys(list(self.reference) + [OTHER_CATEGORY], 0)
+
+    def update(self, value):
+        key = str(value)
+        self.counts[key if key in self.reference else OTHER_CATEGORY] += 1
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.counts[key] += count
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def psi(self):
+        keys = list(self.counts)
+        return population_stability_index(
+            [self.counts[key] for key in keys], [self.reference.get(key, 0.0) for key in keys]
+        )
+
+
+class DriftWindow:
+    """Набор скетчей за одно окно времени."""
+
+    def __init__(self, profile):
+        self.started_at = time.time()
+        self.observations = 0
+        self.sketches = {name: Histogram(spec) for name, spec in profile["numeric"].items()}
+        self.sketches.update(
+            {name: CategoryCounter(spec) for name, spec in profile.get("categorical", {}).items()}
+        )
+
+    def merge(self, other):
+        self.observations += other.observations
+        for name, sketch in other.sketches.items():
+            self.sketches[name].merge(sketch)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class DriftMonitor:
+    """
+    Скользящее сравнение живого трафика с эталоном активной модели.
+
+    Хранит два окна (текущее и предыдущее); отчёт строится по их сумме,
+    так что всегда покрывает от одного до двух окон window_seconds.
+
+    Args:
+        profile_source: функция () -> (ключ модели, путь к drift_profile.json);
+                        при смене ключа профиль перечитывается, окна сбрасываются
+        window_seconds: длина окна
+    """
+
+    def __init__(self, profile_source, window_seconds=3600.0):
+        self.profile_source = profile_source
+        self.window_seconds = window_seconds
+        self.profile = None
+        self.profile_key = None
+        self._resolved = False
+        self._current = None
+        self._previous = None
+        self._lock = threading.Lock()
+        self.observations_total = 0
+        self.skipped_total = 0
+
+    def configure(self, window_seconds=None):
+        if window_seconds is not None:
+            self.window_seconds = window_seconds
+
+    def _refresh_profile(self):
+        key, path = self.profile_source()
+        if self._resolved and key == self.profile_key:
+            return
+        profile = load_reference_profile(path) if path else None
+        with self._lock:
+            self._resolved = True
+            self.profile_key = key
+            self.profile = profile
+            self._current = DriftWindow(profile) if profile else None
+            self._previous = None
+        if profile is None:
+            print(f"[WARN] Профиль дрейфа не найден для модели {key}: мониторинг дрейфа выключен")
+
+    def _rotate(self):
+        """Начинает новое окно; после простоя дольше двух окон старые данные отбрасываются."""
+        elapsed = time.time() - self._current.started_at
+        if elapsed >= self.window_seconds:
+            self._previous = self._current if elapsed < 2 * self.window_seconds else None
+            self._current = DriftWindow(self.profile)
+
+    def observe(self, order_data, optimal_price=None, probability=None):
+        """
+        Учитывает один оценённый заказ (вызывается из фонового потока).
+
+        Args:
+            order_data: dict с полями заказа
+            optimal_price: рекомендованная цена
+            probability: вероятность принятия рекомендованной цены (0..1)
+        """
+        self._refresh_profile()
+        with self._lock:
+            if self._current is None:
+                self.skipped_total += 1
+                return
+            self._rotate()
+            window = self._current
+
+            start_price = _to_float(order_data.get('price_start_local'))
+            price = _to_float(optimal_price)
+            values = {name: _to_float(order_data.get(name)) for name in MONITORED_FEATURES}
+            values['acceptance_probability'] = _to_float(probability)
+            values['bid_ratio'] = price / start_price if price is not None and start_price else None
+            for name, sketch in window.sketches.items():
+                if isinstance(sketch, Histogram):
+                    sketch.update(values.get(name))
+                else:
+                    sketch.update(order_data.get(name))
+            window.observations += 1
+            self.observations_total += 1
+
+    def report(self):
+        """
+        PSI и живые квантили по каждому признаку за последние одно-два окна.
+
+        Returns:
+            dict: model, observations, window_seconds, features {name: {psi, level, live, reference}}
+        """
+        with self._lock:
+            if self._current is None:
+                return {"model": self.profile_key, "observations": 0, "features": {}}
+            self._rotate()
+            merged = DriftWindow(self.profile)
+            if self._previous is not None:
+                merged.merge(self._previous)
+            merged.merge(self._current)
+            covered = time.time() - (self._previous or self._current).started_at
+
+        features = {}
+        for name, sketch in merged.sketches.items():
+            total = sketch.total
+            psi = sketch.psi() if total >= MIN_PSI_OBSERVATIONS else None
+            entry = {"psi": psi, "level": drift_level(psi), "count": total}
+            if isinstance(sketch, Histogram):
+                spec = self.profile["numeric"][name]
+                entry["live"] = {str(q): sketch.quantile(q) for q in REPORT_QUANTILES}
+                entry["reference"] = spec["quantiles"]
+                entry["missing"] = sketch.missing
+            features[name] = entry
+        return {
+            "model": self.profile_key,
+            "observations": merged.observations,
+            "window_seconds": round(covered, 1),
+            "features": features,
+        }
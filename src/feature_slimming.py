@@ -0,0 +1,147 @@
+"""
+Отбор признаков по вкладу в модель и оценка «облегчённых» моделей.
+
+Признаки ранжируются по суммарному gain полной модели, затем для каждого K
+модель переобучается на топ-K признаках. Для каждого K сравниваются качество
+(ROC-AUC, PR-AUC на валидационной части обучающей выборки), латентность
+инференса (одна строка и пачка из REQUEST_BATCH_ROWS строк — столько оценок
+делает один запрос рекомендации) и размер бустера. Выбирается наименьшее K,
+у которого ROC-AUC не хуже полной модели больше чем на max_auc_drop.
+
+Тестовая выборка в отборе не участвует (ни в eval_set, ни в ранжировании, ни
+в выборе K): иначе итоговый ROC-AUC (test) был бы завышен отбором под неё.
+"""
+
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+try:
+    from .atomic_write import atomic_open
+except ImportError:  # запуск как скрипт или через sys.path (main.py)
+    from atomic_write import atomic_open
+
+FEATURE_SLIMMING_FILENAME = "feature_slimming.json"
+DEFAULT_SLIM_K_VALUES = (10, 20, 30, 45, 60, 80)
+DEFAULT_MAX_AUC_DROP = 0.005
+# Доля обучающей выборки, откладываемая под валидацию отбора
+VALIDATION_SIZE = 0.2
+# Грубая сетка (150) + точная сетка (500) цен на один заказ
+REQUEST_BATCH_ROWS = 650
+LATENCY_REPEATS = 200
+
+
+def rank_features_by_gain(model, feature_names):
+    """
+    Признаки по убыванию суммарного gain (total_gain) в деревьях модели.
+
+    Признаки, не использованные ни в одном сплите, идут в конец (gain 0).
+
+    Returns:
+        list[(имя, gain)]
+    """
+    scores = model.get_booster().get_score(importance_type='total_gain')
+    ranked = [(name, float(scores.get(name, 0.0))) for name in feature_names]
+    # sorted устойчив: при равном gain сохраняется исходный порядок признаков
+    return sorted(ranked, key=lambda item: -item[1])
+
+
+def evaluate_classifier(calibrated_model, X_test, y_test):
+    """ROC-AUC и PR-AUC на отложенной выборке (те же метрики, что в train_model)."""
+    from sklearn.metrics import auc, precision_recall_curve, roc_auc_score
+    
+    y_pred = calibrated_model.predict_proba(X_test)[:, 1]
+    precision, recall, _ = precision_recall_curve(y_test, y_pred)
+    return {
+        'roc_auc': float(roc_auc_score(y_test, y_pred)),
+        'pr_auc': float(auc(recall, precision)),
+    }
+
+
+def _median_seconds(call, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+
+def measure_inference_cost(model, X_sample, repeats=LATENCY_REPEATS):
+    """
+    Латентность и размер бустера так, как модель используется в сервисе
+    (inplace_predict по матрице float32, см. model_bundle).
+
+    Returns:
+        dict: row_latency_us, request_batch_ms, booster_bytes
+    """
+    booster = model.get_booster()
+    matrix = np.ascontiguousarray(X_sample.to_numpy(dtype=np.float32))
+    row = matrix[:1]
+    batch = np.resize(matrix, (REQUEST_BATCH_ROWS, matrix.shape[1]))
+    booster.inplace_predict(batch)  # прогрев
+    return {
+        'row_latency_us': round(_median_seconds(lambda: booster.inplace_predict(row), repeats) * 1e6, 1),
+        'request_batch_ms': round(_median_seconds(lambda: booster.inplace_predict(batch), max(repeats // 10, 5)) * 1e3, 3),
+        'booster_bytes': len(booster.save_raw(raw_format='ubj')),
+    }
+
+
+def sweep_feature_subsets(fit, X_fit, y_fit, X_val, y_val, ranking, k_values=DEFAULT_SLIM_K_VALUES):
+    """
+    Переобучает модель на топ-K признаках для каждого K.
+
+    Args:
+        fit: функция (X_fit, y_fit, X_val, y_val) -> (модель XGBoost, калиброванная модель)
+        X_fit, y_fit: обучающая часть (без валидационной)
+        X_val, y_val: валидационная часть, по которой сравниваются K
+        ranking: результат rank_features_by_gain
+        k_values: размеры подмножеств; полный набор добавляется всегда
+
+    Returns:
+        list[dict]: k, features, roc_auc, pr_auc (на валидации), row_latency_us, request_batch_ms,
+                    booster_bytes, fit_seconds
+    """
+    names = [name for name, _ in ranking]
+    sizes = sorted({k for k in k_values if 0 < k < len(names)} | {len(names)})
+    results = []
+    for k in sizes:
+        subset = names[:k]
+        started = time.perf_counter()
+        model, calibrated_model = fit(X_fit[subset], y_fit, X_val[subset], y_val)
+        fit_seconds = time.perf_counter() - started
+        entry = {'k': k, 'features': subset}
+        entry.update(evaluate_classifier(calibrated_model, X_val[subset], y_val))
+        entry.update(measure_inference_cost(model, X_val[subset]))
+        entry['fit_seconds'] = round(fit_seconds, 2)
+        results.append(entry)
+        print(f"   K={k:3d}: ROC-AUC {entry['roc_auc']:.4f}, PR-AUC {entry['pr_auc']:.4f}, "
+              f"строка {entry['row_latency_us']:.0f} мкс, пачка {entry['request_batch_ms']:.2f} мс, "
+              f"бустер {entry['booster_bytes'] / 1024:.0f} КБ")
+    return results
+
+
+def choose_subset(results, max_auc_drop=DEFAULT_MAX_AUC_DROP):
+    """Наименьшее K, чей ROC-AUC не ниже полного набора более чем на max_auc_drop."""
+    full = max(results, key=lambda entry: entry['k'])
+    for entry in sorted(results, key=lambda entry: entry['k']):
+        if entry['roc_auc'] >= full['roc_auc'] - max_auc_drop:
+            return entry
+    return full
+
+
+def save_slimming_report(results, chosen, ranking, max_auc_drop, path=FEATURE_SLIMMING_FILENAME,
+                         validation_rows=None):
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'max_auc_drop': max_auc_drop,
+        'validation_rows': validation_rows,
+        'chosen_k': chosen['k'],
+        'ranking': [{'feature': name, 'total_gain': gain} for name, gain in ranking],
+        'subsets': [{key: value for key, value in entry.items() if key != 'features'} for entry in results],
+    }
+    with atomic_open(path) as handle:
+        json.dump(report, handle, ensure_ascii=False, indent=2)
+    return path
@@ -0,0 +1,111 @@
+"""
+Финальная стадия подготовки признаков: заполнение пропусков и обрезка выбросов.
+
+Статистики (медианы, средние, std) считаются один раз на обучающих данных,
+сохраняются рядом с моделью (feature_stats.joblib) и одинаково применяются
+при обучении, пакетном предсказании (predict.py) и онлайн-инференсе.
+"""
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+FEATURE_STATS_FILENAME = "feature_stats.joblib"
+CLIP_SIGMAS = 10.0
+
+
+def fit_feature_stats(features):
+    """
+    Считает статистики для финализации признаков одним векторизованным проходом.
+
+    Args:
+        features: DataFrame с «сырыми» признаками
+
+    Returns:
+        dict: feature_names, median, mean, std, lower, upper (numpy-массивы по колонкам)
+    """
+    matrix = features.to_numpy(dtype=np.float32, copy=True)
+    matrix[~np.isfinite(matrix)] = np.nan
+
+    with np.errstate(all="ignore"):
+        medians = np.nanmedian(matrix, axis=0) if len(matrix) else np.full(matrix.shape[1], np.nan)
+    medians = np.where(np.isfinite(medians), medians, 0.0).astype(np.float32)
+
+    filled = np.where(np.isnan(matrix), medians, matrix)
+    means = filled.mean(axis=0, dtype=np.float64)
+    stds = filled.std(axis=0, ddof=1, dtype=np.float64) if len(filled) > 1 else np.zeros(filled.shape[1])
+
+    clip_mask = np.isfinite(stds) & (stds > 0)
+    lower = np.where(clip_mask, means - CLIP_SIGMAS * stds, -np.inf)
+    upper = np.where(clip_mask, means + CLIP_SIGMAS * stds, np.inf)
+
+    return {
+        "feature_names": list(features.columns),
+        "median": medians,
+        "mean": means.astype(np.float32),
+        "std": stds.astype(np.float32),
+        "lower": lower.astype(np.float32),
+        "upper": upper.astype(np.float32),
+    }
+
+
+def select_feature_stats(stats, names):
+    """
+    Статистики для подмножества признаков (в порядке names) — например, после отбора
+    признаков. Значения те же, что в полных статистиках, поэтому финализация
+    подмножества совпадает с финализацией всех признаков и выбором колонок.
+    """
+    index = [stats["feature_names"].index(name) for name in names]
+    selected = {key: np.asarray(stats[key])[index] for key in ("median", "mean", "std", "lower", "upper")}
+    return {"feature_names": list(names), **selected}
+
+
+def apply_feature_stats(features, stats):
+    """
+    Приводит признаки к матрице float32 в порядке обучения: NaN/inf -> медиана,
+    значения обрезаются по mean ± 10σ. Отсутствующие колонки заполняются медианой.
+
+    Args:
+        features: DataFrame с «сырыми» признаками
+        stats: словарь из fit_feature_stats
+
+    Returns:
+        numpy.ndarray формы (n_rows, n_features), dtype float32
+    """
+    names = stats["feature_names"]
+    if list(features.columns) == names:
+        matrix = features.to_numpy(dtype=np.float32, copy=True)
+    else:
+        matrix = features.reindex(columns=names).to_numpy(dtype=np.float32, copy=True)
+
+    invalid = ~np.isfinite(matrix)
+    if invalid.any():
+        matrix = np.where(invalid, stats["median"], matrix)
+    np.clip(matrix, stats["lower"], stats["upper"], out=matrix)
+    return matrix
+
+
+def finalize_features(features, stats):
+    """То же, что apply_feature_stats, но возвращает DataFrame с именами признаков."""
+    return pd.DataFrame(apply_feature_stats(features, stats), columns=stats["feature_names"])
+
+
+def feature_stats_path(model_path):
+    """Путь к статистикам признаков рядом с файлом модели."""
+    return os.path.join(os.path.dirname(os.path.abspath(model_path)), FEATURE_STATS_FILENAME)
+
+
+def save_feature_stats(stats, model_path):
+    path = feature_stats_path(model_path)
+    joblib.dump(stats, path)
+    return path
+
+
+def load_feature_stats(model_path):
+    """Загружает статистики рядом с моделью; None, если файл не найден (старые артефакты)."""
+    path = feature_stats_path(model_path)
+    if not os.path.exists(path):
+        return None
+    return joblib.load(path)
@@ -0,0 +1,400 @@
+"""
+Инкрементальная история пользователей и водителей в памяти.
+
+Для каждого user_id / driver_id хранятся достаточные статистики
+(число заказов, число принятых, средняя ставка, средняя стартовая цена),
+из которых признаки персонализации выводятся за O(1) — теми же формулами,
+что и в build_history_cache.py. Исходы тендеров (done/cancel) обновляют
+статистики сразу, без полной пересборки кэша; в файлы кэша
+(user_history.joblib / driver_history.joblib, тот же формат) состояние
+сбрасывается фоновыми снимками (write-behind).
+"""
+
+import json
+import math
+import os
+import threading
+import time
+
+import joblib
+import pandas as pd
+
+try:
+    from .atomic_write import atomic_open
+except ImportError:  # запуск как скрипт или через sys.path (main.py)
+    from atomic_write import atomic_open
+
+USER_HISTORY_PATH = "user_history.joblib"
+DRIVER_HISTORY_PATH = "driver_history.joblib"
+INGEST_STATE_FILENAME = "history_ingest.json"
+
+# Средние значения на случай, когда кэша истории нет совсем
+FALLBACK_DEFAULTS = {
+    'user_order_count': 10.0,
+    'user_acceptance_rate': 0.41,
+    'user_avg_price_ratio': 1.18,
+    'user_is_new': 0.3,
+    'user_is_vip': 0.1,
+    'user_is_price_sensitive': 0.5,
+    'driver_bid_count': 20.0,
+    'driver_acceptance_rate': 0.43,
+    'driver_avg_bid_ratio': 1.15,
+    'driver_is_active': 0.5,
+    'driver_is_aggressive': 0.2,
+    'driver_is_flexible': 0.4,
+}
+
+
+# Категориальные признаки; работают и для чисел, и для pandas.Series
+def _user_flags(count, ratio):
+    return {
+        'user_is_new': count <= 5,
+        'user_is_vip': count >= 20,
+        'user_is_price_sensitive': ratio < 1.1,
+    }
+
+
+def _driver_flags(count, ratio):
+    return {
+        'driver_is_active': count >= 20,
+        'driver_is_aggressive': ratio > 1.2,
+        'driver_is_flexible': ratio < 1.1,
+    }
+
+
+class HistoryTable:
+    """
+    Статистики одной сущности (пользователи или водители): id -> (count, done, avg_bid, avg_start).
+
+    Кортеж заменяется целиком, поэтому читатели без блокировки никогда
+    не видят наполовину обновлённую запись.
+    """
+
+    def __init__(self, prefix, id_column, count_column, bid_column, ratio_column, flags):
+        self.prefix = prefix
+        self.id_column = id_column
+        self.count_column = count_column
+        self.done_column = f"{prefix}_done_count"
+        self.bid_column = bid_column
+        self.start_column = f"{prefix}_avg_start_price"
+        self.rate_column = f"{prefix}_acceptance_rate"
+        self.ratio_column = ratio_column
+        self.flags = flags
+        self.feature_names = (count_column, self.rate_column, ratio_column) + tuple(flags(0, 0.0))
+        self.rows = {}
+        # Суммы признаков по всем сущностям: средние для неизвестных id за O(1)
+        self._totals = dict.fromkeys(self.feature_names, 0.0)
+
+    def derive(self, stats):
+        """Признаки персонализации из достаточных статистик (как в build_history_cache.py)."""
+        count, done, avg_bid, avg_start = stats
+        ratio = avg_bid / (avg_start + 0.1)
+        features = {
+            self.count_column: float(count),
+            self.rate_column: done / count,
+            self.ratio_column: ratio,
+        }
+        for name, flag in self.flags(count, ratio).items():
+            features[name] = float(flag)
+        return features
+
+    def features(self, entity_id):
+        stats = self.rows.get(entity_id)
+        return self.derive(stats) if stats is not None else None
+
+    def defaults(self):
+        if not self.rows:
+            return {name: FALLBACK_DEFAULTS[name] for name in self.feature_names}
+        size = len(self.rows)
+        return {name: total / size for name, total in self._totals.items()}
+
+    def _add_totals(self, stats, sign):
+        for name, value in self.derive(stats).items():
+            self._totals[name] += sign * value
+
+    def update(self, entity_id, done, price_bid, price_start):
+        """Учитывает один исход тендера; вызывается под блокировкой хранилища."""
+        previous = self.rows.get(entity_id)
+        if previous is None:
+            stats = (1, int(done), float(price_bid), float(price_start))
+        else:
+            self._add_totals(previous, -1)
+            count, done_count, avg_bid, avg_start = previous
+            count += 1
+            stats = (
+                count,
+                done_count + int(done),
+                avg_bid + (price_bid - avg_bid) / count,
+                avg_start + (price_start - avg_start) / count,
+            )
+        self.rows[entity_id] = stats
+        self._add_totals(stats, 1)
+
+    def load_frame(self, frame):
+        columns = [self.id_column, self.count_column, self.done_column, self.bid_column, self.start_column]
+        ids, counts, done, bids, starts = (frame[column].tolist() for column in columns)
+        self.rows = {
+            entity_id: (int(count), int(done_count), float(avg_bid), float(avg_start))
+            for entity_id, count, done_count, avg_bid, avg_start in zip(ids, counts, done, bids, starts)
+        }
+        self._totals = dict.fromkeys(self.feature_names, 0.0)
+        if len(frame):
+            for name in self.feature_names:
+                self._totals[name] = float(frame[name].sum())
+
+    def to_frame(self, rows):
+        """DataFrame в формате build_history_cache.py."""
+        frame = pd.DataFrame(
+            [(entity_id, *stats) for entity_id, stats in rows.items()],
+            columns=[self.id_column, self.count_column, self.done_column, self.bid_column, self.start_column],
+        )
+        frame[self.rate_column] = frame[self.done_column] / frame[self.count_column]
+        frame[self.ratio_column] = frame[self.bid_column] / (frame[self.start_column] + 0.1)
+        for name, flag in self.flags(frame[self.count_column], frame[self.ratio_column]).items():
+            frame[name] = flag.astype(float)
+        return frame
+
+
+class HistoryStore:
+    """
+    История пользователей и водителей с онлайн-обновлением.
+
+    Args:
+        user_path, driver_path: файлы кэша (читаются при загрузке, в них пишутся снимки)
+    """
+
+    def __init__(self, user_path=USER_HISTORY_PATH, driver_path=DRIVER_HISTORY_PATH):
+        self.user_path = user_path
+        self.driver_path = driver_path
+        self.users = HistoryTable(
+            'user', 'user_id', 'user_order_count', 'user_avg_bid', 'user_avg_price_ratio',
+            _user_flags,
+        )
+        self.drivers = HistoryTable(
+            'driver', 'driver_id', 'driver_bid_count', 'driver_avg_bid', 'driver_avg_bid_ratio',
+            _driver_flags,
+        )
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._version = 0
+        self._snapshot_version = 0
+        self._tail_path = None
+        self._tail_offset = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self.outcomes_total = 0
+        self.snapshot_counts = {"success": 0, "failed": 0}
+        self.last_snapshot_at = None
+
+    # --- загрузка и чтение ------------------------------------------------
+
+    def load(self):
+        """
+        Загружает кэш истории из файлов; без файлов работает на средних значениях.
+
+        Returns:
+            True, если кэш найден
+        """
+        with self._lock:
+            try:
+                user_frame = joblib.load(self.user_path)
+                driver_frame = joblib.load(self.driver_path)
+            except FileNotFoundError:
+                print("[WARN] Кэш истории не найден. Используются заглушки. Запустите: python src/build_history_cache.py")
+                self.loaded = True
+                return False
+            self.users.load_frame(user_frame)
+            self.drivers.load_frame(driver_frame)
+            self.loaded = True
+            self._snapshot_version = self._version
+        print(f"[CACHE] Загружен кэш истории: {len(self.users.rows)} users, {len(self.drivers.rows)} drivers")
+        return True
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            with self._load_lock:
+                if not self.loaded:
+                    self.load()
+
+    def user_features(self, user_id=None):
+        """Признаки пользователя; для неизвестного id — средние по всем пользователям."""
+        self.ensure_loaded()
+        features = self.users.features(user_id) if user_id is not None else None
+        return features if features is not None else self.users.defaults()
+
+    def driver_features(self, driver_id=None):
+        """Признаки водителя; для неизвестного id — средние по всем водителям."""
+        self.ensure_loaded()
+        features = self.drivers.features(driver_id) if driver_id is not None else None
+        return features if features is not None else self.drivers.defaults()
+
+    # --- приём исходов ----------------------------------------------------
+
+    def record_outcome(self, is_done, price_bid_local, price_start_local, user_id=None, driver_id=None):
+        """
+        Учитывает исход тендера в статистиках пользователя и водителя за O(1).
+
+        Args:
+            is_done: 'done'/'cancel' или bool
+            price_bid_local: ставка водителя
+            price_start_local: стартовая цена заказа
+            user_id, driver_id: участники тендера (хотя бы один)
+        """
+        if user_id is None and driver_id is None:
+            raise ValueError("Нужен user_id или driver_id")
+        done = is_done == 'done' if isinstance(is_done, str) else bool(is_done)
+        price_bid_local = float(price_bid_local)
+        price_start_local = float(price_start_local)
+        if not (math.isfinite(price_bid_local) and math.isfinite(price_start_local)):
+            raise ValueError("Цены исхода должны быть конечными числами")
+        self.ensure_loaded()
+        with self._lock:
+            if user_id is not None:
+                self.users.update(user_id, done, price_bid_local, price_start_local)
+            if driver_id is not None:
+                self.drivers.update(driver_id, done, price_bid_local, price_start_local)
+            self._version += 1
+            self.outcomes_total += 1
+
+    def record_outcomes(self, outcomes):
+        """Пакет исходов (dict с полями как в train.csv); возвращает число учтённых."""
+        for outcome in outcomes:
+            self.record_outcome(
+                outcome['is_done'],
+                outcome['price_bid_local'],
+                outcome['price_start_local'],
+                user_id=outcome.get('user_id'),
+                driver_id=outcome.get('driver_id'),
+            )
+        return len(outcomes)
+
+    def ingest_tail(self):
+        """
+        Дочитывает новые строки JSONL-файла исходов (OUTCOMES_TAIL_PATH) с сохранённой позиции.
+
+        Returns:
+            Число учтённых исходов
+        """
+        path = self._tail_path
+        if path is None or not os.path.exists(path):
+            return 0
+        if os.path.getsize(path) < self._tail_offset:
+            self._tail_offset = 0  # файл пересоздан (ротация)
+        ingested = 0
+        with open(path, "rb") as handle:
+            handle.seek(self._tail_offset)
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break  # строка ещё дописывается — дочитаем в следующий раз
+                self._tail_offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    self.record_outcomes([json.loads(line)])
+                    ingested += 1
+                except (ValueError, KeyError, TypeError) as exc:
+                    print(f"[WARN] Пропущен исход из {path}: {exc}")
+        return ingested
+
+    # --- снимки (write-behind) --------------------------------------------
+
+    @property
+    def _state_path(self):
+        return os.path.join(os.path.dirname(os.path.abspath(self.user_path)), INGEST_STATE_FILENAME)
+
+    def _restore_tail_offset(self, path):
+        try:
+            with open(self._state_path, encoding="utf-8") as handle:
+                state = json.load(handle)
+        except (OSError, ValueError):
+            return 0
+        if state.get("tail_path") != os.path.abspath(path):
+            return 0
+        return int(state.get("tail_offset", 0))
+
+    def snapshot(self, force=False):
+        """
+        Сохраняет текущие статистики в файлы кэша, если с прошлого снимка были изменения.
+
+        Returns:
+            True, если снимок записан
+        """
+        with self._lock:
+            if not force and self._version == self._snapshot_version:
+                return False
+            version = self._version
+            user_rows = dict(self.users.rows)
+            driver_rows = dict(self.drivers.rows)
+            tail_offset = self._tail_offset
+        # Сборка DataFrame и запись на диск — вне блокировки, приём исходов не ждёт
+        try:
+            for frame, path in ((self.users.to_frame(user_rows), self.user_path),
+                                (self.drivers.to_frame(driver_rows), self.driver_path)):
+                with atomic_open(path, "wb") as handle:
+                    joblib.dump(frame, handle)
+            if self._tail_path is not None:
+                state = {"tail_path": os.path.abspath(self._tail_path), "tail_offset": tail_offset}
+                with atomic_open(self._state_path) as handle:
+                    json.dump(state, handle)
+        except Exception as exc:
+            self.snapshot_counts["failed"] += 1
+            print(f"[WARN] Не удалось сохранить снимок истории: {exc}")
+            return False
+        self._snapshot_version = version
+        self.snapshot_counts["success"] += 1
+        self.last_snapshot_at = time.time()
+        return True
+
+    def start_background(self, snapshot_interval, tail_path=None, poll_interval=1.0):
+        """
+        Фоновый поток: дочитывает файл исходов и периодически пишет снимки.
+
+        Args:
+            snapshot_interval: период снимков, сек (0 — без снимков)
+            tail_path: JSONL-файл исходов для чтения «хвоста» (опционально)
+            poll_interval: период опроса файла исходов, сек
+        """
+        if self._thread is not None:
+            return
+        if tail_path:
+            self._tail_path = tail_path
+            self._tail_offset = self._restore_tail_offset(tail_path)
+        if snapshot_interval <= 0 and not tail_path:
+            return
+        self.ensure_loaded()
+        self._stop.clear()
+        wait = poll_interval if tail_path else snapshot_interval
+        if snapshot_interval > 0:
+            wait = min(wait, snapshot_interval)
+
+        def run():
+            next_snapshot = time.monotonic() + snapshot_interval
+            while not self._stop.wait(wait):
+                try:
+                    self.ingest_tail()
+                    if snapshot_interval > 0 and time.monotonic() >= next_snapshot:
+                        next_snapshot = time.monotonic() + snapshot_interval
+                        self.snapshot()
+                except Exception as exc:
+                    print(f"[WARN] Ошибка фонового обновления истории: {exc}")
+
+        self._thread = threading.Thread(target=run, name="history-ingest", daemon=True)
+        self._thread.start()
+
+    def stop_background(self, final_snapshot=True):
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+        if final_snapshot and self.loaded:
+            self.snapshot()
+
+    def status(self):
+        return {
+            "users": len(self.users.rows),
+            "drivers": len(self.drivers.rows),
+            "outcomes_total": self.outcomes_total,
+            "pending": self._version - self._snapshot_version,
+            "snapshots": dict(self.snapshot_counts),
+        }
@@ -0,0 +1,249 @@
+"""
+Компактный «нативный» формат модели, быстро загружаемый при старте сервиса.
+
+Бандл — каталог из трёх файлов:
+    booster.ubj    — бустер XGBoost в родном формате UBJSON
+    arrays.bin     — статистики признаков (feature_stats) и строки смоук-теста
+                     с эталонными предсказаниями: массивы подряд, без заголовков
+    manifest.json  — параметры сигмоидной калибровки, feature_names, раскладка
+                     arrays.bin и контрольная сумма всего содержимого (компактный JSON)
+
+Загрузка не требует sklearn и не распаковывает pickle-граф
+CalibratedClassifierCV, поэтому быстрее и не привязана к версии sklearn.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+try:
+    from .atomic_write import atomic_open
+except ImportError:  # запуск как скрипт или через sys.path (main.py)
+    from atomic_write import atomic_open
+
+BUNDLE_DIRNAME = "model_bundle"
+BOOSTER_FILENAME = "booster.ubj"
+MANIFEST_FILENAME = "manifest.json"
+ARRAYS_FILENAME = "arrays.bin"
+BUNDLE_FORMAT_VERSION = 2
+
+_STATS_ARRAYS = ("median", "mean", "std", "lower", "upper")
+
+
+def bundle_dir_for(model_path):
+    """Каталог бандла рядом с model_enhanced.joblib."""
+    return os.path.join(os.path.dirname(os.path.abspath(model_path)), BUNDLE_DIRNAME)
+
+
+def bundle_exists(bundle_dir):
+    return os.path.exists(os.path.join(bundle_dir, MANIFEST_FILENAME)) and os.path.exists(
+        os.path.join(bundle_dir, BOOSTER_FILENAME)
+    )
+
+
+def _content_hash(booster_bytes, manifest, arrays_bytes=b""):
+    payload = {k: v for k, v in manifest.items() if k != "content_hash"}
+    digest = hashlib.sha256(booster_bytes)
+    digest.update(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    digest.update(arrays_bytes)
+    return digest.hexdigest()
+
+
+def _pack_arrays(feature_stats, smoke_test):
+    """
+    Статистики и смоук-тест одним двоичным блоком.
+
+    Returns:
+        (байты, раскладка {имя: [dtype, shape, offset]} для манифеста); пустые, если нечего сохранять
+    """
+    arrays = {}
+    if feature_stats is not None:
+        for key in _STATS_ARRAYS:
+            arrays[f"stats_{key}"] = np.asarray(feature_stats[key], dtype=np.float32)
+    if smoke_test is not None:
+        arrays["smoke_features"], arrays["smoke_expected"] = smoke_test
+    chunks, layout, offset = [], {}, 0
+    for name, values in arrays.items():
+        values = np.ascontiguousarray(values)
+        layout[name] = [values.dtype.str, list(values.shape), offset]
+        chunks.append(values.tobytes())
+        offset += values.nbytes
+    return b"".join(chunks), layout
+
+
+def _unpack_arrays(arrays_bytes, layout, stats_names):
+    """(feature_stats или None, смоук-тест (features, expected) или None) из блока arrays.bin."""
+    arrays = {
+        name: np.frombuffer(arrays_bytes, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+        for name, (dtype, shape, offset) in layout.items()
+    }
+    feature_stats = None
+    if stats_names is not None:
+        feature_stats = {"feature_names": list(stats_names)}
+        for key in _STATS_ARRAYS:
+            feature_stats[key] = arrays[f"stats_{key}"]
+    smoke_test = None
+    if "smoke_features" in arrays:
+        smoke_test = (arrays["smoke_features"], arrays["smoke_expected"])
+    return feature_stats, smoke_test
+
+
+def _unwrap_calibrated(calibrated_model):
+    """Достаёт XGBClassifier и параметры сигмоиды из CalibratedClassifierCV(cv='prefit')."""
+    calibrated = getattr(calibrated_model, "calibrated_classifiers_", None)
+    if not calibrated or len(calibrated) != 1:
+        raise ValueError("Ожидается CalibratedClassifierCV с одним откалиброванным классификатором (cv='prefit')")
+    inner = calibrated[0]
+    estimator = getattr(inner, "estimator", None)
+    if estimator is None:  # sklearn < 1.2
+        estimator = inner.base_estimator
+    calibrator = inner.calibrators[0]
+    if not hasattr(calibrator, "a_") or not hasattr(calibrator, "b_"):
+        raise ValueError("Поддерживается только сигмоидная калибровка (method='sigmoid')")
+    return estimator, float(calibrator.a_), float(calibrator.b_)
+
+
+def _smoke_test_arrays(calibrated_model, smoke_features):
+    if smoke_features is None or len(smoke_features) == 0:
+        return None
+    expected = np.asarray(calibrated_model.predict_proba(smoke_features)[:, 1], dtype=np.float64)
+    return np.asarray(smoke_features, dtype=np.float32), expected
+
+
+def export_model_bundle(calibrated_model, feature_names, feature_stats=None, bundle_dir=BUNDLE_DIRNAME,
+                        smoke_features=None, monotone_price=None):
+    """
+    Сохраняет бустер, калибровку, статистики и смоук-тест в компактный бандл.
+
+    Args:
+        calibrated_model: обученный CalibratedClassifierCV над XGBClassifier
+        feature_names: порядок признаков, на которых обучена модель
+        feature_stats: статистики из fit_feature_stats (опционально)
+        bundle_dir: каталог назначения (создаётся при необходимости)
+        smoke_features: несколько финализированных строк признаков (DataFrame); их
+                        предсказания сохраняются как эталон для проверки паритета при загрузке
+        monotone_price: направление монотонности по цене ('decreasing'), если модель его
+                        гарантирует; пишется в манифест только для таких моделей
+
+    Returns:
+        dict манифеста (с content_hash)
+    """
+    estimator, slope, intercept = _unwrap_calibrated(calibrated_model)
+    booster = estimator.get_booster()
+    booster_bytes = bytes(booster.save_raw(raw_format="ubj"))
+
+    best_iteration = booster.attr("best_iteration")
+    manifest = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "booster_file": BOOSTER_FILENAME,
+        "booster_sha256": hashlib.sha256(booster_bytes).hexdigest(),
+        "num_boosted_rounds": int(booster.num_boosted_rounds()),
+        "iteration_limit": int(best_iteration) + 1 if best_iteration is not None else 0,
+        "calibration": {"method": "sigmoid", "a": slope, "b": intercept},
+        "classes": [int(c) for c in calibrated_model.classes_],
+        "feature_names": list(feature_names),
+        "feature_stats_names": list(feature_stats["feature_names"]) if feature_stats is not None else None,
+    }
+    if monotone_price:
+        manifest["monotone_price"] = monotone_price
+    arrays_bytes, layout = _pack_arrays(feature_stats, _smoke_test_arrays(calibrated_model, smoke_features))
+    if arrays_bytes:
+        manifest["arrays_file"] = ARRAYS_FILENAME
+        manifest["arrays"] = layout
+    manifest["content_hash"] = _content_hash(booster_bytes, manifest, arrays_bytes)
+
+    os.makedirs(bundle_dir, exist_ok=True)
+    # Сначала данные, манифест последним: бандл без манифеста считается отсутствующим
+    files = [(BOOSTER_FILENAME, booster_bytes)]
+    if arrays_bytes:
+        files.append((ARRAYS_FILENAME, arrays_bytes))
+    elif os.path.exists(os.path.join(bundle_dir, ARRAYS_FILENAME)):
+        os.remove(os.path.join(bundle_dir, ARRAYS_FILENAME))
+    files.append((MANIFEST_FILENAME, json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")))
+    for name, payload in files:
+        with atomic_open(os.path.join(bundle_dir, name), "wb") as handle:
+            handle.write(payload)
+    return manifest
+
+
+def bundle_size_bytes(bundle_dir):
+    return sum(
+        os.path.getsize(os.path.join(bundle_dir, name))
+        for name in (BOOSTER_FILENAME, ARRAYS_FILENAME, MANIFEST_FILENAME)
+        if os.path.exists(os.path.join(bundle_dir, name))
+    )
+
+
+class NativeCalibratedModel:
+    """
+    Бустер XGBoost + сигмоидная калибровка, совместимые по predict_proba
+    с исходным CalibratedClassifierCV.
+    """
+
+    def __init__(self, booster, manifest, feature_stats=None, smoke_test=None):
+        self.booster = booster
+        self.manifest = manifest
+        self.feature_names = list(manifest["feature_names"])
+        self.feature_stats = feature_stats
+        # (строки признаков, эталонные вероятности) для проверки паритета (model_store.check_parity)
+        self.smoke_test = smoke_test
+        self.content_hash = manifest["content_hash"]
+        self.monotone_price = manifest.get("monotone_price")
+        self.classes_ = np.array(manifest.get("classes", [0, 1]))
+        calibration = manifest["calibration"]
+        self._a = float(calibration["a"])
+        self._b = float(calibration["b"])
+        limit = int(manifest.get("iteration_limit", 0))
+        self._iteration_range = (0, limit) if limit > 0 else (0, 0)
+
+    def _as_matrix(self, features):
+        if hasattr(features, "columns"):
+            if list(features.columns) != self.feature_names:
+                features = features.reindex(columns=self.feature_names)
+            return features.to_numpy(dtype=np.float32)
+        return np.asarray(features, dtype=np.float32)
+
+    def predict_proba(self, features):
+        raw = self.booster.inplace_predict(self._as_matrix(features), iteration_range=self._iteration_range)
+        raw = np.asarray(raw, dtype=np.float64)
+        positive = 1.0 / (1.0 + np.exp(self._a * raw + self._b))
+        return np.column_stack([1.0 - positive, positive])
+
+
+def load_model_bundle(bundle_dir, verify=True):
+    """
+    Загружает бандл без sklearn/pickle.
+
+    Args:
+        bundle_dir: каталог с booster.ubj и manifest.json
+        verify: проверять контрольную сумму содержимого
+
+    Returns:
+        NativeCalibratedModel (статистики признаков — в .feature_stats)
+    """
+    import xgboost as xgb
+
+    with open(os.path.join(bundle_dir, MANIFEST_FILENAME), encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    version = manifest.get("format_version")
+    if version != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия бандла: {version} (ожидается {BUNDLE_FORMAT_VERSION})")
+
+    with open(os.path.join(bundle_dir, manifest.get("booster_file", BOOSTER_FILENAME)), "rb") as handle:
+        booster_bytes = handle.read()
+    arrays_bytes = b""
+    if manifest.get("arrays_file"):
+        with open(os.path.join(bundle_dir, manifest["arrays_file"]), "rb") as handle:
+            arrays_bytes = handle.read()
+    if verify and _content_hash(booster_bytes, manifest, arrays_bytes) != manifest.get("content_hash"):
+        raise ValueError(f"Контрольная сумма бандла не совпадает: {bundle_dir}")
+
+    feature_stats, smoke_test = _unpack_arrays(
+        arrays_bytes, manifest.get("arrays", {}), manifest.get("feature_stats_names")
+    )
+
+    booster = xgb.Booster()
+    booster.load_model(bytearray(booster_bytes))
+    return NativeCalibratedModel(booster, manifest, feature_stats, smoke_test)
@@ -0,0 +1,306 @@
+"""
+Модели по сегментам заказа (класс такси, город) с ограниченным по памяти LRU.
+
+Структура каталога (каждый сегмент — такое же версионированное хранилище,
+как корень models/, см. model_store.py):
+
+    models/
+        CURRENT, 20250101-.../               # глобальная модель
+        segments/
+            class-business/CURRENT, ...      # класс такси (detect_taxi_type)
+            city-kazan/CURRENT, ...          # город (поле city заказа)
+            city-kazan.class-economy/...     # город и класс
+
+Для заказа сегменты перебираются от частного к общему: город и класс, город,
+класс, затем глобальная модель. Используется первая уже загруженная модель;
+если модели самого частного сегмента нет в памяти, она ставится в очередь на
+фоновую загрузку, а запрос тем временем обслуживает ближайшая загруженная
+родительская (в худшем случае — глобальная).
+
+Загруженные модели держатся в LRU с бюджетом по памяти: размер модели
+оценивается по размеру её артефакта на диске с поправочным коэффициентом (см.
+artifact_bytes), при превышении бюджета вытесняются давно не использованные.
+Модель больше всего бюджета не загружается: размер проверяется до распаковки.
+"""
+
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from .model_bundle import BUNDLE_DIRNAME, bundle_exists, bundle_size_bytes
+    from .model_store import MODEL_FILENAME, ModelStore
+except ImportError:  # запуск как скрипт или через sys.path (main.py)
+    from model_bundle import BUNDLE_DIRNAME, bundle_exists, bundle_size_bytes
+    from model_store import MODEL_FILENAME, ModelStore
+
+SEGMENTS_DIRNAME = "segments"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_REFRESH_INTERVAL = 30.0
+LOAD_QUEUE_SIZE = 64
+
+# Во сколько раз модель в памяти больше артефакта на диске (прирост RSS на модель
+# при загрузке 10 копий): бандл ~1.9x, joblib с CalibratedClassifierCV ~2.4x.
+# Коэффициенты округлены вверх — бюджет лучше переоценить, чем превысить.
+BUNDLE_MEMORY_FACTOR = 2.0
+JOBLIB_MEMORY_FACTOR = 2.5
+
+_SEGMENT_UNSAFE = re.compile(r"[^\w-]+")
+
+
+def normalize_city(city):
+    """Имя города для сегмента: нижний регистр, только буквы, цифры, '_' и '-'."""
+    if city is None:
+        return None
+    name = _SEGMENT_UNSAFE.sub("-", str(city).strip().lower()).strip("-")
+    return name or None
+
+
+def segment_names(taxi_type, city=None):
+    """Сегменты заказа от самого частного к общему (без глобальной модели)."""
+    city = normalize_city(city)
+    names = []
+    if city:
+        names += [f"city-{city}.class-{taxi_type}", f"city-{city}"]
+    names.append(f"class-{taxi_type}")
+    return names
+
+
+def parse_segment(name):
+    """
+    Разбирает имя сегмента на условия.
+
+    Returns:
+        dict с ключами 'city' и/или 'class'
+
+    Raises:
+        ValueError: если имя не в формате segment_names
+    """
+    conditions = {}
+    for part in name.split("."):
+        key, _, value = part.partition("-")
+        if key not in ("city", "class") or not value or key in conditions:
+            raise ValueError(f"Некорректное имя сегмента: {name!r} (ожидается city-<город>, class-<класс> или оба через '.')")
+        conditions[key] = value
+    return conditions
+
+
+def artifact_bytes(model_dir):
+    """
+    Оценка памяти модели по артефакту в каталоге версии, без загрузки.
+
+    Размер на диске занижает память: распакованный бустер, калибраторы и
+    объекты Python занимают больше сжатого артефакта, поэтому он умножается
+    на измеренный коэффициент (BUNDLE_MEMORY_FACTOR, JOBLIB_MEMORY_FACTOR).
+    Это оценка, а не точный замер RSS.
+    """
+    bundle_dir = os.path.join(model_dir, BUNDLE_DIRNAME)
+    if bundle_exists(bundle_dir):
+        return int(bundle_size_bytes(bundle_dir) * BUNDLE_MEMORY_FACTOR)
+    path = os.path.join(model_dir, MODEL_FILENAME)
+    return int(os.path.getsize(path) * JOBLIB_MEMORY_FACTOR) if os.path.exists(path) else 0
+
+
+class SegmentRouter:
+    """
+    Выбирает модель по сегменту заказа; глобальная модель — parent.
+
+    Args:
+        parent: ModelStore глобальной модели (его models_dir — корень хранилища)
+        loader: функция (model_path) -> (модель, feature_stats), как у ModelStore
+        smoke_check: проверка и прогрев загруженной версии, как у ModelStore
+        max_bytes: бюджет памяти загруженных моделей сегментов
+        refresh_interval: как часто перечитывать segments/*/CURRENT, с
+    """
+
+    def __init__(self, parent, loader, smoke_check=None, max_bytes=DEFAULT_MAX_BYTES,
+                 refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        self.parent = parent
+        self.loader = loader
+        self.smoke_check = smoke_check
+        self.max_bytes = max_bytes
+        self.refresh_interval = refresh_interval
+        self._available = {}
+        self._refreshed_at = None
+        self._refresh_lock = threading.Lock()
+        # сегмент -> (ModelVersion, размер); порядок — от давно использованных к недавним
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._pending = set()
+        # Версии, которые не удалось загрузить или которые больше бюджета: не перезагружаются
+        self._rejected = {}
+        self._queue = queue.Queue(maxsize=LOAD_QUEUE_SIZE)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.counts = {"hit": 0, "fallback": 0, "loaded": 0, "evicted": 0, "failed": 0, "too_large": 0}
+        self.last_error = None
+
+    def configure(self, max_bytes=None, refresh_interval=None):
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        if refresh_interval is not None:
+            self.refresh_interval = refresh_interval
+        self._refreshed_at = None
+
+    @property
+    def segments_dir(self):
+        return os.path.join(self.parent.models_dir, SEGMENTS_DIRNAME)
+
+    # --- доступные сегменты -------------------------------------------------
+
+    def _segment_store(self, segment):
+        return ModelStore(self.loader, self.smoke_check, models_dir=os.path.join(self.segments_dir, segment))
+
+    def refresh(self):
+        """Перечитывает segments/*/CURRENT; модели сменившихся версий выгружаются."""
+        available = {}
+        if os.path.isdir(self.segments_dir):
+            for segment in sorted(os.listdir(self.segments_dir)):
+                if segment.startswith(".") or not os.path.isdir(os.path.join(self.segments_dir, segment)):
+                    continue
+                version = self._segment_store(segment).current_pointer()
+                if version is not None:
+                    available[segment] = version
+        with self._lock:
+            for segment in [name for name, (entry, _) in self._entries.items() if available.get(name) != entry.version]:
+                _, size = self._entries.pop(segment)
+                self._bytes -= size
+        self._available = available
+        self._refreshed_at = time.monotonic()
+        return available
+
+    def _maybe_refresh(self):
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        # Один поток перечитывает каталог, остальные работают со старым списком
+        if self._refresh_lock.acquire(blocking=False):
+            try:
+                self.refresh()
+            finally:
+                self._refresh_lock.release()
+
+    # --- выбор модели -------------------------------------------------------
+
+    def select(self, segments):
+        """
+        Модель для заказа.
+
+        Args:
+            segments: имена сегментов от частного к общему (segment_names)
+
+        Returns:
+            (ModelVersion, имя сегмента или None для глобальной модели)
+        """
+        self._maybe_refresh()
+        available = self._available
+        if not available:
+            return self.parent.active, None
+        scheduled = False
+        for segment in segments:
+            version = available.get(segment)
+            if version is None:
+                continue
+            with self._lock:
+                cached = self._entries.get(segment)
+                if cached is not None and cached[0].version == version:
+                    self._entries.move_to_end(segment)
+                    self.counts["hit"] += 1
+                    return cached[0], segment
+            # Загружается только самый частный сегмент; родители обслуживают, если уже в памяти
+            if not scheduled:
+                scheduled = self._schedule(segment, version)
+                if scheduled:
+                    with self._lock:
+                        self.counts["fallback"] += 1
+        return self.parent.active, None
+
+    def _schedule(self, segment, version):
+        """Ставит модель сегмента в очередь загрузки; False, если версия отвергнута ранее."""
+        with self._lock:
+            if self._rejected.get(segment) == version:
+                return False
+            if segment in self._pending:
+                return True
+            self._pending.add(segment)
+        try:
+            self._queue.put_nowait(segment)
+        except queue.Full:
+            with self._lock:
+                self._pending.discard(segment)
+            return True
+        if self._thread is None:
+            self._start()
+        return True
+
+    # --- фоновая загрузка ---------------------------------------------------
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="segment-loader", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            segment = self._queue.get()
+            try:
+                self._load(segment)
+            finally:
+                with self._lock:
+                    self._pending.discard(segment)
+
+    def _reject(self, segment, version, reason):
+        with self._lock:
+            self.counts[reason] += 1
+            self._rejected[segment] = version
+
+    def _load(self, segment):
+        version = self._available.get(segment)
+        if version is None:  # сегмент исчез из каталога, пока ждал в очереди
+            return
+        # Размер проверяется до распаковки: модель больше бюджета не загружается вовсе
+        size = artifact_bytes(os.path.join(self.segments_dir, segment, version))
+        if size > self.max_bytes:
+            self._reject(segment, version, "too_large")
+            print(f"[WARN] Модель сегмента {segment} (~{size} Б в памяти) больше бюджета {self.max_bytes} Б, "
+                  f"используется родительская")
+            return
+        try:
+            candidate = self._segment_store(segment).load_version(version)
+        except Exception as exc:
+            self.last_error = f"{segment}: {type(exc).__name__}: {exc}"
+            self._reject(segment, version, "failed")
+            print(f"[WARN] Модель сегмента {segment} не загружена: {exc}")
+            return
+        with self._lock:
+            previous = self._entries.pop(segment, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[segment] = (candidate, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.counts["evicted"] += 1
+            self.counts["loaded"] += 1
+        print(f"[MODEL] Модель сегмента {segment}: {candidate.version} (~{size / 1024:.0f} КБ в памяти)")
+
+    def status(self):
+        with self._lock:
+            loaded = {segment: {"version": entry.version, "size_bytes": size}
+                      for segment, (entry, size) in self._entries.items()}
+            used = self._bytes
+            counts = dict(self.counts)
+        return {
+            "available": dict(self._available),
+            "loaded": loaded,
+            "bytes": used,
+            "max_bytes": self.max_bytes,
+            "counts": counts,
+            "last_error": self.last_error,
+        }
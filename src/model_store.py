@@ -0,0 +1,339 @@
+"""
+Версионированное хранилище моделей с горячей заменой без простоя.
+
+Структура каталога:
+    models/
+        CURRENT                      # имя активной версии (одна строка)
+        PINNED                       # версия, закреплённая через /admin/models/reload (если есть)
+        20250101-030000-1a2b3c4d/    # model_enhanced.joblib, feature_stats.joblib, model_bundle/ ...
+        20250102-030000-5e6f7a8b/
+
+Новая версия загружается и прогревается в фоне, проходит проверку паритета
+(эталонные предсказания из manifest.json бандла) и смоук-тест, после чего
+атомарно подменяет активную. Запросы, начавшиеся на старой версии, дорабатывают
+на ней: они держат ссылку на объект ModelVersion, а не на хранилище.
+"""
+
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+
+try:
+    from .atomic_write import atomic_open
+except ImportError:  # запуск как скрипт или через sys.path (main.py)
+    from atomic_write import atomic_open
+
+CURRENT_FILENAME = "CURRENT"
+PINNED_FILENAME = "PINNED"
+MODEL_FILENAME = "model_enhanced.joblib"
+VERSION_ARTIFACTS = (
+    "model_enhanced.joblib", "feature_names.joblib", "feature_stats.joblib", "model_bundle", "drift_profile.json",
+    "feature_slimming.json", "surrogate.json", "training_profile.json",
+)
+PARITY_TOLERANCE = 1e-6
+
+
+@dataclass
+class ModelVersion:
+    """Загруженная версия модели; неизменяема после публикации в хранилище."""
+
+    version: str
+    model: object
+    feature_stats: object
+    path: str
+    loaded_at: float = field(default_factory=time.time)
+
+
+def publish_model_version(models_dir, content_hash=None, source_dir=".", keep=5):
+    """
+    Копирует артефакты обучения в models/<версия>/ и переключает CURRENT.
+
+    Args:
+        models_dir: корень версионированного хранилища
+        content_hash: контрольная сумма бандла (входит в имя версии)
+        source_dir: где лежат только что сохранённые артефакты
+        keep: сколько последних версий хранить (новая, прежняя из CURRENT и PINNED не удаляются)
+
+    Returns:
+        Имя опубликованной версии
+    """
+    base = datetime.now().strftime("%Y%m%d-%H%M%S")
+    if content_hash:
+        base = f"{base}-{content_hash[:8]}"
+
+    os.makedirs(models_dir, exist_ok=True)
+    # Свой staging у каждого процесса: два обучения могут публиковать одновременно
+    staging = os.path.join(models_dir, f".{base}-{os.getpid()}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        for name in VERSION_ARTIFACTS:
+            source = os.path.join(source_dir, name)
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(staging, name))
+            elif os.path.exists(source):
+                shutil.copy2(source, os.path.join(staging, name))
+        # Каталог версии появляется целиком, затем атомарно переключается указатель
+        version = _claim_version_dir(models_dir, staging, base)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    previous = read_pointer(models_dir, CURRENT_FILENAME)
+    with atomic_open(os.path.join(models_dir, CURRENT_FILENAME)) as handle:
+        handle.write(version + "\n")
+
+    if keep:
+        # Прежняя CURRENT ещё может обслуживаться до переключения, закреплённая — по решению админа
+        protected = {version, previous, read_pointer(models_dir, PINNED_FILENAME)}
+        for stale in list_versions(models_dir)[:-keep]:
+            if stale not in protected:
+                shutil.rmtree(os.path.join(models_dir, stale), ignore_errors=True)
+    return version
+
+
+def _claim_version_dir(models_dir, staging, base):
+    """Переименовывает staging в models/<base>, при занятом имени — в <base>-2, <base>-3, ..."""
+    attempt = 1
+    while True:
+        version = base if attempt == 1 else f"{base}-{attempt}"
+        target = os.path.join(models_dir, version)
+        if not os.path.exists(target):
+            try:
+                os.rename(staging, target)
+                return version
+            except OSError:
+                # Имя заняли между проверкой и переименованием
+                if not os.path.exists(target):
+                    raise
+        attempt += 1
+
+
+def read_pointer(models_dir, filename):
+    """Имя версии из указателя (CURRENT, PINNED) или None."""
+    try:
+        with open(os.path.join(models_dir, filename), encoding="utf-8") as handle:
+            return handle.read().strip() or None
+    except OSError:
+        return None
+
+
+def list_versions(models_dir):
+    """Имена версий в хранилище по возрастанию (имена начинаются с даты)."""
+    if not os.path.isdir(models_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(models_dir)
+        if not name.startswith(".") and os.path.isdir(os.path.join(models_dir, name))
+    )
+
+
+def check_parity(model, tolerance=PARITY_TOLERANCE):
+    """
+    Сверяет предсказания загруженной модели с эталонными, сохранёнными при обучении.
+
+    Returns:
+        Максимальное отклонение или None, если эталона нет (модель без бандла)
+
+    Raises:
+        ValueError: если отклонение больше tolerance
+    """
+    smoke = getattr(model, "smoke_test", None)
+    if smoke is None:
+        return None
+    features, expected = smoke
+    actual = model.predict_proba(features)[:, 1]
+    deviation = float(np.max(np.abs(actual - expected))) if len(expected) else 0.0
+    if not deviation <= tolerance:
+        raise ValueError(f"Паритет не пройден: отклонение {deviation:.3g} > {tolerance:g}")
+    return deviation
+
+
+class ModelStore:
+    """
+    Держит активную версию модели и подменяет её без остановки сервиса.
+
+    Args:
+        loader: функция (model_path) -> (модель, feature_stats)
+        smoke_check: функция (ModelVersion) -> None; бросает исключение, если версия непригодна
+        models_dir: корень versioned-хранилища
+        fallback_model_path: модель для режима без хранилища (model_enhanced.joblib в cwd)
+    """
+
+    def __init__(self, loader, smoke_check=None, models_dir="models", fallback_model_path=MODEL_FILENAME):
+        self.loader = loader
+        self.smoke_check = smoke_check
+        self.models_dir = models_dir
+        self.fallback_model_path = fallback_model_path
+        self._active = None
+        self._swap_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watch_thread = None
+        self._watch_stop = threading.Event()
+        self._watched_signature = None
+        self.reload_counts = {"success": 0, "failed": 0, "unchanged": 0}
+        self.last_error = None
+
+    def configure(self, models_dir=None, fallback_model_path=None):
+        if models_dir is not None:
+            self.models_dir = models_dir
+        if fallback_model_path is not None:
+            self.fallback_model_path = fallback_model_path
+
+    # --- чтение состояния -------------------------------------------------
+
+    @property
+    def active(self):
+        """Активная версия; при первом обращении загружается синхронно."""
+        current = self._active
+        if current is None:
+            self.reload()
+            current = self._active
+        return current
+
+    @property
+    def active_version(self):
+        current = self._active
+        return current.version if current is not None else None
+
+    def current_pointer(self):
+        """Версия, на которую указывает CURRENT (или последняя по имени), либо None."""
+        name = read_pointer(self.models_dir, CURRENT_FILENAME)
+        if name:
+            return name
+        versions = list_versions(self.models_dir)
+        return versions[-1] if versions else None
+
+    def _resolve(self, version):
+        if version is None:
+            version = self.current_pointer()
+        if version is None:
+            return None, self.fallback_model_path
+        if os.path.basename(version) != version or version.startswith("."):
+            raise FileNotFoundError(f"Некорректное имя версии: {version!r}")
+        path = os.path.join(self.models_dir, version)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"Версия модели не найдена: {path}")
+        return version, os.path.join(path, MODEL_FILENAME)
+
+    # --- загрузка и подмена -----------------------------------------------
+
+    def load_version(self, version=None):
+        """Загружает и проверяет версию, не делая её активной."""
+        name, model_path = self._resolve(version)
+        model, feature_stats = self.loader(model_path)
+        if name is None:
+            content_hash = getattr(model, "content_hash", None)
+            name = f"local-{content_hash[:12]}" if content_hash else "local"
+        candidate = ModelVersion(name, model, feature_stats, os.path.dirname(os.path.abspath(model_path)))
+        check_parity(model)
+        if self.smoke_check is not None:
+            # Смоук-тест заодно прогревает модель до того, как на неё пойдёт трафик
+            self.smoke_check(candidate)
+        return candidate
+
+    def reload(self, version=None, force=False):
+        """
+        Загружает версию (по умолчанию — из CURRENT), проверяет и атомарно подменяет активную.
+
+        Returns:
+            dict: status (swapped/unchanged), version, previous, load_seconds
+
+        Raises:
+            Исключение загрузки/проверки; активная версия при этом не меняется
+        """
+        with self._reload_lock:
+            previous = self.active_version
+            target = version if version is not None else self.current_pointer()
+            if not force and previous is not None and target is not None and target == previous:
+                self.reload_counts["unchanged"] += 1
+                return {"status": "unchanged", "version": previous, "previous": previous, "load_seconds": 0.0}
+
+            started = time.perf_counter()
+            try:
+                candidate = self.load_version(version)
+            except Exception as exc:
+                self.reload_counts["failed"] += 1
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                raise
+            with self._swap_lock:
+                self._active = candidate
+            self._record_pin(version)
+            self.reload_counts["success"] += 1
+            self.last_error = None
+            elapsed = time.perf_counter() - started
+            print(f"[MODEL] Активная версия: {candidate.version} (было: {previous}, загрузка {elapsed:.2f} с)")
+            return {
+                "status": "swapped",
+                "version": candidate.version,
+                "previous": previous,
+                "load_seconds": round(elapsed, 3),
+            }
+
+    def _record_pin(self, version):
+        """Явно выбранная версия записывается в PINNED, чтобы publish_model_version её не удалил."""
+        if not os.path.isdir(self.models_dir):
+            return
+        pin_path = os.path.join(self.models_dir, PINNED_FILENAME)
+        try:
+            if version is None:
+                if os.path.exists(pin_path):
+                    os.remove(pin_path)
+            else:
+                with atomic_open(pin_path) as handle:
+                    handle.write(version + "\n")
+        except OSError as exc:
+            print(f"[WARN] Не удалось обновить {pin_path}: {exc}")
+
+    # --- слежение за CURRENT ----------------------------------------------
+
+    def _pointer_signature(self):
+        pointer = os.path.join(self.models_dir, CURRENT_FILENAME)
+        try:
+            info = os.stat(pointer)
+        except OSError:
+            return None
+        return (info.st_mtime_ns, info.st_size)
+
+    def start_watching(self, interval):
+        """Фоновый поток: перезагружает модель при изменении models/CURRENT."""
+        if interval <= 0 or self._watch_thread is not None:
+            return
+        self._watch_stop.clear()
+        self._watched_signature = self._pointer_signature()
+
+        def watch():
+            while not self._watch_stop.wait(interval):
+                signature = self._pointer_signature()
+                if signature is None or signature == self._watched_signature:
+                    continue
+                self._watched_signature = signature
+                try:
+                    self.reload()
+                except Exception as exc:
+                    print(f"[WARN] Не удалось переключить модель: {exc}")
+
+        self._watch_thread = threading.Thread(target=watch, name="model-watch", daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self):
+        self._watch_stop.set()
+        thread, self._watch_thread = self._watch_thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def status(self):
+        current = self._active
+        return {
+            "active_version": current.version if current is not None else None,
+            "loaded_at": datetime.fromtimestamp(current.loaded_at).isoformat(timespec="seconds") if current else None,
+            "current_pointer": self.current_pointer(),
+            "available_versions": list_versions(self.models_dir),
+            "reloads": dict(self.reload_counts),
+            "last_error": self.last_error,
+        }
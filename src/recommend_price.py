@@ -3,107 +3,69 @@ import numpy as np
 import joblib
 import json
 import os
+import threading
 from datetime import datetime
+from time import perf_counter
 
-# Глобальные переменные для кэша истории
-_USER_HISTORY_CACHE = None
-_DRIVER_HISTORY_CACHE = None
-_HISTORY_DEFAULTS = None
+try:
+    from .deadline import LatencyEstimator, StageTimer, choose_resolution, remaining_seconds, request_deadline
+    from .drift_monitor import DRIFT_PROFILE_FILENAME, DriftMonitor
+    from .feature_stats import finalize_features, load_feature_stats
+    from .history_store import HistoryStore
+    from .model_bundle import MANIFEST_FILENAME, bundle_dir_for, bundle_exists, load_model_bundle
+    from .model_router import SegmentRouter, segment_names
+    from .model_store import ModelStore
+    from .shadow import ShadowScorer
+    from .surrogate import SURROGATE_FILENAME, load_surrogate, order_terms
+    from .timing import record_span, stage
+except ImportError:  # запуск как скрипт или через sys.path (main.py)
+    from deadline import LatencyEstimator, StageTimer, choose_resolution, remaining_seconds, request_deadline
+    from drift_monitor import DRIFT_PROFILE_FILENAME, DriftMonitor
+    from feature_stats import finalize_features, load_feature_stats
+    from history_store import HistoryStore
+    from model_bundle import MANIFEST_FILENAME, bundle_dir_for, bundle_exists, load_model_bundle
+    from model_router import SegmentRouter, segment_names
+    from model_store import ModelStore
+    from shadow import ShadowScorer
+    from surrogate import SURROGATE_FILENAME, load_surrogate, order_terms
+    from timing import record_span, stage
+
+# История пользователей и водителей (обновляется онлайн исходами тендеров)
+HISTORY_STORE = HistoryStore()
+
+# Кэш загруженных моделей: путь артефакта -> (сигнатура файла, модель, статистики признаков)
+_MODEL_CACHE = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+
+# Онлайн-оценки латентности этапов (для выбора разрешения под дедлайн запроса):
+# признаки заказов — по числу заказов, вызов модели — по числу строк,
+# оценка стратегий — по числу точек кривой
+LATENCY = {
+    'order_features': LatencyEstimator(overhead=0.0, per_unit=0.01, prior_sizes=(1.0, 64.0)),
+    'model_call': LatencyEstimator(overhead=0.002, per_unit=2e-5),
+    'strategy': LatencyEstimator(overhead=0.001, per_unit=4e-6),
+}
 
 def load_history_cache():
     """
     Загружает кэш истории пользователей и водителей.
-    Вызывается один раз при импорте модуля.
+    Вызывается один раз при первом обращении к признакам истории.
     """
-    global _USER_HISTORY_CACHE, _DRIVER_HISTORY_CACHE, _HISTORY_DEFAULTS
-    
-    if _USER_HISTORY_CACHE is not None:
-        return  # Уже загружено
-    
-    try:
-        _USER_HISTORY_CACHE = joblib.load('user_history.joblib')
-        _DRIVER_HISTORY_CACHE = joblib.load('driver_history.joblib')
-        
-        # Рассчитываем средние значения для fallback
-        _HISTORY_DEFAULTS = {
-            'user_order_count': float(_USER_HISTORY_CACHE['user_order_count'].mean()),
-            'user_acceptance_rate': float(_USER_HISTORY_CACHE['user_acceptance_rate'].mean()),
-            'user_avg_price_ratio': float(_USER_HISTORY_CACHE['user_avg_price_ratio'].mean()),
-            'user_is_new': float(_USER_HISTORY_CACHE['user_is_new'].mean()),
-            'user_is_vip': float(_USER_HISTORY_CACHE['user_is_vip'].mean()),
-            'user_is_price_sensitive': float(_USER_HISTORY_CACHE['user_is_price_sensitive'].mean()),
-            
-            'driver_bid_count': float(_DRIVER_HISTORY_CACHE['driver_bid_count'].mean()),
-            'driver_acceptance_rate': float(_DRIVER_HISTORY_CACHE['driver_acceptance_rate'].mean()),
-            'driver_avg_bid_ratio': float(_DRIVER_HISTORY_CACHE['driver_avg_bid_ratio'].mean()),
-            'driver_is_active': float(_DRIVER_HISTORY_CACHE['driver_is_active'].mean()),
-            'driver_is_aggressive': float(_DRIVER_HISTORY_CACHE['driver_is_aggressive'].mean()),
-            'driver_is_flexible': float(_DRIVER_HISTORY_CACHE['driver_is_flexible'].mean()),
-        }
-        
-        print(f"[CACHE] Загружен кэш истории: {len(_USER_HISTORY_CACHE)} users, {len(_DRIVER_HISTORY_CACHE)} drivers")
-    except FileNotFoundError:
-        print("[WARN] Кэш истории не найден. Используются заглушки. Запустите: python src/build_history_cache.py")
-        _USER_HISTORY_CACHE = pd.DataFrame()
-        _DRIVER_HISTORY_CACHE = pd.DataFrame()
-        _HISTORY_DEFAULTS = {
-            'user_order_count': 10.0,
-            'user_acceptance_rate': 0.41,
-            'user_avg_price_ratio': 1.18,
-            'user_is_new': 0.3,
-            'user_is_vip': 0.1,
-            'user_is_price_sensitive': 0.5,
-            'driver_bid_count': 20.0,
-            'driver_acceptance_rate': 0.43,
-            'driver_avg_bid_ratio': 1.15,
-            'driver_is_active': 0.5,
-            'driver_is_aggressive': 0.2,
-            'driver_is_flexible': 0.4,
-        }
+    HISTORY_STORE.ensure_loaded()
 
 def get_user_features(user_id=None):
     """
     Получает признаки истории для user_id.
     Если user_id не предоставлен или не найден, возвращает средние значения.
     """
-    load_history_cache()
-    
-    if user_id is not None and not _USER_HISTORY_CACHE.empty:
-        user_row = _USER_HISTORY_CACHE[_USER_HISTORY_CACHE['user_id'] == user_id]
-        if not user_row.empty:
-            return {
-                'user_order_count': float(user_row['user_order_count'].iloc[0]),
-                'user_acceptance_rate': float(user_row['user_acceptance_rate'].iloc[0]),
-                'user_avg_price_ratio': float(user_row['user_avg_price_ratio'].iloc[0]),
-                'user_is_new': float(user_row['user_is_new'].iloc[0]),
-                'user_is_vip': float(user_row['user_is_vip'].iloc[0]),
-                'user_is_price_sensitive': float(user_row['user_is_price_sensitive'].iloc[0]),
-            }
-    
-    # Fallback на средние значения
-    return {k: v for k, v in _HISTORY_DEFAULTS.items() if k.startswith('user_')}
+    return HISTORY_STORE.user_features(user_id)
 
 def get_driver_features(driver_id=None):
     """
     Получает признаки истории для driver_id.
     Если driver_id не предоставлен или не найден, возвращает средние значения.
     """
-    load_history_cache()
-    
-    if driver_id is not None and not _DRIVER_HISTORY_CACHE.empty:
-        driver_row = _DRIVER_HISTORY_CACHE[_DRIVER_HISTORY_CACHE['driver_id'] == driver_id]
-        if not driver_row.empty:
-            return {
-                'driver_bid_count': float(driver_row['driver_bid_count'].iloc[0]),
-                'driver_acceptance_rate': float(driver_row['driver_acceptance_rate'].iloc[0]),
-                'driver_avg_bid_ratio': float(driver_row['driver_avg_bid_ratio'].iloc[0]),
-                'driver_is_active': float(driver_row['driver_is_active'].iloc[0]),
-                'driver_is_aggressive': float(driver_row['driver_is_aggressive'].iloc[0]),
-                'driver_is_flexible': float(driver_row['driver_is_flexible'].iloc[0]),
-            }
-    
-    # Fallback на средние значения
-    return {k: v for k, v in _HISTORY_DEFAULTS.items() if k.startswith('driver_')}
+    return HISTORY_STORE.driver_features(driver_id)
 
 def calculate_fuel_cost(distance_in_meters, fuel_consumption_per_100km=9.0, fuel_price_per_liter=55.0):
     """
@@ -340,6 +302,101 @@ def build_features_for_price(order_data, price_bid, reference_price):
     result = pd.DataFrame([features])
     return result
 
+def expand_price_grids(base, grids, reference_prices):
+    """
+    Разворачивает строки признаков заказов в сетки цен одним векторным проходом.
+
+    Args:
+        base: DataFrame, строка признаков на заказ (build_features_for_price)
+        grids: массивы цен, по одному на строку base
+        reference_prices: опорные цены заказов
+
+    Returns:
+        DataFrame, строки сеток подряд в порядке заказов
+    """
+    sizes = [len(grid) for grid in grids]
+    features = base.loc[base.index.repeat(sizes)].reset_index(drop=True)
+    column = lambda name: np.repeat(base[name].to_numpy(), sizes)
+    prices = np.concatenate(grids).astype(np.float64)
+    reference_price = np.repeat(np.asarray(reference_prices, dtype=np.float64), sizes)
+
+    price_increase_pct = (prices - reference_price) / reference_price * 100
+    distance_km = column('distance_km')
+    fuel_cost = column('fuel_cost_rub')
+    min_profitable = column('min_profitable_price')
+    price_to_fuel_ratio = prices / (fuel_cost + 0.1)
+    net_profit = prices - fuel_cost
+
+    features['price_bid_local'] = prices
+    features['price_increase_abs'] = prices - reference_price
+    features['price_increase_pct'] = price_increase_pct
+    features['is_price_increased'] = (price_increase_pct > 0).astype(np.float64)
+    features['price_per_km'] = prices / (distance_km + 0.1)
+    features['price_per_minute'] = prices / (column('duration_min') + 0.1)
+    features['price_inc_x_distance'] = price_increase_pct * distance_km
+    features['price_inc_x_night'] = price_increase_pct * column('is_night')
+    features['price_inc_x_peak'] = price_increase_pct * column('is_peak_hour')
+    features['price_inc_x_weekend'] = price_increase_pct * column('is_weekend')
+    features['rating_x_price_inc'] = column('driver_rating') * price_increase_pct
+    features['experience_x_price_inc'] = column('driver_experience_years') * price_increase_pct
+    features['price_to_fuel_ratio'] = price_to_fuel_ratio
+    features['price_above_min_profitable'] = prices - min_profitable
+    profitable_known = min_profitable > 0
+    if profitable_known.any():
+        with np.errstate(divide='ignore', invalid='ignore'):
+            features['price_above_min_profitable_pct'] = np.where(
+                profitable_known,
+                (prices - min_profitable) / min_profitable * 100,
+                features['price_above_min_profitable_pct'].to_numpy(),
+            )
+    features['is_highly_profitable'] = (prices >= min_profitable * 2).astype(np.float64)
+    features['is_profitable'] = (prices >= min_profitable).astype(np.float64)
+    features['is_unprofitable'] = (prices < min_profitable).astype(np.float64)
+    features['net_profit'] = net_profit
+    features['net_profit_per_km'] = net_profit / (distance_km + 0.1)
+    features['net_profit_per_minute'] = net_profit / (column('duration_min') + 0.1)
+    features['fuel_ratio_x_distance'] = price_to_fuel_ratio * distance_km
+    features['fuel_ratio_x_peak'] = price_to_fuel_ratio * column('is_peak_hour')
+    features['net_profit_x_rating'] = net_profit * column('driver_rating')
+    features['price_vs_user_avg'] = prices / (column('user_order_count') * 20 + 0.1)
+    features['price_vs_driver_avg'] = prices / (column('driver_bid_count') * 10 + 0.1)
+    return features
+
+# Признаки, которые пересчитывает expand_price_grids, и направление их изменения
+# при росте цены (+1 — не убывает, -1 — не растёт); остальные признаки от цены не зависят
+PRICE_FEATURE_DIRECTIONS = {
+    'price_bid_local': 1, 'price_increase_abs': 1, 'price_increase_pct': 1, 'is_price_increased': 1,
+    'price_per_km': 1, 'price_per_minute': 1,
+    'price_inc_x_distance': 1, 'price_inc_x_night': 1, 'price_inc_x_peak': 1, 'price_inc_x_weekend': 1,
+    'rating_x_price_inc': 1, 'experience_x_price_inc': 1,
+    'price_to_fuel_ratio': 1, 'price_above_min_profitable': 1, 'price_above_min_profitable_pct': 1,
+    'is_highly_profitable': 1, 'is_profitable': 1, 'is_unprofitable': -1,
+    'net_profit': 1, 'net_profit_per_km': 1, 'net_profit_per_minute': 1,
+    'fuel_ratio_x_distance': 1, 'fuel_ratio_x_peak': 1, 'net_profit_x_rating': 1,
+    'price_vs_user_avg': 1, 'price_vs_driver_avg': 1,
+}
+
+def build_features_for_prices(order_data, prices, reference_price):
+    """
+    Признаки для целой сетки цен одного заказа.
+
+    Признаки заказа (время, маршрут, водитель, история) от ставки не зависят:
+    они считаются один раз через build_features_for_price, а зависящие от цены
+    столбцы пересчитываются векторно по тем же формулам. Результат совпадает с
+    pd.concat([build_features_for_price(order_data, p, reference_price) for p in prices]).
+
+    Args:
+        order_data: dict с полями заказа
+        prices: массив ставок
+        reference_price: опорная цена (estimate_reference_price)
+
+    Returns:
+        DataFrame, по строке на цену
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    base = build_features_for_price(order_data, prices[0], reference_price)
+    return expand_price_grids(base, [prices], [reference_price])
+
 def estimate_reference_price(order_data):
     dist_km = order_data['distance_in_meters'] / 1000
     dur_min = order_data['duration_in_seconds'] / 60
@@ -349,49 +406,492 @@ def estimate_reference_price(order_data):
     estimated = base_price + (dist_km * price_per_km) + (dur_min * price_per_min)
     return estimated
 
-def find_optimal_price(order_data, model, num_points=500):
+def prepare_model_input(features, feature_stats=None):
+    """
+    Применяет к признакам те же статистики заполнения/обрезки, что и при обучении.
+    Без статистик (старые артефакты) признаки передаются в модель как есть.
+    """
+    if feature_stats is None:
+        return features
+    return finalize_features(features, feature_stats)
+
+# Стратегия по умолчанию: 70% EV + 30% вероятности, зоны 70/50/30%, маржа 30% над топливом
+DEFAULT_STRATEGY = {
+    'name': 'default',
+    'ev_weight': 0.7,
+    'probability_weight': 0.3,
+    'zone_thresholds': {'green': 0.70, 'yellow_low': 0.50, 'yellow_high': 0.30},
+    'min_profit_margin': None,
+}
+DEFAULT_MIN_PROFIT_MARGIN = 0.3
+
+def resolve_strategy(strategy=None):
+    """Дополняет стратегию значениями по умолчанию (вложенные пороги зон — тоже)."""
+    resolved = dict(DEFAULT_STRATEGY)
+    resolved['zone_thresholds'] = dict(DEFAULT_STRATEGY['zone_thresholds'])
+    for key, value in (strategy or {}).items():
+        if value is None:
+            continue
+        if key == 'zone_thresholds':
+            resolved['zone_thresholds'].update({k: v for k, v in value.items() if v is not None})
+        else:
+            resolved[key] = value
+    return resolved
+
+# Грубая сетка для поиска верхней границы диапазона цен
+COARSE_SCAN_POINTS = 150
+# Порог вероятности для верхней границы (низкий, чтобы захватить красные зоны)
+MAX_PRICE_PROBABILITY = 0.05
+
+def _price_search_range(order_data):
     user_min_price = order_data['price_start_local']
     reference_price = estimate_reference_price(order_data)
-    
     search_min = min(user_min_price, reference_price * 0.5)
-    # Расширяем диапазон для поиска всех зон (убираем жесткое ограничение)
+    # Расширяем диапазон для поиска всех зон (без жесткого ограничения сверху)
     search_max = max(reference_price * 3.0, user_min_price * 2.5)
-    
-    # Убираем ограничение в 800₽, чтобы найти все зоны
-    test_prices = np.linspace(search_min, search_max, 150)
-    test_probs = []
-    for price in test_prices:
-        features = build_features_for_price(order_data, price, reference_price)
-        prob = model.predict_proba(features)[0, 1]
-        test_probs.append(prob)
-    
-    test_probs = np.array(test_probs)
-    prob_threshold = 0.05  # Понижаем порог для поиска красных зон
-    valid_indices = test_probs >= prob_threshold
+    return user_min_price, reference_price, search_min, search_max
+
+def _split_by_grid(probabilities, grids):
+    """Разбивает вероятности общей пачки обратно по сеткам заказов."""
+    return np.split(probabilities, np.cumsum([len(grid) for grid in grids])[:-1])
+
+def _grid_rows(features, grids):
+    """Разбивает строки признаков общей пачки по сеткам заказов (как _split_by_grid)."""
+    bounds = np.cumsum([0] + [len(grid) for grid in grids])
+    return [features.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+def build_order_features(orders):
+    """
+    Признаки заказов, не зависящие от ставки и от модели (строка на заказ).
+
+    Их можно посчитать один раз и передать в compute_price_curves для
+    нескольких моделей (например, при сравнении двух моделей на одном трафике).
+    """
+    with StageTimer(LATENCY['order_features'], len(orders)):
+        return pd.concat([
+            build_features_for_price(order, search_min, reference_price)
+            for order, (_, reference_price, search_min, _) in zip(orders, map(_price_search_range, orders))
+        ], ignore_index=True)
+
+def _max_price(test_prices, test_probs, reference_price):
+    """Верхняя граница сетки: последняя цена грубой сетки с вероятностью не ниже порога."""
+    valid_indices = test_probs >= MAX_PRICE_PROBABILITY
     if valid_indices.any():
-        max_price = test_prices[valid_indices][-1]
+        return test_prices[valid_indices][-1]
+    return reference_price * 2.0
+
+# Модель, обученная с monotone_constraints (train_model --monotone-price):
+# вероятность принятия не растёт с ценой, и границы ищутся делением интервала
+MONOTONE_DECREASING = 'decreasing'
+# Точек на открытый интервал границы зоны за вызов: интервал сужается в BOUNDARY_REFINE_POINTS + 1 раз
+BOUNDARY_REFINE_POINTS = 7
+# Точек на непрерывный участок, где ещё может быть оптимум, за вызов
+OPTIMUM_REFINE_POINTS = 32
+# Предохранитель от бесконечного поиска: не больше стольких вызовов модели на пачку
+MAX_SEARCH_ROUNDS = 16
+# Обычное число вызовов после грубой сетки (для оценки времени в predict_curve_seconds)
+TYPICAL_REFINE_ROUNDS = 2
+
+def is_monotone_model(model):
+    """Модель помечена при обучении как монотонно невозрастающая по цене."""
+    return getattr(model, 'monotone_price', None) == MONOTONE_DECREASING
+
+def _grid_bracket(grid, known_prices, known_probs, threshold):
+    """
+    Интервал границы порога на возрастающей сетке по уже оценённым ценам
+    (любым, не только точкам этой сетки: кривая монотонна).
+
+    Returns:
+        (lo, hi): lo — последний индекс сетки, где вероятность заведомо >= threshold
+        (-1, если такого нет), hi — первый индекс, где заведомо ниже (len(grid), если нет).
+        Граница найдена точно, когда hi - lo == 1.
+    """
+    above = known_prices[known_probs >= threshold]
+    below = known_prices[known_probs < threshold]
+    lo = int(np.searchsorted(grid, above.max(), side='right')) - 1 if above.size else -1
+    hi = int(np.searchsorted(grid, below.min(), side='left')) if below.size else len(grid)
+    return lo, hi
+
+def _bracket_points(lo, hi, count):
+    """До count индексов, равномерно делящих открытый интервал (lo, hi)."""
+    if hi - lo - 1 <= count:
+        return np.arange(lo + 1, hi)
+    return np.unique(np.linspace(lo, hi, count + 2)[1:-1].round().astype(int))
+
+def _spread_points(indices, count):
+    """Индексы каждого непрерывного участка: до count равномерно, включая его правый конец."""
+    points = []
+    for run in np.split(indices, np.flatnonzero(np.diff(indices) > 1) + 1):
+        if len(run) <= count:
+            points.append(run)
+        else:
+            points.append(run[np.linspace(0, len(run) - 1, count).round().astype(int)])
+    return np.concatenate(points) if points else np.empty(0, dtype=int)
+
+def _open_optimum_points(grid, upper, evaluated, valid_mask, strategy):
+    """
+    Неоценённые точки сетки, где ещё может быть максимум EV или оценки стратегии
+    (ветви и границы).
+
+    Вероятность не растёт с ценой, поэтому в точке не выше upper — вероятности
+    ближайшей оценённой цены слева. EV и взвешенная оценка растут и по цене, и
+    по вероятности, так что их верхняя граница в точке — значение при upper.
+    Точка закрыта, если граница ниже лучшего реального значения. Для оценки
+    стратегии нормировка на максимум EV ещё неизвестна: граница точки берётся с
+    лучшим известным EV, реальные значения — с верхней оценкой максимума EV.
+    """
+    known = valid_mask & evaluated
+    unknown = valid_mask & ~evaluated
+    if not known.any():
+        return np.flatnonzero(unknown)
+    expected_bound = grid * upper
+    best_expected = expected_bound[known].max()
+    max_expected = max(best_expected, expected_bound[unknown].max()) if unknown.any() else best_expected
+    max_prob = upper[0]
+    scale = 1.0 / max_prob if max_prob > 0 else 1.0
+
+    def score(expected_values, probabilities, expected_norm):
+        return (strategy['ev_weight'] * expected_values / expected_norm
+                + strategy['probability_weight'] * probabilities * scale)
+
+    best_score = score(expected_bound[known], upper[known], max_expected).max()
+    open_points = unknown & (
+        (expected_bound > best_expected) | (score(expected_bound, upper, best_expected) >= best_score)
+    )
+    return np.flatnonzero(open_points)
+
+def _known_curve(prices, probabilities):
+    """Оценённые точки по возрастанию цены (без повторов)."""
+    prices, first = np.unique(np.concatenate(prices), return_index=True)
+    # Модель монотонна; накопленный минимум лишь страхует от шума float32
+    return prices, np.minimum.accumulate(np.concatenate(probabilities)[first])
+
+def _compute_monotone_curves(orders, model, num_points, feature_stats, order_features, deadline=None,
+                             keep_features=False, coarse_points=COARSE_SCAN_POINTS):
+    """
+    Кривые для монотонной модели на тех же сетках, что у сеточного пути (грубая
+    из coarse_points и точная из num_points цен), но модель оценивает только
+    нужные точки точной сетки: обычно около 220 оценок на заказ вместо
+    coarse_points + num_points за 3 вызова модели на пачку вместо 2.
+
+    Первый вызов — грубая сетка целиком, поэтому верхняя граница цены (последняя
+    точка с вероятностью >= MAX_PRICE_PROBABILITY) та же, что у сеточного пути.
+    Вероятность не растёт с ценой, и границы зон по умолчанию на точной сетке
+    ищутся делением интервала до соседних точек сетки. Оптимум стратегии по
+    умолчанию и максимум EV ищутся ветвями и границами (_open_optimum_points):
+    оцениваются только точки, где они ещё могут оказаться. Границы зон, верхняя
+    граница цены и оптимум совпадают с сеточным путём.
+
+    В кривой — вся точная сетка: неоценённые точки интерполируются между
+    оценёнными (интерполяция монотонна и не пересекает найденных границ), а
+    маска evaluated отмечает реальные выходы модели — evaluate_strategy берёт
+    оптимум только из них. Средние метрики зон считаются по интерполированной
+    кривой. Если дедлайн истёк, поиск останавливается, кривой становятся уже
+    оценённые точки, а в неё пишется degraded_reason='deadline'.
+    """
+    ranges = [_price_search_range(order) for order in orders]
+    reference_prices = [reference_price for _, reference_price, _, _ in ranges]
+    zone_thresholds = sorted(DEFAULT_STRATEGY['zone_thresholds'].values())
+    strategy = resolve_strategy()
+    coarse_grids = [np.linspace(search_min, search_max, coarse_points) for _, _, search_min, search_max in ranges]
+    fine_grids = [None] * len(orders)
+    known_prices = [[] for _ in orders]
+    known_probs = [[] for _ in orders]
+    # Признаки всех вызовов по заказам (keep_features)
+    evaluated_rows = [[] for _ in orders]
+
+    def evaluate(grids):
+        with StageTimer(LATENCY['model_call'], sum(len(grid) for grid in grids)):
+            features = expand_price_grids(base, grids, reference_prices)
+            if keep_features:
+                for rows, grid_rows in zip(evaluated_rows, _grid_rows(features, grids)):
+                    rows.append(grid_rows)
+            batch = prepare_model_input(features, feature_stats)
+            probabilities = _split_by_grid(model.predict_proba(batch)[:, 1], grids)
+        for position, (grid, probs) in enumerate(zip(grids, probabilities)):
+            known_prices[position].append(np.asarray(grid, dtype=np.float64))
+            known_probs[position].append(probs)
+
+    def fine_grid(position, prices, probs):
+        """Точная сетка заказа: до верхней границы цены по оценённой грубой сетке (как _max_price)."""
+        if fine_grids[position] is None:
+            _, reference_price, search_min, _ = ranges[position]
+            lo, _ = _grid_bracket(coarse_grids[position], prices, probs, MAX_PRICE_PROBABILITY)
+            max_price = coarse_grids[position][lo] if lo >= 0 else reference_price * 2.0
+            fine_grids[position] = np.linspace(search_min, max_price, num_points)
+        return fine_grids[position]
+
+    def next_points(position):
+        # Первый вызов — вся грубая сетка, как у сеточного пути: верхняя граница цены
+        # сразу точная, а границы зон зажаты в шаг грубой сетки
+        if not known_prices[position]:
+            return coarse_grids[position]
+        prices, probs = _known_curve(known_prices[position], known_probs[position])
+        grid = fine_grid(position, prices, probs)
+        indices = [
+            _bracket_points(*_grid_bracket(grid, prices, probs, threshold), BOUNDARY_REFINE_POINTS)
+            for threshold in zone_thresholds
+        ]
+        # Вероятность в точке сетки не выше, чем у ближайшей оценённой цены слева
+        # (grid[0] = search_min оценена первым вызовом)
+        upper = probs[np.searchsorted(prices, grid, side='right') - 1]
+        evaluated = np.isin(grid, prices)
+        valid_mask, _, _ = _valid_price_mask(orders[position], grid, ranges[position][0], strategy)
+        indices.append(_spread_points(_open_optimum_points(grid, upper, evaluated, valid_mask, strategy),
+                                      OPTIMUM_REFINE_POINTS))
+        indices = np.unique(np.concatenate(indices)).astype(int)
+        return grid[indices[~evaluated[indices]]]
+
+    rounds = 0
+    expired = False
+    with stage("boundary_search"):
+        base = order_features if order_features is not None else build_order_features(orders)
+        while rounds < MAX_SEARCH_ROUNDS:
+            # Бюджет исчерпан: кривая строится по уже оценённым точкам
+            if rounds and deadline is not None and perf_counter() >= deadline:
+                expired = True
+                break
+            grids = [next_points(position) for position in range(len(orders))]
+            if not any(len(grid) for grid in grids):
+                break
+            evaluate(grids)
+            rounds += 1
+
+    curves = []
+    for position, (user_min_price, reference_price, search_min, _) in enumerate(ranges):
+        prices, probs = _known_curve(known_prices[position], known_probs[position])
+        grid = fine_grid(position, prices, probs)
+        curve = {
+            'user_min_price': user_min_price,
+            'reference_price': reference_price,
+            'max_price': grid[-1],
+            'model_evaluations': int(len(prices)),
+        }
+        if expired:
+            # Как у сеточного пути: кривая — только оценённые точки до верхней границы цены
+            within = prices <= grid[-1]
+            curve.update(prices=prices[within], probabilities=probs[within], degraded_reason='deadline')
+        else:
+            curve.update(prices=grid, probabilities=np.interp(grid, prices, probs), evaluated=np.isin(grid, prices))
+        if keep_features:
+            curve['model_input'] = (np.concatenate(known_prices[position]), pd.concat(evaluated_rows[position]))
+        curves.append(curve)
+    return curves
+
+def compute_price_curves(orders, model, num_points=500, feature_stats=None, order_features=None,
+                         coarse_points=COARSE_SCAN_POINTS, deadline=None, keep_features=False):
+    """
+    Кривые «цена -> вероятность принятия» для пачки заказов.
+
+    Признаки заказа строятся один раз, сетки цен всей пачки разворачиваются
+    векторно (expand_price_grids), а модель вызывается дважды на пачку:
+    грубая сетка (поиск верхней границы цены) и точная из num_points цен.
+    Кривые совпадают с поточечным расчётом build_features_for_price.
+    Для монотонной по цене модели (is_monotone_model) модель оценивает не всю
+    сетку, а только точки, нужные для точных границ и оптимума (_compute_monotone_curves).
+
+    Args:
+        orders: список dict заказов
+        model: модель с predict_proba
+        num_points: точек в точной сетке
+        feature_stats: статистики признаков обучения
+        order_features: готовый результат build_order_features(orders), если есть
+        coarse_points: точек в грубой сетке
+        deadline: дедлайн по perf_counter; если он истёк после грубой сетки, точная
+                  не считается — кривой становятся точки грубой сетки до верхней
+                  границы цены, а в кривую пишется degraded_reason='deadline'
+        keep_features: сохранить в кривой model_input — (цены, признаки до
+                       prepare_model_input) оценённых моделью точек, чтобы другая
+                       модель пересчитала кривую без построения признаков (rescore_curve)
+
+    Returns:
+        list[dict] в порядке orders (формат compute_price_curve)
+    """
+    if not orders:
+        return []
+    if is_monotone_model(model):
+        return _compute_monotone_curves(orders, model, num_points, feature_stats, order_features, deadline,
+                                        keep_features, coarse_points)
+    ranges = [_price_search_range(order) for order in orders]
+    reference_prices = [reference_price for _, reference_price, _, _ in ranges]
+
+    with stage("coarse_scan"):
+        base = order_features if order_features is not None else build_order_features(orders)
+        coarse_grids = [
+            np.linspace(search_min, search_max, coarse_points)
+            for _, _, search_min, search_max in ranges
+        ]
+        with StageTimer(LATENCY['model_call'], coarse_points * len(orders)):
+            coarse_batch = prepare_model_input(expand_price_grids(base, coarse_grids, reference_prices), feature_stats)
+            coarse_probs = _split_by_grid(model.predict_proba(coarse_batch)[:, 1], coarse_grids)
+
+    curves = []
+    for (user_min_price, reference_price, search_min, _), test_prices, test_probs in zip(ranges, coarse_grids, coarse_probs):
+        max_price = _max_price(test_prices, test_probs, reference_price)
+        curves.append({
+            'prices': np.linspace(search_min, max_price, num_points),
+            'user_min_price': user_min_price,
+            'reference_price': reference_price,
+            'max_price': max_price,
+        })
+
+    if deadline is not None and perf_counter() >= deadline:
+        for curve, test_prices, test_probs in zip(curves, coarse_grids, coarse_probs):
+            within = test_prices <= curve['max_price']
+            curve['prices'], curve['probabilities'] = test_prices[within], test_probs[within]
+            curve['degraded_reason'] = 'deadline'
+        return curves
+
+    call_started = perf_counter()
+    with stage("feature_batch"):
+        grids = [curve['prices'] for curve in curves]
+        features = expand_price_grids(base, grids, reference_prices)
+        features_batch = prepare_model_input(features, feature_stats)
+        if keep_features:
+            for curve, rows in zip(curves, _grid_rows(features, grids)):
+                curve['model_input'] = (curve['prices'], rows)
+
+    with stage("predict_proba"):
+        probabilities = model.predict_proba(features_batch)[:, 1]
+    LATENCY['model_call'].observe(len(features_batch), perf_counter() - call_started)
+
+    for curve, curve_probs in zip(curves, _split_by_grid(probabilities, grids)):
+        curve['probabilities'] = curve_probs
+    return curves
+
+def compute_price_curve(order_data, model, num_points=500, feature_stats=None, coarse_points=COARSE_SCAN_POINTS,
+                        deadline=None, keep_features=False):
+    """
+    Считает кривую «цена -> вероятность принятия» — единственная дорогая часть
+    рекомендации (вызовы модели). Кривую можно оценить любым числом стратегий
+    через evaluate_strategy без повторных предсказаний.
+    
+    Returns:
+        dict: prices, probabilities (numpy), user_min_price, reference_price, max_price
+              (и degraded_reason, если расчёт урезан дедлайном)
+    """
+    return compute_price_curves([order_data], model, num_points, feature_stats,
+                                coarse_points=coarse_points, deadline=deadline, keep_features=keep_features)[0]
+
+def rescore_curve(curve, model, feature_stats=None):
+    """
+    Кривая другой модели на признаках готовой кривой (compute_price_curve с
+    keep_features): один вызов predict_proba, признаки заказа и истории не строятся.
+    Если модель оценивала не все точки кривой (монотонный путь), кривая
+    интерполируется по оценённым точкам, а маска evaluated остаётся прежней.
+
+    Returns:
+        dict в формате compute_price_curve с вероятностями модели model
+    """
+    evaluated_prices, features = curve['model_input']
+    probabilities = model.predict_proba(prepare_model_input(features, feature_stats))[:, 1]
+    if not np.array_equal(evaluated_prices, curve['prices']):
+        order = np.argsort(evaluated_prices, kind='stable')
+        probabilities = np.interp(curve['prices'], evaluated_prices[order], probabilities[order])
+    rescored = {key: value for key, value in curve.items() if key != 'model_input'}
+    rescored['probabilities'] = probabilities
+    return rescored
+
+def predict_curve_seconds(coarse_points, num_points, monotone=False, strategies=1):
+    """Оценка времени кривой и оценки стратегий для одного заказа по онлайн-оценкам LATENCY."""
+    if monotone:
+        refine = BOUNDARY_REFINE_POINTS * len(DEFAULT_STRATEGY['zone_thresholds']) + OPTIMUM_REFINE_POINTS
+        calls = (coarse_points,) + (refine,) * TYPICAL_REFINE_ROUNDS
     else:
-        max_price = reference_price * 2.0
+        calls = (coarse_points, num_points)
+    return (
+        LATENCY['order_features'].predict(1)
+        + sum(LATENCY['model_call'].predict(rows) for rows in calls)
+        + LATENCY['strategy'].predict(num_points * strategies)
+    )
+
+def compute_surrogate_curve(order_data, surrogate, num_points=500):
+    """
+    Кривая «цена -> вероятность» по суррогатной модели: тот же диапазон и сетки,
+    что в compute_price_curves, но без построения признаков и вызовов XGBoost.
     
-    # 🚀 ОПТИМИЗАЦИЯ: Увеличиваем точек для плавной кривой вероятности
+    Returns:
+        dict в формате compute_price_curve
+    """
+    user_min_price, reference_price, search_min, search_max = _price_search_range(order_data)
+    terms = order_terms(
+        order_data,
+        get_user_features(order_data.get('user_id')),
+        get_driver_features(order_data.get('driver_id')),
+    )
+    test_prices = np.linspace(search_min, search_max, COARSE_SCAN_POINTS)
+    max_price = _max_price(test_prices, surrogate.predict_curve(terms, test_prices, reference_price), reference_price)
     prices = np.linspace(search_min, max_price, num_points)
+    return {
+        'prices': prices,
+        'probabilities': surrogate.predict_curve(terms, prices, reference_price),
+        'user_min_price': user_min_price,
+        'reference_price': reference_price,
+        'max_price': max_price,
+    }
+
+def _valid_price_mask(order_data, prices, user_min_price, strategy):
+    """
+    Цены, среди которых стратегия ищет оптимум: не ниже стартовой и, если задана
+    min_profit_margin, не ниже топлива × (1 + маржа).
     
-    # Создаем все признаки сразу (batch)
-    all_features = []
-    for price in prices:
-        features = build_features_for_price(order_data, price, reference_price)
-        all_features.append(features)
-    
-    # Объединяем в один DataFrame для batch prediction
-    features_batch = pd.concat(all_features, ignore_index=True)
-    
-    # Batch prediction - намного быстрее!
-    probabilities = model.predict_proba(features_batch)[:, 1]
-    expected_values = prices * probabilities
+    Returns:
+        (маска, fuel_info, min_profitable_price)
+    """
+    fuel_info = calculate_fuel_cost(order_data['distance_in_meters'])
+    # По умолчанию добавляем 30% к стоимости топлива как минимальную компенсацию
+    margin = strategy['min_profit_margin']
+    enforce_min_profit = margin is not None
+    if margin is None:
+        margin = DEFAULT_MIN_PROFIT_MARGIN
+    min_profitable_price = fuel_info['fuel_cost_rub'] * (1 + margin)
     
     valid_mask = prices >= user_min_price
+    if enforce_min_profit and (valid_mask & (prices >= min_profitable_price)).any():
+        valid_mask &= prices >= min_profitable_price
     if not valid_mask.any():
         valid_mask = np.ones(len(prices), dtype=bool)
+    return valid_mask, fuel_info, min_profitable_price
+
+def _strategy_optimum(prices, probabilities, candidates, strategy):
+    """Индекс цены с лучшей взвешенной оценкой стратегии среди candidates (маска)."""
+    expected_values = prices[candidates] * probabilities[candidates]
+    max_prob = probabilities.max()
+    normalized_probs = probabilities[candidates] / max_prob if max_prob > 0 else probabilities[candidates]
+    # 🎯 УЛУЧШЕНИЕ: Ищем баланс между EV и вероятностью
+    # Взвешенная оптимизация: по умолчанию 70% EV + 30% probability
+    weighted_score = (strategy['ev_weight'] * (expected_values / expected_values.max()) +
+                      strategy['probability_weight'] * normalized_probs)
+    return int(np.flatnonzero(candidates)[np.argmax(weighted_score)])
+
+def evaluate_strategy(order_data, curve, strategy=None):
+    """
+    Выбирает оптимальную цену и зоны на готовой кривой по заданной стратегии.
+    
+    Args:
+        order_data: данные заказа
+        curve: результат compute_price_curve
+        strategy: dict с ключами ev_weight, probability_weight, zone_thresholds
+                  (green / yellow_low / yellow_high, доли 0..1) и min_profit_margin
+                  (если задан — оптимум ищется только среди цен не ниже топлива × (1 + маржа));
+                  отсутствующие ключи берутся из DEFAULT_STRATEGY
+    
+    Returns:
+        dict с zones, optimal_price, zone_thresholds, fuel_economics, analysis
+    """
+    strategy = resolve_strategy(strategy)
+    thresholds = strategy['zone_thresholds']
+    green, yellow_low, yellow_high = thresholds['green'], thresholds['yellow_low'], thresholds['yellow_high']
+    
+    prices = curve['prices']
+    probabilities = curve['probabilities']
+    user_min_price = curve['user_min_price']
+    max_price = curve['max_price']
+    
+    # Рассчитываем стоимость топлива и минимальную рентабельную цену (топливо + маржа)
+    valid_mask, fuel_info, min_profitable_price = _valid_price_mask(order_data, prices, user_min_price, strategy)
+    
+    expected_values = prices * probabilities
     
     valid_prices = prices[valid_mask]
     valid_probs = probabilities[valid_mask]
@@ -401,16 +901,17 @@ def find_optimal_price(order_data, model, num_points=500):
     normalized_probs = probabilities / max_prob if max_prob > 0 else probabilities
     valid_normalized_probs = normalized_probs[valid_mask]
     
-    # 🎯 УЛУЧШЕНИЕ: Ищем баланс между EV и вероятностью
-    # Взвешенная оптимизация: 70% EV + 30% probability
-    weighted_score = (0.7 * (valid_expected_values / valid_expected_values.max()) + 
-                     0.3 * valid_normalized_probs)
-    best_idx = np.argmax(weighted_score)
+    # Монотонный путь: оптимум выбирается только среди реальных выходов модели
+    candidates = valid_mask
+    evaluated = curve.get('evaluated')
+    if evaluated is not None and (valid_mask & evaluated).any():
+        candidates = valid_mask & evaluated
+    best_idx = _strategy_optimum(prices, probabilities, candidates, strategy)
     
-    optimal_price = valid_prices[best_idx]
-    optimal_prob = valid_probs[best_idx]
-    optimal_normalized_prob = valid_normalized_probs[best_idx]
-    optimal_expected_value = valid_expected_values[best_idx]
+    optimal_price = prices[best_idx]
+    optimal_prob = probabilities[best_idx]
+    optimal_normalized_prob = normalized_probs[best_idx]
+    optimal_expected_value = expected_values[best_idx]
     
     # Находим цену с максимальной вероятностью
     max_prob_idx = np.argmax(valid_probs)
@@ -418,17 +919,17 @@ def find_optimal_price(order_data, model, num_points=500):
     
     # Определяем зоны на основе ВЕРОЯТНОСТИ принятия, а не EV
     # Это гарантирует, что цвета привязаны к шансам принятия цены
+    zones_started = perf_counter()
     
     zones = []
     
     # Создаем все зоны, даже если они пустые, для консистентности UI
     zone_configs = [
-        {'id': 3, 'name': 'zone_3_green', 'min_prob': 0.70, 'max_prob': 1.0},
-        {'id': 2, 'name': 'zone_2_yellow_low', 'min_prob': 0.50, 'max_prob': 0.70},
-        {'id': 4, 'name': 'zone_4_yellow_high', 'min_prob': 0.30, 'max_prob': 0.50},
-        {'id': 1, 'name': 'zone_1_red_low', 'min_prob': 0.0, 'max_prob': 0.30}
+        {'id': 3, 'name': 'zone_3_green', 'min_prob': green, 'max_prob': 1.0},
+        {'id': 2, 'name': 'zone_2_yellow_low', 'min_prob': yellow_low, 'max_prob': green},
+        {'id': 4, 'name': 'zone_4_yellow_high', 'min_prob': yellow_high, 'max_prob': yellow_low},
+        {'id': 1, 'name': 'zone_1_red_low', 'min_prob': 0.0, 'max_prob': yellow_high}
     ]
-    
     for config in zone_configs:
         mask = (valid_probs >= config['min_prob']) & (valid_probs < config['max_prob'])
         if mask.any():
@@ -455,11 +956,11 @@ def find_optimal_price(order_data, model, num_points=500):
     
     # Определяем, в какую зону попадает оптимальная цена по вероятности
     optimal_zone_id = None
-    if optimal_prob >= 0.70:
+    if optimal_prob >= green:
         optimal_zone_id = 3  # Зелёная зона
-    elif optimal_prob >= 0.50:
+    elif optimal_prob >= yellow_low:
         optimal_zone_id = 2  # Жёлтая низкая
-    elif optimal_prob >= 0.30:
+    elif optimal_prob >= yellow_high:
         optimal_zone_id = 4  # Жёлтая высокая
     else:
         optimal_zone_id = 1  # Красная зона
@@ -471,13 +972,7 @@ def find_optimal_price(order_data, model, num_points=500):
             optimal_zone_id = max(zones, key=lambda z: z['metrics']['avg_probability_percent'])['zone_id']
         else:
             optimal_zone_id = 3  # По умолчанию зелёная
-    
-    # Рассчитываем стоимость топлива
-    fuel_info = calculate_fuel_cost(order_data['distance_in_meters'])
-    
-    # Рассчитываем минимальную рентабельную цену (топливо + минимальная маржа)
-    # Добавляем 30% к стоимости топлива как минимальную компенсацию
-    min_profitable_price = fuel_info['fuel_cost_rub'] * 1.3
+    record_span("zone_aggregation", perf_counter() - zones_started)
     
     # Рассчитываем чистую выгоду от оптимальной цены
     net_profit_optimal = optimal_expected_value - fuel_info['fuel_cost_rub']
@@ -493,10 +988,10 @@ def find_optimal_price(order_data, model, num_points=500):
             'net_profit': round(float(net_profit_optimal), 2)
         },
         'zone_thresholds': {
-            'green_zone': '≥70% вероятность принятия',
-            'yellow_low_zone': '50-70% вероятность принятия',
-            'yellow_high_zone': '30-50% вероятность принятия',
-            'red_zone': '<30% вероятность принятия'
+            'green_zone': f'≥{green * 100:g}% вероятность принятия',
+            'yellow_low_zone': f'{yellow_low * 100:g}-{green * 100:g}% вероятность принятия',
+            'yellow_high_zone': f'{yellow_high * 100:g}-{yellow_low * 100:g}% вероятность принятия',
+            'red_zone': f'<{yellow_high * 100:g}% вероятность принятия'
         },
         'fuel_economics': {
             'fuel_cost': fuel_info['fuel_cost_rub'],
@@ -520,14 +1015,218 @@ def find_optimal_price(order_data, model, num_points=500):
     }
     return result
 
-def recommend_price(order_data, output_json=True, model_path="model_enhanced.joblib"):
+def find_optimal_price(order_data, model, num_points=500, feature_stats=None, strategy=None):
+    """Кривая вероятности + оценка одной стратегии (по умолчанию — DEFAULT_STRATEGY)."""
+    curve = compute_price_curve(order_data, model, num_points=num_points, feature_stats=feature_stats)
+    return evaluate_strategy(order_data, curve, strategy)
+
+def evaluate_scenarios(order_data, curve, scenarios):
+    """
+    Оценивает несколько стратегий на одной кривой.
+    
+    Returns:
+        список dict: name, strategy (с подставленными значениями по умолчанию), zones,
+        optimal_price, zone_thresholds, fuel_economics
+    """
+    results = []
+    with stage("scenarios"):
+        for index, scenario in enumerate(scenarios):
+            strategy = resolve_strategy(scenario)
+            strategy['name'] = scenario.get('name') or f'scenario_{index + 1}'
+            evaluated = evaluate_strategy(order_data, curve, strategy)
+            evaluated.pop('analysis')
+            results.append({'name': strategy['name'], 'strategy': strategy, **evaluated})
+    return results
+
+def _file_signature(path):
+    info = os.stat(path)
+    return (info.st_mtime_ns, info.st_size)
+
+def _model_source(model_path):
+    bundle_dir = bundle_dir_for(model_path)
+    if bundle_exists(bundle_dir):
+        return os.path.join(bundle_dir, MANIFEST_FILENAME), bundle_dir
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"⚠️ Модель не найдена: {model_path}")
-    model = joblib.load(model_path)
-    if hasattr(model, 'predict_proba'):
-        pass
+    return model_path, None
+
+def load_model_artifacts(model_path="model_enhanced.joblib"):
+    """
+    Загружает модель и статистики признаков без кэширования.
+    
+    Предпочитает нативный бандл (model_bundle/ рядом с model_path), иначе
+    читает model_enhanced.joblib.
+    
+    Returns:
+        Кортеж (модель с predict_proba, feature_stats или None)
+    """
+    _, bundle_dir = _model_source(model_path)
+    if bundle_dir is not None:
+        model = load_model_bundle(bundle_dir)
+        feature_stats = model.feature_stats
+        if feature_stats is None:
+            feature_stats = load_feature_stats(model_path)
     else:
+        model = joblib.load(model_path)
+        feature_stats = load_feature_stats(model_path)
+    if not hasattr(model, 'predict_proba'):
         raise TypeError(f"Загружен неправильный объект: {type(model)}")
+    return model, feature_stats
+
+def load_pricing_model(model_path="model_enhanced.joblib"):
+    """
+    То же, что load_model_artifacts, но с кэшем в процессе: файл
+    перечитывается только при изменении артефакта.
+    """
+    source, _ = _model_source(model_path)
+    key = os.path.abspath(source)
+    signature = _file_signature(source)
+    cached = _MODEL_CACHE.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1], cached[2]
+    
+    with _MODEL_CACHE_LOCK:
+        cached = _MODEL_CACHE.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1], cached[2]
+        model, feature_stats = load_model_artifacts(model_path)
+        _MODEL_CACHE[key] = (signature, model, feature_stats)
+    return model, feature_stats
+
+# Заказ для смоук-теста и прогрева новой версии модели перед подменой
+SMOKE_TEST_ORDER = {
+    "order_timestamp": 1718558240,
+    "distance_in_meters": 3404,
+    "duration_in_seconds": 486,
+    "pickup_in_meters": 790,
+    "pickup_in_seconds": 169,
+    "driver_rating": 5.0,
+    "platform": "android",
+    "price_start_local": 180.0,
+    "carname": "LADA",
+    "carmodel": "GRANTA",
+    "driver_reg_date": "2020-01-15",
+}
+
+def _smoke_check(candidate):
+    """Полный прогон рекомендации на новой версии: прогрев и проверка адекватности ответа."""
+    result = find_optimal_price(SMOKE_TEST_ORDER, candidate.model, num_points=50,
+                                feature_stats=candidate.feature_stats)
+    probability = result['optimal_price']['probability_percent']
+    if not np.isfinite(probability) or not 0.0 <= probability <= 100.0:
+        raise ValueError(f"Смоук-тест не пройден: вероятность {probability}")
+
+# Суррогатные модели по каталогу версии модели: путь -> SurrogateModel или None
+_SURROGATE_CACHE = {}
+
+def surrogate_for(model_dir):
+    """Суррогат, обученный вместе с моделью в model_dir (surrogate.json), или None."""
+    key = os.path.abspath(model_dir)
+    if key not in _SURROGATE_CACHE:
+        _SURROGATE_CACHE[key] = load_surrogate(os.path.join(key, SURROGATE_FILENAME))
+    return _SURROGATE_CACHE[key]
+
+# Активная версия модели для API (models/CURRENT или model_enhanced.joblib в cwd)
+MODEL_STORE = ModelStore(loader=load_model_artifacts, smoke_check=_smoke_check)
+
+# Модели сегментов (models/segments/<сегмент>/), загружаемые по требованию; родитель — MODEL_STORE
+SEGMENT_ROUTER = SegmentRouter(MODEL_STORE, loader=load_model_artifacts, smoke_check=_smoke_check)
+
+def select_model(order_data):
+    """
+    Версия модели для заказа: модель самого частного загруженного сегмента
+    (город и класс такси, город, класс), иначе глобальная.
+
+    Returns:
+        (ModelVersion, имя версии для ответа: '<сегмент>/<версия>' или '<версия>')
+    """
+    taxi_type = detect_taxi_type(order_data.get('carname', 'Renault'), order_data.get('carmodel', 'Logan'))
+    active, segment = SEGMENT_ROUTER.select(segment_names(taxi_type, order_data.get('city')))
+    return active, (f"{segment}/{active.version}" if segment else active.version)
+
+# Теневая оценка модели-кандидата (кандидат и доля запросов задаются сервисом)
+SHADOW_SCORER = ShadowScorer(MODEL_STORE, rescore=rescore_curve, evaluate=evaluate_strategy)
+
+def _drift_profile_source():
+    current = MODEL_STORE.active
+    return current.version, os.path.join(current.path, DRIFT_PROFILE_FILENAME)
+
+# Мониторинг дрейфа относительно эталона активной модели (обновляется API в фоне)
+DRIFT_MONITOR = DriftMonitor(profile_source=_drift_profile_source)
+
+def recommend_price(order_data, output_json=True, model_path=None):
+    """
+    Рекомендация цены по основной модели.
+
+    Если в заказе есть deadline_ms (или deadline_at от сервиса), разрешение сетки
+    выбирается по онлайн-оценкам LATENCY так, чтобы уложиться в бюджет, а при
+    истечении дедлайна посреди поиска возвращается ответ по уже посчитанным точкам.
+    Урезанный ответ помечается в analysis: degraded и degraded_reason
+    ('budget' — разрешение понижено заранее, 'deadline' — поиск прерван).
+
+    Если сервис выбрал запрос для теневой оценки (в заказе есть dict shadow),
+    в него кладутся кривая с признаками (curve), optimal_price ответа и
+    model_version — для SHADOW_SCORER.score после отправки ответа.
+    Урезанные ответы в теневую оценку не попадают.
+    """
+    deadline = request_deadline(order_data)
+    with stage("model_load"):
+        if model_path is None:
+            # Запрос до конца работает с той версией, которую получил здесь
+            active, model_version = select_model(order_data)
+            model, feature_stats = active.model, active.feature_stats
+        else:
+            model, feature_stats = load_pricing_model(model_path)
+            content_hash = getattr(model, 'content_hash', None)
+            model_version = content_hash[:12] if content_hash else os.path.basename(model_path)
+    _check_required_fields(order_data)
+    monotone = is_monotone_model(model)
+    strategies = 1 + len(order_data.get('scenarios') or ())
+    coarse_points, num_points, downgraded = choose_resolution(
+        remaining_seconds(deadline),
+        lambda coarse, fine: predict_curve_seconds(coarse, fine, monotone, strategies),
+    )
+    shadow = order_data.get('shadow')
+    # Кривая считается один раз; основная стратегия и все сценарии оцениваются на ней
+    curve = compute_price_curve(order_data, model, num_points=num_points, feature_stats=feature_stats,
+                                coarse_points=coarse_points, deadline=deadline,
+                                keep_features=isinstance(shadow, dict))
+    if downgraded:
+        curve.setdefault('degraded_reason', 'budget')
+    result = _finish_recommendation(order_data, curve, model_version, 'full', output_json=False)
+    if isinstance(shadow, dict) and 'model_input' in curve and 'degraded_reason' not in curve:
+        shadow.update(curve=curve, optimal_price=result['optimal_price'], model_version=model_version)
+    if output_json:
+        return json.dumps(result, ensure_ascii=False, indent=2)
+    return result
+
+def recommend_price_fast(order_data, output_json=True, model_path=None):
+    """
+    Быстрый путь: та же рекомендация, но кривая считается суррогатной моделью
+    активной версии (surrogate.json). Используется сервисом при перегрузке,
+    по запросу клиента и вместо заглушки при ошибке основной модели.
+    Ответ помечен degraded_reason='surrogate'.
+    
+    Raises:
+        FileNotFoundError: если у версии модели нет суррогата
+    """
+    with stage("model_load"):
+        if model_path is None:
+            active, model_version = select_model(order_data)
+            model_dir = active.path
+        else:
+            model_dir, model_version = os.path.dirname(os.path.abspath(model_path)), os.path.basename(model_path)
+        surrogate = surrogate_for(model_dir)
+    if surrogate is None:
+        raise FileNotFoundError(f"⚠️ Суррогатная модель не найдена: {os.path.join(model_dir, SURROGATE_FILENAME)}")
+    _check_required_fields(order_data)
+    with stage("surrogate_curve"):
+        curve = compute_surrogate_curve(order_data, surrogate, num_points=500)
+    # Кривая приближённая: ответ помечается как урезанный
+    curve['degraded_reason'] = 'surrogate'
+    return _finish_recommendation(order_data, curve, model_version, 'surrogate', output_json)
+
+def _check_required_fields(order_data):
     required_fields = [
         'order_timestamp', 'distance_in_meters', 'duration_in_seconds',
         'pickup_in_meters', 'pickup_in_seconds', 'price_start_local'
@@ -535,7 +1234,20 @@ def recommend_price(order_data, output_json=True, model_path="model_enhanced.job
     for field in required_fields:
         if field not in order_data:
             raise ValueError(f"⚠️ Отсутствует обязательное поле: {field}")
-    result = find_optimal_price(order_data, model, num_points=500)
+
+def _finish_recommendation(order_data, curve, model_version, model_kind, output_json):
+    scenarios = order_data.get('scenarios')
+    with StageTimer(LATENCY['strategy'], len(curve['prices']) * (1 + len(scenarios or ()))):
+        result = evaluate_strategy(order_data, curve)
+        if scenarios:
+            result['scenarios'] = evaluate_scenarios(order_data, curve, scenarios)
+    analysis = result['analysis']
+    analysis['model_version'] = model_version
+    analysis['model_kind'] = model_kind
+    analysis['price_points'] = int(len(curve['prices']))
+    analysis['degraded'] = 'degraded_reason' in curve
+    if analysis['degraded']:
+        analysis['degraded_reason'] = curve['degraded_reason']
     if output_json:
         return json.dumps(result, ensure_ascii=False, indent=2)
     return result
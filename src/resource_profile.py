@@ -0,0 +1,218 @@
+"""
+Профиль ресурсов обучения по этапам: время, память Python и RSS процесса.
+
+ResourceProfiler подключается к этапам timing.stage() через observe_stages():
+
+    profiler = ResourceProfiler(trace_python=True)
+    with profiler, observe_stages(profiler):
+        ...                                  # этапы обучения
+    save_training_profile(profiler.report())
+
+Для каждого этапа записываются:
+    - время (с);
+    - RSS процесса в начале, в конце и пиковый — по фоновому опросу
+      раз в RSS_SAMPLE_INTERVAL секунд (нативная память xgboost видна только здесь);
+    - память, выделенная Python и numpy, в начале, в конце и пиковая (tracemalloc,
+      если включён: замедляет этапы pandas в несколько раз, поэтому по запросу).
+
+Пики вложенных этапов входят в пики объемлющих. Повторы этапа с тем же
+именем складываются по времени, пики берутся максимальные.
+"""
+
+import json
+import os
+import sys
+import threading
+import tracemalloc
+from datetime import datetime
+from time import perf_counter
+
+try:
+    import psutil
+except ImportError:  # необязательная зависимость: на Linux RSS читается из /proc
+    psutil = None
+
+try:
+    from .atomic_write import atomic_open
+except ImportError:  # запуск как скрипт или через sys.path (main.py)
+    from atomic_write import atomic_open
+
+TRAINING_PROFILE_FILENAME = "training_profile.json"
+RSS_SAMPLE_INTERVAL = 0.05
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_MB = 1024 * 1024
+
+
+def current_rss_bytes():
+    """Текущий RSS процесса в байтах или None, если узнать его нечем."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm", encoding="ascii") as handle:
+            return int(handle.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes():
+    """Пиковый RSS процесса за всё время работы (getrusage) или None."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _OpenStage:
+    __slots__ = ("name", "rss_start", "rss_peak", "python_start", "python_peak")
+
+    def __init__(self, name, rss, python):
+        self.name = name
+        self.rss_start = rss
+        self.rss_peak = rss
+        self.python_start = python
+        self.python_peak = python
+
+
+def _max(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return max(left, right)
+
+
+class ResourceProfiler:
+    """
+    Наблюдатель этапов (см. timing.observe_stages) с замером памяти.
+
+    Args:
+        trace_python: вести tracemalloc (точные пики Python/numpy, но обучение медленнее)
+        interval: период опроса RSS, с
+    """
+
+    def __init__(self, trace_python=False, interval=RSS_SAMPLE_INTERVAL):
+        self.trace_python = trace_python
+        self.interval = interval
+        self.stages = {}
+        self._open = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started_tracing = False
+        self._started = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
+        return False
+
+    def start(self):
+        self._started = perf_counter()
+        if self.trace_python and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_rss, name="resource-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _python_bytes(self):
+        """Текущая память tracemalloc; пик с прошлого вызова переносится во все открытые этапы."""
+        if not tracemalloc.is_tracing():
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        for frame in self._open:
+            frame.python_peak = _max(frame.python_peak, peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def _sample_rss(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss_bytes()
+            with self._lock:
+                for frame in self._open:
+                    frame.rss_peak = _max(frame.rss_peak, rss)
+
+    def enter(self, name):
+        rss = current_rss_bytes()
+        with self._lock:
+            python = self._python_bytes()
+            for frame in self._open:
+                frame.rss_peak = _max(frame.rss_peak, rss)
+            self._open.append(_OpenStage(name, rss, python))
+
+    def exit(self, name, seconds):
+        rss = current_rss_bytes()
+        with self._lock:
+            python = self._python_bytes()
+            for frame in self._open:
+                frame.rss_peak = _max(frame.rss_peak, rss)
+            frame = self._open.pop()
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = {
+                "calls": 0, "seconds": 0.0,
+                "rss_start_bytes": frame.rss_start, "rss_peak_bytes": None,
+                "python_start_bytes": frame.python_start, "python_peak_bytes": None,
+            }
+        entry["calls"] += 1
+        entry["seconds"] = round(entry["seconds"] + seconds, 6)
+        entry["rss_end_bytes"] = rss
+        entry["python_end_bytes"] = python
+        entry["rss_peak_bytes"] = _max(entry["rss_peak_bytes"], frame.rss_peak)
+        entry["python_peak_bytes"] = _max(entry["python_peak_bytes"], frame.python_peak)
+        for prefix in ("rss", "python"):
+            start, peak = entry[f"{prefix}_start_bytes"], entry[f"{prefix}_peak_bytes"]
+            entry[f"{prefix}_peak_increase_bytes"] = None if start is None or peak is None else peak - start
+
+    def report(self, **metadata):
+        """
+        Машиночитаемый отчёт: метаданные, пиковый RSS процесса и этапы в порядке завершения.
+        """
+        rss_source = "psutil" if psutil is not None else ("/proc" if current_rss_bytes() is not None else None)
+        return {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            **metadata,
+            "python_tracing": self.trace_python,
+            "rss_source": rss_source,
+            "rss_sample_interval": self.interval,
+            "total_seconds": round(perf_counter() - self._started, 3) if self._started else None,
+            "process_peak_rss_bytes": peak_rss_bytes(),
+            "stages": [{"name": name, **entry} for name, entry in self.stages.items()],
+        }
+
+
+def format_resource_report(report):
+    """Таблица памяти по этапам для лога обучения (МБ)."""
+    def mb(value):
+        return f"{value / _MB:>9.1f}" if value is not None else f"{'—':>9s}"
+
+    lines = [f"   {'этап':<34s} {'RSS пик':>9s} {'+RSS':>9s} {'Py пик':>9s} {'+Py':>9s}"]
+    for entry in report["stages"]:
+        label = ("  " * entry["name"].count(".")) + entry["name"]
+        lines.append(
+            f"   {label:<34s} {mb(entry['rss_peak_bytes'])} {mb(entry['rss_peak_increase_bytes'])} "
+            f"{mb(entry['python_peak_bytes'])} {mb(entry['python_peak_increase_bytes'])}"
+        )
+    lines.append(f"   {'пиковый RSS процесса':<34s} {mb(report['process_peak_rss_bytes'])}")
+    return "\n".join(lines)
+
+
+def save_training_profile(report, path=TRAINING_PROFILE_FILENAME):
+    with atomic_open(path) as handle:
+        json.dump(report, handle, ensure_ascii=False, indent=2)
+    return path
@@ -0,0 +1,140 @@
+"""
+Теневая оценка модели-кандидата на живом трафике.
+
+Кандидат — версия из models/, ещё не ставшая активной (загружается через
+ModelStore.load_version: та же проверка паритета и смоук-тест, что перед
+подменой). Доля запросов (sample_rate) после отправки ответа пересчитывается
+кандидатом в фоне. Кандидат получает те же признаки, на которых основная
+модель строила кривую (compute_price_curve с keep_features), поэтому теневая
+оценка стоит один вызов predict_proba и одну оценку стратегии.
+
+Для каждого заказа сравниваются:
+    - оптимальные цены: отклонение цены кандидата от основной, %;
+    - зоны оптимальной цены: смена зоны (zone_id);
+    - кривые: средняя абсолютная разница вероятностей.
+"""
+
+import random
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+
+class ShadowScorer:
+    """
+    Кандидат для теневой оценки и накопленные расхождения с основной моделью.
+
+    Args:
+        store: ModelStore, из каталога которого загружается кандидат
+        rescore: функция (curve, model, feature_stats) -> кривая кандидата
+        evaluate: функция (order_data, curve) -> рекомендация (evaluate_strategy)
+        sample_rate: доля запросов, пересчитываемых кандидатом
+    """
+
+    def __init__(self, store, rescore, evaluate, sample_rate=0.0):
+        self.store = store
+        self.rescore = rescore
+        self.evaluate = evaluate
+        self.sample_rate = sample_rate
+        self._candidate = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.counts = {"scored": 0, "failed": 0, "zone_flips": 0}
+        self._price_delta_sum = 0.0
+        self._abs_price_delta_sum = 0.0
+        self._probability_mae_sum = 0.0
+        self.last_error = None
+
+    def configure(self, sample_rate=None):
+        if sample_rate is not None:
+            self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+
+    @property
+    def candidate(self):
+        return self._candidate
+
+    def load_candidate(self, version):
+        """
+        Загружает и проверяет кандидата; None отключает теневую оценку.
+        Статистика расхождений начинается заново.
+
+        Raises:
+            Исключение загрузки/проверки; прежний кандидат при этом остаётся
+        """
+        candidate = self.store.load_version(version) if version else None
+        with self._lock:
+            self._candidate = candidate
+            self._loaded_at = time.time() if candidate is not None else None
+            self._reset()
+        return candidate
+
+    def sampled(self):
+        """Пересчитывать ли этот запрос кандидатом."""
+        return self._candidate is not None and random.random() < self.sample_rate
+
+    def score(self, order_data, curve, primary):
+        """
+        Пересчитывает кривую заказа кандидатом и сравнивает с ответом основной модели.
+
+        Args:
+            order_data: данные заказа
+            curve: кривая основной модели с model_input (keep_features)
+            primary: optimal_price ответа основной модели
+
+        Returns:
+            dict: candidate, price_delta_pct, zone_flip, probability_mae
+            или None, если кандидат не задан
+        """
+        candidate = self._candidate
+        if candidate is None:
+            return None
+        try:
+            shadow_curve = self.rescore(curve, candidate.model, candidate.feature_stats)
+            optimal = self.evaluate(order_data, shadow_curve)['optimal_price']
+        except Exception as exc:
+            with self._lock:
+                self.counts["failed"] += 1
+                self.last_error = f"{type(exc).__name__}: {exc}"
+            raise
+        primary_price = primary['price']
+        comparison = {
+            "candidate": candidate.version,
+            "price_delta_pct": (optimal['price'] - primary_price) / primary_price * 100 if primary_price else 0.0,
+            "zone_flip": optimal['zone_id'] != primary['zone_id'],
+            "probability_mae": float(np.mean(np.abs(shadow_curve['probabilities'] - curve['probabilities']))),
+        }
+        with self._lock:
+            # Кандидат мог смениться, пока шёл расчёт: статистика только текущего
+            if self._candidate is candidate:
+                self.counts["scored"] += 1
+                self.counts["zone_flips"] += int(comparison["zone_flip"])
+                self._price_delta_sum += comparison["price_delta_pct"]
+                self._abs_price_delta_sum += abs(comparison["price_delta_pct"])
+                self._probability_mae_sum += comparison["probability_mae"]
+        return comparison
+
+    def status(self):
+        with self._lock:
+            candidate = self._candidate
+            scored = self.counts["scored"]
+
+            def mean(total):
+                return round(total / scored, 6) if scored else None
+
+            return {
+                "candidate_version": candidate.version if candidate is not None else None,
+                "loaded_at": datetime.fromtimestamp(self._loaded_at).isoformat(timespec="seconds")
+                if self._loaded_at else None,
+                "sample_rate": self.sample_rate,
+                "counts": dict(self.counts),
+                "zone_flip_rate": mean(self.counts["zone_flips"]),
+                "mean_price_delta_pct": mean(self._price_delta_sum),
+                "mean_abs_price_delta_pct": mean(self._abs_price_delta_sum),
+                "mean_probability_mae": mean(self._probability_mae_sum),
+                "last_error": self.last_error,
+            }
@@ -0,0 +1,280 @@
+"""
+Дистиллированная суррогатная модель для быстрого пути рекомендации.
+
+Логистическая модель со сплайном по наценке обучается на выходах
+калиброванной модели: строки обучающей выборки переоцениваются на сетке
+цен (как в онлайн-кривой), и линейная модель подгоняется к логитам
+вероятностей учителя. Результат — пара десятков коэффициентов в
+surrogate.json рядом с моделью.
+
+    logit(p) = static(заказ) + наклон(заказ) * pct + Σ w_k * max(pct - knot_k, 0)
+
+где pct — наценка к опорной цене в процентах. Признаки заказа считаются
+один раз, кривая из сотен цен — одна векторная операция numpy.
+"""
+
+import json
+import math
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .atomic_write import atomic_open
+except ImportError:  # запуск как скрипт или через sys.path (main.py)
+    from atomic_write import atomic_open
+
+SURROGATE_FILENAME = "surrogate.json"
+SURROGATE_FORMAT_VERSION = 1
+
+# Признаки заказа (имена как в build_features_for_price)
+ORDER_TERMS = (
+    'distance_km', 'duration_min', 'pickup_km',
+    'hour_sin', 'hour_cos', 'is_peak_hour', 'is_night',
+    'driver_rating', 'user_acceptance_rate', 'user_avg_price_ratio',
+    'driver_acceptance_rate', 'user_driver_match_score',
+)
+# Признаки, меняющие наклон кривой по наценке
+PRICE_INTERACTIONS = ('distance_km', 'driver_rating', 'user_acceptance_rate', 'driver_acceptance_rate')
+KNOT_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+# Переоценка обучающих строк: цена = стартовая цена × множитель (диапазон онлайн-сетки)
+REPRICE_MULTIPLIERS = tuple(np.round(np.linspace(0.5, 3.0, 11), 3))
+MAX_DISTILL_ROWS = 5_000
+RIDGE_ALPHA = 1.0
+PROBABILITY_EPSILON = 1e-4
+# Пороги зон по умолчанию — для оценки согласия по зонам
+ZONE_EDGES = (0.30, 0.50, 0.70)
+# Порог экспорта: суррогат, заметно расходящийся с моделью на тесте, не сохраняется
+MIN_ZONE_AGREEMENT = 0.85
+MAX_P95_ABS_ERROR = 0.10
+
+
+def _logit(probabilities):
+    clipped = np.clip(probabilities, PROBABILITY_EPSILON, 1.0 - PROBABILITY_EPSILON)
+    return np.log(clipped / (1.0 - clipped))
+
+
+def _design_matrix(terms, pct, knots):
+    columns = [np.asarray(terms[name], dtype=np.float64) for name in ORDER_TERMS]
+    columns.append(pct)
+    columns += [np.maximum(pct - knot, 0.0) for knot in knots]
+    columns += [pct * np.asarray(terms[name], dtype=np.float64) for name in PRICE_INTERACTIONS]
+    return np.column_stack(columns)
+
+
+def _weight_names(knots):
+    return (
+        list(ORDER_TERMS) + ['price_increase_pct']
+        + [f'knot_{index}' for index in range(len(knots))]
+        + [f'price_increase_pct_x_{name}' for name in PRICE_INTERACTIONS]
+    )
+
+
+def _ridge(design, target, alpha=RIDGE_ALPHA):
+    """Гребневая регрессия на стандартизованных колонках; коэффициенты в исходном масштабе."""
+    mean = design.mean(axis=0)
+    scale = design.std(axis=0)
+    scale[scale == 0] = 1.0
+    standardized = (design - mean) / scale
+    target_mean = target.mean()
+    gram = standardized.T @ standardized + alpha * np.eye(design.shape[1])
+    weights = np.linalg.solve(gram, standardized.T @ (target - target_mean)) / scale
+    return float(target_mean - mean @ weights), weights
+
+
+def reprice_rows(features, expand, multipliers=REPRICE_MULTIPLIERS):
+    """
+    Переоценивает строки признаков на сетке цен (цена = price_start_local × множитель).
+
+    Args:
+        features: финализированные признаки обучения (полный набор колонок)
+        expand: recommend_price.expand_price_grids
+
+    Returns:
+        DataFrame признаков, len(features) × len(multipliers) строк
+    """
+    base = features.reset_index(drop=True)
+    start = base['price_start_local'].to_numpy(dtype=np.float64)
+    grids = [price * np.asarray(multipliers) for price in start]
+    return expand(base, grids, start)
+
+
+def distill_surrogate(teacher, features, expand, finalize, random_state=42, max_rows=MAX_DISTILL_ROWS):
+    """
+    Подгоняет суррогат к вероятностям учителя на переоценённых строках.
+
+    Args:
+        teacher: калиброванная модель (predict_proba)
+        features: финализированные признаки обучения (полный набор колонок)
+        expand: recommend_price.expand_price_grids
+        finalize: функция DataFrame -> вход учителя (заполнение/обрезка, как в сервисе)
+        max_rows: сколько строк обучения переоценивать
+
+    Returns:
+        dict спецификации суррогата (сохраняется save_surrogate)
+    """
+    sample = features.sample(n=min(max_rows, len(features)), random_state=random_state)
+    repriced = reprice_rows(sample, expand)
+    target = _logit(teacher.predict_proba(finalize(repriced))[:, 1])
+
+    pct = repriced['price_increase_pct'].to_numpy(dtype=np.float64)
+    pct_range = [float(np.quantile(pct, 0.005)), float(np.quantile(pct, 0.995))]
+    pct = np.clip(pct, *pct_range)
+    knots = sorted(set(float(value) for value in np.quantile(pct, KNOT_QUANTILES)))
+    intercept, weights = _ridge(_design_matrix(repriced, pct, knots), target)
+    return {
+        "format_version": SURROGATE_FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "rows": int(len(repriced)),
+        "knots": knots,
+        "pct_range": pct_range,
+        "intercept": intercept,
+        "weights": dict(zip(_weight_names(knots), (float(value) for value in weights))),
+    }
+
+
+def _zone_index(probabilities):
+    return np.searchsorted(ZONE_EDGES, probabilities, side='right')
+
+
+def evaluate_agreement(surrogate, teacher, features, labels, expand, finalize, random_state=42,
+                       max_rows=MAX_DISTILL_ROWS):
+    """
+    Согласие суррогата с учителем на отложенной выборке.
+
+    Returns:
+        dict: mae, p95_abs_error, max_abs_error, zone_agreement (на переоценённой сетке),
+              roc_auc и teacher_roc_auc (по фактическим ставкам)
+    """
+    from sklearn.metrics import roc_auc_score
+
+    sample = features.sample(n=min(max_rows, len(features)), random_state=random_state)
+    repriced = reprice_rows(sample, expand)
+    expected = teacher.predict_proba(finalize(repriced))[:, 1]
+    actual = surrogate.predict_frame(repriced)
+    errors = np.abs(actual - expected)
+
+    report = {
+        "mae": float(errors.mean()),
+        "p95_abs_error": float(np.quantile(errors, 0.95)),
+        "max_abs_error": float(errors.max()),
+        "zone_agreement": float(np.mean(_zone_index(actual) == _zone_index(expected))),
+    }
+    if labels is not None and len(np.unique(labels)) > 1:
+        report["roc_auc"] = float(roc_auc_score(labels, surrogate.predict_frame(features)))
+        report["teacher_roc_auc"] = float(roc_auc_score(labels, teacher.predict_proba(finalize(features))[:, 1]))
+    return {key: round(value, 6) for key, value in report.items()}
+
+
+def agreement_problems(agreement):
+    """
+    Причины не экспортировать суррогат по его согласию с моделью (evaluate_agreement).
+
+    Returns:
+        list строк; пустой — согласие в пределах MIN_ZONE_AGREEMENT и MAX_P95_ABS_ERROR
+    """
+    if not agreement:
+        return ["согласие с моделью не оценено"]
+    problems = []
+    if agreement['zone_agreement'] < MIN_ZONE_AGREEMENT:
+        problems.append(f"совпадение зон {agreement['zone_agreement'] * 100:.1f}% < {MIN_ZONE_AGREEMENT * 100:.0f}%")
+    if agreement['p95_abs_error'] > MAX_P95_ABS_ERROR:
+        problems.append(f"p95 ошибки {agreement['p95_abs_error']:.4f} > {MAX_P95_ABS_ERROR}")
+    return problems
+
+
+def save_surrogate(spec, path=SURROGATE_FILENAME):
+    """
+    Сохраняет суррогат с записанным согласием (spec['agreement']).
+
+    Raises:
+        ValueError: если согласие с моделью ниже порога экспорта (agreement_problems)
+    """
+    problems = agreement_problems(spec.get("agreement"))
+    if problems:
+        raise ValueError(f"Суррогат не сохранён: {'; '.join(problems)}")
+    with atomic_open(path) as handle:
+        json.dump(spec, handle, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_surrogate(path):
+    """SurrogateModel из JSON; None, если файла нет (модель обучена без суррогата)."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as handle:
+        spec = json.load(handle)
+    if spec.get("format_version") != SURROGATE_FORMAT_VERSION:
+        print(f"[WARN] Неподдерживаемая версия суррогатной модели: {path}")
+        return None
+    return SurrogateModel(spec)
+
+
+def _order_hour(value):
+    """Час заказа: unix-секунды или строка даты (как в обучении); 0, если не разобрать."""
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, tz=timezone.utc).hour
+        hour = pd.Timestamp(value).hour
+    except (TypeError, ValueError, OverflowError, OSError):
+        return 0
+    return hour if isinstance(hour, int) else 0
+
+
+def order_terms(order_data, user_features, driver_features):
+    """
+    Признаки заказа для суррогата по тем же формулам, что build_features_for_price,
+    но без построения DataFrame.
+    """
+    hour = _order_hour(order_data.get('order_timestamp'))
+    user_rate = user_features['user_acceptance_rate']
+    driver_rate = driver_features['driver_acceptance_rate']
+    return {
+        'distance_km': order_data['distance_in_meters'] / 1000,
+        'duration_min': order_data['duration_in_seconds'] / 60,
+        'pickup_km': order_data['pickup_in_meters'] / 1000,
+        'hour_sin': math.sin(2 * math.pi * hour / 24),
+        'hour_cos': math.cos(2 * math.pi * hour / 24),
+        'is_peak_hour': float(7 <= hour <= 9 or 17 <= hour <= 20),
+        'is_night': float(hour < 6 or hour >= 22),
+        'driver_rating': float(order_data.get('driver_rating', 5.0)),
+        'user_acceptance_rate': user_rate,
+        'user_avg_price_ratio': user_features['user_avg_price_ratio'],
+        'driver_acceptance_rate': driver_rate,
+        'user_driver_match_score': user_rate * driver_rate,
+    }
+
+
+class SurrogateModel:
+    """Коэффициенты суррогата; predict_curve — одна векторная операция на сетку цен."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.knots = np.asarray(spec["knots"], dtype=np.float64)
+        self.pct_range = tuple(spec["pct_range"])
+        weights = spec["weights"]
+        self.intercept = float(spec["intercept"])
+        self.order_weights = {name: weights[name] for name in ORDER_TERMS}
+        self.pct_weight = weights['price_increase_pct']
+        self.knot_weights = np.asarray([weights[f'knot_{i}'] for i in range(len(self.knots))])
+        self.interaction_weights = {name: weights[f'price_increase_pct_x_{name}'] for name in PRICE_INTERACTIONS}
+
+    def _logits(self, terms, pct):
+        static = self.intercept + sum(weight * terms[name] for name, weight in self.order_weights.items())
+        slope = self.pct_weight + sum(weight * terms[name] for name, weight in self.interaction_weights.items())
+        pct = np.clip(pct, *self.pct_range)
+        hinges = np.maximum(pct[..., None] - self.knots, 0.0) @ self.knot_weights
+        return static + slope * pct + hinges
+
+    def predict_curve(self, terms, prices, reference_price):
+        """Вероятности принятия для сетки цен одного заказа (terms — order_terms)."""
+        pct = (np.asarray(prices, dtype=np.float64) - reference_price) / reference_price * 100
+        return 1.0 / (1.0 + np.exp(-self._logits(terms, pct)))
+
+    def predict_frame(self, features):
+        """Вероятности по строкам DataFrame признаков (колонки ORDER_TERMS и price_increase_pct)."""
+        terms = {name: features[name].to_numpy(dtype=np.float64) for name in ORDER_TERMS}
+        pct = features['price_increase_pct'].to_numpy(dtype=np.float64)
+        return 1.0 / (1.0 + np.exp(-self._logits(terms, pct)))
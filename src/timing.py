@@ -0,0 +1,110 @@
+"""
+Лёгкие тайминги этапов пайплайна рекомендации цены.
+
+Модуль не зависит от pandas/sklearn, чтобы его можно было импортировать
+и из API, и из скриптов обучения без лишних затрат.
+
+Использование:
+    with collect_spans() as spans:       # начало запроса
+        with stage("coarse_scan"):       # любой этап внутри запроса
+            ...
+    spans  # {'coarse_scan': 0.0123, ...} (секунды)
+
+Если сбор не активирован, stage() ничего не записывает.
+
+observe_stages(observer) дополнительно сообщает наблюдателю о входе в этап и выходе
+из него (профиль памяти обучения, src/resource_profile.py).
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+_CURRENT_SPANS = ContextVar("pricepilot_spans", default=None)
+_STAGE_OBSERVER = ContextVar("pricepilot_stage_observer", default=None)
+
+
+@contextmanager
+def collect_spans():
+    """
+    Начинает сбор длительностей этапов для текущего контекста (запроса).
+
+    Yields:
+        dict {имя этапа: длительность в секундах}; повторные этапы суммируются
+    """
+    spans = {}
+    token = _CURRENT_SPANS.set(spans)
+    try:
+        yield spans
+    finally:
+        _CURRENT_SPANS.reset(token)
+
+
+def current_spans():
+    """Возвращает словарь этапов текущего запроса или None, если сбор не активен."""
+    return _CURRENT_SPANS.get()
+
+
+def record_span(name, seconds):
+    """Добавляет длительность этапа в текущий сбор (если он активен)."""
+    spans = _CURRENT_SPANS.get()
+    if spans is not None:
+        spans[name] = spans.get(name, 0.0) + seconds
+
+
+@contextmanager
+def observe_stages(observer):
+    """
+    Передаёт наблюдателю границы этапов текущего контекста.
+
+    Args:
+        observer: объект с методами enter(name) и exit(name, seconds)
+    """
+    token = _STAGE_OBSERVER.set(observer)
+    try:
+        yield observer
+    finally:
+        _STAGE_OBSERVER.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """
+    Замеряет время выполнения блока и записывает его как этап `name`.
+    """
+    observer = _STAGE_OBSERVER.get()
+    if observer is not None:
+        observer.enter(name)
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        seconds = perf_counter() - started
+        record_span(name, seconds)
+        if observer is not None:
+            observer.exit(name, seconds)
+
+
+def format_stage_report(spans, total=None):
+    """
+    Форматирует собранные этапы в текстовую таблицу (для логов обучения и скриптов).
+
+    Вложенные этапы именуются через точку ("features.quality") и выводятся с отступом;
+    доля считается от total (по умолчанию — сумма этапов верхнего уровня).
+
+    Args:
+        spans: dict {имя этапа: секунды} из collect_spans()
+        total: общее время в секундах
+
+    Returns:
+        str с таблицей
+    """
+    if total is None:
+        total = sum(seconds for name, seconds in spans.items() if "." not in name)
+    lines = []
+    for name, seconds in spans.items():
+        label = ("  " * name.count(".")) + name
+        share = seconds / total * 100 if total > 0 else 0.0
+        lines.append(f"   {label:<34s} {seconds:>9.3f} с  {share:5.1f}%")
+    lines.append(f"   {'ИТОГО':<34s} {total:>9.3f} с")
+    return "\n".join(lines)
@@ -1,5 +1,6 @@
 import sys
 import io
+import os
 
 # Настройка кодировки для Windows консоли
 if sys.platform == 'win32':
@@ -8,35 +9,63 @@ if sys.platform == 'win32':
 
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, StratifiedKFold
-from sklearn.calibration import CalibratedClassifierCV
-from sklearn.metrics import roc_auc_score, precision_recall_curve, auc
-import xgboost as xgb
 import joblib
+# sklearn и xgboost импортируются внутри функций обучения: признаки и утилиты
+# этого модуля (predict.py, бенчмарки) не должны тянуть стек обучения
 import warnings
 warnings.filterwarnings('ignore')
 
-def calculate_fuel_cost(distance_in_meters, fuel_consumption_per_100km=9.0, fuel_price_per_liter=55.0):
-    """
-    Рассчитывает стоимость топлива для поездки.
-    
-    Args:
-        distance_in_meters: расстояние в метрах
-        fuel_consumption_per_100km: расход топлива на 100 км (по умолчанию 9 л)
-        fuel_price_per_liter: цена за литр топлива в рублях (по умолчанию 55 ₽)
-    
-    Returns:
-        dict с информацией о расходе топлива
-    """
-    distance_km = distance_in_meters / 1000.0
-    fuel_liters = (distance_km * fuel_consumption_per_100km) / 100.0
-    fuel_cost = fuel_liters * fuel_price_per_liter
-    
-    return {
-        'fuel_liters': fuel_liters,
-        'fuel_cost_rub': fuel_cost,
-        'distance_km': distance_km
-    }
+try:
+    from .drift_monitor import (
+        DRIFT_PROFILE_FILENAME, RECOMMENDATION_SIGNALS, build_reference_profile, save_reference_profile,
+    )
+    from .feature_slimming import (
+        DEFAULT_MAX_AUC_DROP, DEFAULT_SLIM_K_VALUES, FEATURE_SLIMMING_FILENAME, VALIDATION_SIZE,
+        choose_subset, rank_features_by_gain, save_slimming_report, sweep_feature_subsets,
+    )
+    from .feature_stats import fit_feature_stats, finalize_features, save_feature_stats, select_feature_stats
+    from .model_bundle import BUNDLE_DIRNAME, bundle_size_bytes, export_model_bundle
+    from .model_router import SEGMENTS_DIRNAME, normalize_city, parse_segment
+    from .model_store import publish_model_version
+    from .resource_profile import (
+        TRAINING_PROFILE_FILENAME, ResourceProfiler, format_resource_report, save_training_profile,
+    )
+    from .recommend_price import (
+        MONOTONE_DECREASING, PRICE_FEATURE_DIRECTIONS, calculate_fuel_cost, compute_price_curves, evaluate_strategy,
+        expand_price_grids,
+    )
+    from .surrogate import (
+        SURROGATE_FILENAME, SurrogateModel, agreement_problems, distill_surrogate, evaluate_agreement, reprice_rows,
+        save_surrogate,
+    )
+except ImportError:  # запуск как скрипт или через sys.path (main.py)
+    from drift_monitor import (
+        DRIFT_PROFILE_FILENAME, RECOMMENDATION_SIGNALS, build_reference_profile, save_reference_profile,
+    )
+    from feature_slimming import (
+        DEFAULT_MAX_AUC_DROP, DEFAULT_SLIM_K_VALUES, FEATURE_SLIMMING_FILENAME, VALIDATION_SIZE,
+        choose_subset, rank_features_by_gain, save_slimming_report, sweep_feature_subsets,
+    )
+    from feature_stats import fit_feature_stats, finalize_features, save_feature_stats, select_feature_stats
+    from model_bundle import BUNDLE_DIRNAME, bundle_size_bytes, export_model_bundle
+    from model_router import SEGMENTS_DIRNAME, normalize_city, parse_segment
+    from model_store import publish_model_version
+    from resource_profile import (
+        TRAINING_PROFILE_FILENAME, ResourceProfiler, format_resource_report, save_training_profile,
+    )
+    from recommend_price import (
+        MONOTONE_DECREASING, PRICE_FEATURE_DIRECTIONS, calculate_fuel_cost, compute_price_curves, evaluate_strategy,
+        expand_price_grids,
+    )
+    from surrogate import (
+        SURROGATE_FILENAME, SurrogateModel, agreement_problems, distill_surrogate, evaluate_agreement, reprice_rows,
+        save_surrogate,
+    )
+
+try:
+    from .timing import collect_spans, format_stage_report, observe_stages, stage
+except ImportError:  # запуск как скрипт или через sys.path (main.py)
+    from timing import collect_spans, format_stage_report, observe_stages, stage
 
 def calculate_user_history_features(df):
     """
@@ -120,6 +149,84 @@ def calculate_driver_history_features(df):
     
     return driver_stats
 
+# Пропущенная/нераспознанная временная метка в int64-колонках типизированного фрейма
+MISSING_TS = np.iinfo(np.int64).min
+
+# Колонки, которые добавляет prepare_typed_frame (по ним же определяется, что фрейм уже подготовлен)
+TYPED_FRAME_COLUMNS = (
+    'order_ts_s', 'tender_ts_s', 'driver_reg_s',
+    'order_hour', 'order_weekday', 'order_day',
+    'response_time_seconds', 'driver_experience_days',
+    'avg_speed_smooth_kmh', 'pickup_speed_smooth_kmh', 'price_increase_pct',
+)
+
+def _parse_epoch_seconds(values):
+    """
+    Разбирает временные метки один раз и возвращает (int64 секунды от эпохи, разобранные даты).
+    Нераспознанные значения -> MISSING_TS / NaT.
+    """
+    parsed = pd.to_datetime(values, errors='coerce')
+    # Через datetime64[ns]: не зависит от единицы, которую выбрал pandas (в 1.x всегда ns)
+    nanos = parsed.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    return np.where(parsed.isna().to_numpy(), MISSING_TS, nanos // 10**9), parsed
+
+def prepare_typed_frame(df):
+    """
+    Строит типизированный промежуточный фрейм: временные метки разбираются
+    ровно один раз (int64 секунды от эпохи), общие производные величины
+    считаются один раз и используются очисткой, признаками качества и
+    build_raw_features.
+    
+    Добавляемые колонки (см. TYPED_FRAME_COLUMNS):
+        order_ts_s, tender_ts_s, driver_reg_s: int64, MISSING_TS для пропусков
+        order_hour, order_weekday, order_day: float, NaN если нет order_timestamp
+        response_time_seconds, driver_experience_days: float, NaN если нет одной из меток
+        avg_speed_smooth_kmh, pickup_speed_smooth_kmh: расстояние / (время + 0.1) * 3.6
+        price_increase_pct: (bid - start) / start * 100
+    
+    Args:
+        df: DataFrame с исходными данными (исходные колонки не изменяются)
+    
+    Returns:
+        Новый DataFrame с исходными и типизированными колонками
+    """
+    typed = df.copy()
+    
+    order_s, order_dt = _parse_epoch_seconds(df['order_timestamp'])
+    tender_s, _ = _parse_epoch_seconds(df['tender_timestamp'])
+    reg_s, _ = _parse_epoch_seconds(df['driver_reg_date'])
+    has_order = order_s != MISSING_TS
+    has_tender = tender_s != MISSING_TS
+    has_reg = reg_s != MISSING_TS
+    
+    typed['order_ts_s'] = order_s
+    typed['tender_ts_s'] = tender_s
+    typed['driver_reg_s'] = reg_s
+    
+    # Календарные поля берём из уже разобранных дат (без повторного парсинга)
+    typed['order_hour'] = order_dt.dt.hour.to_numpy(dtype=float, na_value=np.nan)
+    typed['order_weekday'] = order_dt.dt.weekday.to_numpy(dtype=float, na_value=np.nan)
+    typed['order_day'] = order_dt.dt.day.to_numpy(dtype=float, na_value=np.nan)
+    
+    typed['response_time_seconds'] = np.where(
+        has_order & has_tender, (tender_s - order_s).astype(float), np.nan
+    )
+    typed['driver_experience_days'] = np.where(
+        has_order & has_reg, ((order_s - reg_s) // 86400).astype(float), np.nan
+    )
+    
+    typed['avg_speed_smooth_kmh'] = df['distance_in_meters'] / (df['duration_in_seconds'] + 0.1) * 3.6
+    typed['pickup_speed_smooth_kmh'] = df['pickup_in_meters'] / (df['pickup_in_seconds'] + 0.1) * 3.6
+    typed['price_increase_pct'] = (df['price_bid_local'] - df['price_start_local']) / df['price_start_local'] * 100
+    
+    return typed
+
+def ensure_typed_frame(df):
+    """Возвращает df как есть, если он уже подготовлен prepare_typed_frame, иначе готовит его."""
+    if all(col in df.columns for col in TYPED_FRAME_COLUMNS):
+        return df
+    return prepare_typed_frame(df)
+
 def clean_and_validate_data(df, verbose=True, keep_only_done=False, soft_cleaning=True):
     """
     Очищает и валидирует данные.
@@ -152,18 +259,15 @@ def clean_and_validate_data(df, verbose=True, keep_only_done=False, soft_cleanin
             print("Режим очистки: СТРОГАЯ (удаляем все аномалии)")
         print()
     
-    df['order_timestamp'] = pd.to_datetime(df['order_timestamp'], errors='coerce')
-    df['tender_timestamp'] = pd.to_datetime(df['tender_timestamp'], errors='coerce')
-    df['driver_reg_date'] = pd.to_datetime(df['driver_reg_date'], errors='coerce')
+    df = ensure_typed_frame(df)
+    has_order = df['order_ts_s'] != MISSING_TS
     
-    df['response_time_seconds'] = (df['tender_timestamp'] - df['order_timestamp']).dt.total_seconds()
     df['avg_speed_kmh'] = (df['distance_in_meters'] / df['duration_in_seconds'] * 3.6)
     df['avg_speed_kmh'] = df['avg_speed_kmh'].replace([np.inf, -np.inf], np.nan)
     df['pickup_speed_kmh'] = (df['pickup_in_meters'] / df['pickup_in_seconds'] * 3.6)
     df['pickup_speed_kmh'] = df['pickup_speed_kmh'].replace([np.inf, -np.inf], np.nan)
     df['pickup_ratio'] = df['pickup_in_meters'] / df['distance_in_meters']
     df['pickup_ratio'] = df['pickup_ratio'].replace([np.inf, -np.inf], np.nan)
-    df['price_increase_pct'] = ((df['price_bid_local'] - df['price_start_local']) / df['price_start_local'] * 100)
     
     # Разделяем проблемы на КРИТИЧНЫЕ и НЕКРИТИЧНЫЕ
     critical_problems = {}  # В МЯГКОМ режиме - только дубликаты, в СТРОГОМ - все
@@ -173,7 +277,7 @@ def clean_and_validate_data(df, verbose=True, keep_only_done=False, soft_cleanin
     # Все остальное (даже нули) остается как признаки для ML!
     duplicate_mask = df.duplicated(subset=[
         'order_id', 'driver_id', 'price_bid_local', 
-        'pickup_in_meters', 'tender_timestamp'
+        'pickup_in_meters', 'tender_ts_s'
     ], keep='first')
     critical_problems['exact_duplicate'] = duplicate_mask
     
@@ -186,8 +290,8 @@ def clean_and_validate_data(df, verbose=True, keep_only_done=False, soft_cleanin
     non_critical_problems['zero_price'] = (df['price_bid_local'] <= 0)
     
     # НЕКРИТИЧНЫЕ ПРОБЛЕМЫ (аномалии, которые могут быть полезны для модели)
-    non_critical_problems['future_driver'] = (df['driver_reg_date'] > df['order_timestamp'])
-    non_critical_problems['future_bid'] = (df['tender_timestamp'] < df['order_timestamp'])
+    non_critical_problems['future_driver'] = has_order & (df['driver_reg_s'] != MISSING_TS) & (df['driver_reg_s'] > df['order_ts_s'])
+    non_critical_problems['future_bid'] = has_order & (df['tender_ts_s'] != MISSING_TS) & (df['tender_ts_s'] < df['order_ts_s'])
     non_critical_problems['slow_response'] = (df['response_time_seconds'] > 300)
     
     non_critical_problems['too_short_trip'] = (df['distance_in_meters'] < 500)
@@ -317,22 +421,21 @@ def calculate_data_quality_features(df):
     Returns:
         DataFrame с признаками качества
     """
+    df = ensure_typed_frame(df)
     quality_features = pd.DataFrame(index=df.index)
     
-    # Временные метки
-    order_ts = pd.to_datetime(df['order_timestamp'], errors='coerce')
-    tender_ts = pd.to_datetime(df['tender_timestamp'], errors='coerce')
-    driver_reg = pd.to_datetime(df['driver_reg_date'], errors='coerce')
+    # Временные метки (int64 секунды, MISSING_TS для пропусков)
+    order_ts = df['order_ts_s']
+    tender_ts = df['tender_ts_s']
+    driver_reg = df['driver_reg_s']
+    has_order = order_ts != MISSING_TS
     
     # Безопасный расчёт производных величин
-    response_time = (tender_ts - order_ts).dt.total_seconds()
-    response_time = response_time.fillna(30)
+    response_time = df['response_time_seconds'].fillna(30)
     
-    avg_speed = (df['distance_in_meters'] / (df['duration_in_seconds'] + 0.1) * 3.6)
-    avg_speed = avg_speed.replace([np.inf, -np.inf], np.nan).fillna(30)
+    avg_speed = df['avg_speed_smooth_kmh'].replace([np.inf, -np.inf], np.nan).fillna(30)
     
-    pickup_speed = (df['pickup_in_meters'] / (df['pickup_in_seconds'] + 0.1) * 3.6)
-    pickup_speed = pickup_speed.replace([np.inf, -np.inf], np.nan).fillna(30)
+    pickup_speed = df['pickup_speed_smooth_kmh'].replace([np.inf, -np.inf], np.nan).fillna(30)
     
     pickup_ratio = df['pickup_in_meters'] / (df['distance_in_meters'] + 0.1)
     pickup_ratio = pickup_ratio.replace([np.inf, -np.inf], np.nan).fillna(0.5)
@@ -341,8 +444,8 @@ def calculate_data_quality_features(df):
     price_increase_pct = price_increase_pct.replace([np.inf, -np.inf], np.nan).fillna(0)
     
     # 🚩 ВРЕМЕННЫЕ АНОМАЛИИ
-    quality_features['flag_future_driver'] = (driver_reg > order_ts).fillna(False).astype(float)
-    quality_features['flag_future_bid'] = (tender_ts < order_ts).fillna(False).astype(float)
+    quality_features['flag_future_driver'] = (has_order & (driver_reg != MISSING_TS) & (driver_reg > order_ts)).astype(float)
+    quality_features['flag_future_bid'] = (has_order & (tender_ts != MISSING_TS) & (tender_ts < order_ts)).astype(float)
     quality_features['flag_slow_response'] = (response_time > 300).astype(float)
     quality_features['response_time_score'] = np.clip(response_time / 300, 0, 2)
     
@@ -437,9 +540,26 @@ def detect_taxi_type(carname, carmodel):
     
     return "comfort"
 
-def build_enhanced_features(frame):
+def build_enhanced_features(frame, feature_stats=None):
+    """
+    Создает признаки для ML-модели (с финализацией: заполнение пропусков и обрезка).
+    
+    Args:
+        frame: DataFrame с данными заказов
+        feature_stats: статистики из fit_feature_stats (обычно feature_stats.joblib);
+                       если None — считаются по самому frame
+    
+    Returns:
+        DataFrame с признаками (float32)
+    """
+    raw = build_raw_features(frame)
+    if feature_stats is None:
+        feature_stats = fit_feature_stats(raw)
+    return finalize_features(raw, feature_stats)
+
+def build_raw_features(frame):
     """
-    Создает признаки для ML-модели.
+    Создает «сырые» признаки без финализации (могут содержать NaN/inf).
     
     Args:
         frame: DataFrame с данными заказов
@@ -447,16 +567,22 @@ def build_enhanced_features(frame):
     Returns:
         DataFrame с признаками
     """
-    # 📊 НОВЫЕ ПРИЗНАКИ: История пользователей и водителей
-    user_history = calculate_user_history_features(frame)
-    driver_history = calculate_driver_history_features(frame)
+    frame = ensure_typed_frame(frame)
     
-    # Объединяем с основными данными
-    frame = frame.merge(user_history, on='user_id', how='left')
-    frame = frame.merge(driver_history, on='driver_id', how='left')
+    # 📊 НОВЫЕ ПРИЗНАКИ: История пользователей и водителей
+    with stage('features.history'):
+        with stage('features.history.user'):
+            user_history = calculate_user_history_features(frame)
+        with stage('features.history.driver'):
+            driver_history = calculate_driver_history_features(frame)
+        
+        # Объединяем с основными данными
+        frame = frame.merge(user_history, on='user_id', how='left')
+        frame = frame.merge(driver_history, on='driver_id', how='left')
     
     # 🔍 НОВЫЕ ПРИЗНАКИ: Качество данных (аномалии и мусор)
-    quality_features = calculate_data_quality_features(frame)
+    with stage('features.quality'):
+        quality_features = calculate_data_quality_features(frame)
     
     # Заполняем пропуски для новых пользователей/водителей
     frame['user_order_count'] = frame['user_order_count'].fillna(1)
@@ -479,17 +605,15 @@ def build_enhanced_features(frame):
     frame['driver_is_aggressive'] = frame['driver_is_aggressive'].fillna(0.0)
     frame['driver_is_flexible'] = frame['driver_is_flexible'].fillna(0.5)
     
-    ts = pd.to_datetime(frame["order_timestamp"], errors="coerce")
-    hour = ts.dt.hour.fillna(0)
-    wday = ts.dt.weekday.fillna(0)
+    hour = frame['order_hour'].fillna(0)
+    wday = frame['order_weekday'].fillna(0)
     
     features = {}
     
     features['price_bid_local'] = frame['price_bid_local'].values
     features['price_start_local'] = frame['price_start_local'].values
     features['price_increase_abs'] = (frame['price_bid_local'] - frame['price_start_local']).values
-    features['price_increase_pct'] = ((frame['price_bid_local'] - frame['price_start_local']) / 
-                                      frame['price_start_local'] * 100).values
+    features['price_increase_pct'] = frame['price_increase_pct'].values
     features['is_price_increased'] = (features['price_increase_pct'] > 0).astype(float)
     
     features['price_per_km'] = frame['price_bid_local'] / (frame['distance_in_meters'] / 1000 + 0.1)
@@ -515,8 +639,7 @@ def build_enhanced_features(frame):
     features['distance_km'] = (frame['distance_in_meters'] / 1000).values
     features['duration_min'] = (frame['duration_in_seconds'] / 60).values
     
-    speed = frame['distance_in_meters'] / (frame['duration_in_seconds'] + 0.1) * 3.6
-    features['avg_speed_kmh'] = np.clip(speed.values, 0, 150)
+    features['avg_speed_kmh'] = np.clip(frame['avg_speed_smooth_kmh'].values, 0, 150)
     features['is_traffic_jam'] = (features['avg_speed_kmh'] < 15).astype(float)
     features['is_highway'] = (features['avg_speed_kmh'] > 50).astype(float)
     
@@ -529,8 +652,7 @@ def build_enhanced_features(frame):
     features['pickup_in_seconds'] = frame['pickup_in_seconds'].values
     features['pickup_km'] = (frame['pickup_in_meters'] / 1000).values
     
-    pickup_speed = frame['pickup_in_meters'] / (frame['pickup_in_seconds'] + 0.1) * 3.6
-    features['pickup_speed_kmh'] = np.clip(pickup_speed.values, 0, 150)
+    features['pickup_speed_kmh'] = np.clip(frame['pickup_speed_smooth_kmh'].values, 0, 150)
     
     features['pickup_to_trip_ratio'] = np.clip(
         frame['pickup_in_meters'] / (frame['distance_in_meters'] + 1).values,
@@ -545,8 +667,7 @@ def build_enhanced_features(frame):
     
     features['driver_rating'] = frame['driver_rating'].values
     
-    driver_reg = pd.to_datetime(frame['driver_reg_date'], errors='coerce')
-    experience_days = (ts - driver_reg).dt.days.fillna(365)
+    experience_days = frame['driver_experience_days'].fillna(365)
     experience_days = np.clip(experience_days.values, 0, 3650)
     features['driver_experience_days'] = experience_days
     features['driver_experience_years'] = experience_days / 365.25
@@ -555,8 +676,7 @@ def build_enhanced_features(frame):
     features['has_perfect_rating'] = (frame['driver_rating'] == 5.0).astype(float).values
     features['rating_deviation'] = (5.0 - frame['driver_rating']).values
     
-    tender_ts = pd.to_datetime(frame['tender_timestamp'], errors='coerce')
-    response_time = (tender_ts - ts).dt.total_seconds().fillna(30)
+    response_time = frame['response_time_seconds'].fillna(30)
     response_time = np.clip(response_time.values, 0, 600)
     features['response_time_seconds'] = response_time
     features['response_time_log'] = np.log1p(response_time)
@@ -649,7 +769,7 @@ def build_enhanced_features(frame):
     features['pickup_burden'] = features['pickup_km'] / (features['distance_km'] + 0.1)  # Насколько подача нагружает
     
     # ⏰ НОВЫЕ ПРИЗНАКИ: Временные паттерны
-    day_of_month = ts.dt.day.fillna(15)
+    day_of_month = frame['order_day'].fillna(15)
     features['day_of_month'] = day_of_month.values
     features['is_month_start'] = (day_of_month <= 5).astype(float).values  # Начало месяца (зарплата)
     features['is_month_end'] = (day_of_month >= 25).astype(float).values  # Конец месяца (деньги кончаются)
@@ -660,31 +780,132 @@ def build_enhanced_features(frame):
     for col in quality_features.columns:
         features[col] = quality_features[col].values
     
-    result = pd.DataFrame(features)
-    
-    result = result.replace([np.inf, -np.inf], np.nan)
+    return pd.DataFrame(features)
+
+# Сколько строк тестовой выборки сохраняется в бандл как эталон для проверки паритета
+SMOKE_TEST_ROWS = 16
+
+# Допуск проверки монотонности по цене (шум float32 в сумме деревьев)
+MONOTONE_TOLERANCE = 1e-6
+MONOTONE_CHECK_ROWS = 1000
+
+def price_monotone_constraints(feature_names):
+    """monotone_constraints XGBoost: вероятность принятия не растёт с ценой."""
+    return {name: -direction for name, direction in PRICE_FEATURE_DIRECTIONS.items() if name in feature_names}
+
+def _fit_xgboost(params, X_train, y_train, X_test, y_test, monotone_price=False):
+    import xgboost as xgb
     
-    for col in result.columns:
-        if result[col].isna().any():
-            median_val = result[col].median()
-            if pd.isna(median_val) or np.isinf(median_val):
-                result[col] = result[col].fillna(0)
-            else:
-                result[col] = result[col].fillna(median_val)
+    if monotone_price:
+        params = dict(params, monotone_constraints=price_monotone_constraints(X_train.columns))
+    model = xgb.XGBClassifier(**params)
+    model.fit(
+        X_train, y_train,
+        eval_set=[(X_test, y_test)],
+        verbose=False
+    )
+    return model
+
+def _calibrate(model, X_train, y_train):
+    from sklearn.calibration import CalibratedClassifierCV
     
-    result = result.fillna(0)
-    result = result.replace([np.inf], 1e10)
-    result = result.replace([-np.inf], -1e10)
+    calibrated_model = CalibratedClassifierCV(
+        model, 
+        method='sigmoid',
+        cv='prefit'
+    )
+    calibrated_model.fit(X_train, y_train)
+    return calibrated_model
+
+def segment_mask(frame, segment):
+    """
+    Строки, относящиеся к сегменту (имя как в model_router.segment_names).
     
-    for col in result.columns:
-        if result[col].std() > 0:
-            mean = result[col].mean()
-            std = result[col].std()
-            result[col] = np.clip(result[col], mean - 10*std, mean + 10*std)
+    Args:
+        frame: очищенный DataFrame заказов
+        segment: например 'class-business', 'city-kazan' или 'city-kazan.class-economy'
     
-    return result
+    Returns:
+        Булева Series по строкам frame
+    """
+    conditions = parse_segment(segment)
+    mask = pd.Series(True, index=frame.index)
+    if 'class' in conditions:
+        taxi_types = frame.apply(lambda row: detect_taxi_type(row['carname'], row['carmodel']), axis=1)
+        mask &= taxi_types == conditions['class']
+    if 'city' in conditions:
+        if 'city' not in frame.columns:
+            raise ValueError(f"⚠️ Для сегмента {segment} в данных нужна колонка city")
+        mask &= frame['city'].map(normalize_city) == conditions['city']
+    return mask
+
+def price_monotonicity_violation(calibrated_model, features, feature_stats, random_state=42,
+                                 max_rows=MONOTONE_CHECK_ROWS):
+    """
+    Наибольший рост вероятности при повышении цены на переоценённых строках.
+
+    Ограничения монотонности действуют на бустер; калибровка и обрезка признаков
+    могут их нарушить, поэтому метка монотонной модели ставится только после проверки.
+
+    Args:
+        features: финализированные признаки (полный набор колонок)
 
-def train_model(train_path="simple-train.csv", use_gpu=False, test_size=0.2, random_state=42, soft_cleaning=True):
+    Returns:
+        float: 0 для монотонно невозрастающей по цене модели
+    """
+    sample = features.sample(n=min(max_rows, len(features)), random_state=random_state)
+    repriced = reprice_rows(sample, expand_price_grids)
+    probabilities = calibrated_model.predict_proba(finalize_features(repriced, feature_stats))[:, 1]
+    increases = np.diff(probabilities.reshape(len(sample), -1), axis=1)
+    return float(max(increases.max(), 0.0))
+
+# Эталон сигналов рекомендации для мониторинга дрейфа: отложенные заказы,
+# прогнанные тем же путём рекомендации, что и в сервисе
+DRIFT_SIGNAL_ORDERS = 500
+ORDER_FIELDS = (
+    'distance_in_meters', 'duration_in_seconds', 'pickup_in_meters', 'pickup_in_seconds',
+    'driver_rating', 'platform', 'price_start_local', 'carname', 'carmodel', 'driver_reg_date',
+    'user_id', 'driver_id', 'city',
+)
+
+def orders_from_frame(frame):
+    """Строки CSV -> dict заказов в формате API (order_timestamp — секунды от эпохи)."""
+    order_seconds, _ = _parse_epoch_seconds(frame['order_timestamp'])
+    fields = [name for name in ORDER_FIELDS if name in frame]
+    orders = []
+    for seconds, record in zip(order_seconds, frame[fields].to_dict('records')):
+        if seconds == MISSING_TS:
+            continue
+        order = {key: value for key, value in record.items() if not pd.isna(value)}
+        order['order_timestamp'] = int(seconds)
+        order['price_start_local'] = float(order['price_start_local'])
+        orders.append(order)
+    return orders
+
+def recommendation_signals(frame, calibrated_model, feature_stats, random_state=42, max_orders=DRIFT_SIGNAL_ORDERS):
+    """
+    Сигналы рекомендации (RECOMMENDATION_SIGNALS) на отложенных заказах: кривая и
+    стратегия по умолчанию, как в recommend_price, — эталон для того, что сервис
+    наблюдает в ответах (вероятность и наценка оптимальной цены).
+
+    Returns:
+        dict сигнал -> numpy-массив по заказам
+    """
+    sample = frame.drop_duplicates(subset=['order_id'] if 'order_id' in frame else None)
+    sample = sample.sample(n=min(max_orders, len(sample)), random_state=random_state)
+    orders = orders_from_frame(sample)
+    curves = compute_price_curves(orders, calibrated_model, feature_stats=feature_stats)
+    optimal = [evaluate_strategy(order, curve)['optimal_price'] for order, curve in zip(orders, curves)]
+    signals = {
+        'acceptance_probability': np.array([item['probability_percent'] / 100.0 for item in optimal]),
+        'bid_ratio': np.array([item['price'] / order['price_start_local'] for item, order in zip(optimal, orders)]),
+    }
+    return {name: signals[name] for name in RECOMMENDATION_SIGNALS}
+
+def train_model(train_path="simple-train.csv", use_gpu=False, test_size=0.2, random_state=42, soft_cleaning=True,
+                models_dir="models", slim_features=False, slim_k_values=DEFAULT_SLIM_K_VALUES,
+                max_auc_drop=DEFAULT_MAX_AUC_DROP, surrogate=True, monotone_price=False, trace_memory=False,
+                segment=None):
     """
     Обучает модель предсказания принятия ставки.
     
@@ -694,24 +915,81 @@ def train_model(train_path="simple-train.csv", use_gpu=False, test_size=0.2, ran
         test_size: доля тестовой выборки
         random_state: random seed для воспроизводимости
         soft_cleaning: использовать мягкую очистку (оставлять аномалии как признаки)
+        models_dir: версионированное хранилище моделей (models/<версия>/ + CURRENT);
+                    None — только артефакты в текущем каталоге
+        slim_features: отобрать признаки — переобучить на топ-K по gain для каждого K
+                       из slim_k_values и оставить наименьший набор, потерявший
+                       не больше max_auc_drop ROC-AUC (отчёт: feature_slimming.json)
+        slim_k_values: размеры проверяемых подмножеств признаков
+        max_auc_drop: допустимая потеря ROC-AUC относительно всех признаков
+        surrogate: дистиллировать суррогатную модель для быстрого пути (surrogate.json)
+        monotone_price: обучить с monotone_constraints по ценовым признакам; прошедшая
+                        проверку модель помечается монотонной (monotone_price в бандле),
+                        и рекомендация ищет границы зон делением интервала
+        trace_memory: вести tracemalloc для пиков памяти Python/numpy по этапам (обучение
+                      примерно вдвое медленнее); время и RSS пишутся всегда
+                      (отчёт: training_profile.json рядом с моделью)
+        segment: обучить модель сегмента (см. segment_mask) только на его строках и
+                 опубликовать в models_dir/segments/<сегмент>/; артефакты собираются
+                 в его каталоге .build, а не в текущем, чтобы не затереть глобальную модель
+                 (текущий каталог не меняется: кэш истории и пути читаются как обычно)
     
     Returns:
         Кортеж (модель, важность признаков)
     """
+    output_dir = '.'
+    if segment:
+        parse_segment(segment)
+        models_dir = os.path.join(models_dir or 'models', SEGMENTS_DIRNAME, segment)
+        output_dir = os.path.join(models_dir, '.build')
+        os.makedirs(output_dir, exist_ok=True)
+    
+    profiler = ResourceProfiler(trace_python=trace_memory)
+    with collect_spans() as spans, profiler, observe_stages(profiler):
+        result = _train_model(train_path, use_gpu, test_size, random_state, soft_cleaning, models_dir,
+                              slim_features, slim_k_values, max_auc_drop, surrogate, monotone_price,
+                              profiler, segment, output_dir)
+    
+    print("\n⏱️  Время по этапам:")
+    print(format_stage_report(spans))
+    print("\n🧠 Память по этапам, МБ (отчёт: training_profile.json):")
+    print(format_resource_report(profiler.report()))
+    return result
+
+def _train_model(train_path, use_gpu, test_size, random_state, soft_cleaning, models_dir,
+                 slim_features, slim_k_values, max_auc_drop, surrogate, monotone_price, profiler, segment,
+                 output_dir='.'):
+    from sklearn.metrics import auc, precision_recall_curve, roc_auc_score
+    from sklearn.model_selection import train_test_split
+    
+    def artifact(name):
+        return os.path.join(output_dir, name)
+    
     print("\n" + "="*70)
     print("ОБУЧЕНИЕ ML-МОДЕЛИ DRIVEE")
     print("="*70)
     
     print(f"\n📁 Загрузка данных из {train_path}...")
-    df = pd.read_csv(train_path)
+    with stage('load_csv'):
+        df = pd.read_csv(train_path)
     print(f"   Загружено: {len(df)} записей")
     
-    df = clean_and_validate_data(
-        df, 
-        verbose=True,
-        keep_only_done=False,
-        soft_cleaning=soft_cleaning
-    )
+    # Временные метки разбираются один раз; дальше все стадии работают с int64-колонками
+    with stage('typed_frame'):
+        df = prepare_typed_frame(df)
+    
+    with stage('clean_and_validate'):
+        df = clean_and_validate_data(
+            df, 
+            verbose=True,
+            keep_only_done=False,
+            soft_cleaning=soft_cleaning
+        )
+    
+    if segment:
+        with stage('segment_filter'):
+            df = df[segment_mask(df, segment)].reset_index(drop=True)
+        print(f"   Сегмент {segment}: {len(df)} записей")
     
     if len(df) < 100:
         raise ValueError("⚠️ Слишком мало данных после очистки! Проверьте исходный датасет.")
@@ -722,7 +1000,12 @@ def train_model(train_path="simple-train.csv", use_gpu=False, test_size=0.2, ran
     print(f"   Cancel: {(~y.astype(bool)).sum()} ({(1-y.mean())*100:.1f}%)")
     
     print("\n🔧 Создание признаков...")
-    X = build_enhanced_features(df)
+    with stage('features'):
+        X_raw = build_raw_features(df)
+    with stage('finalize_features'):
+        feature_stats = fit_feature_stats(X_raw)
+        X = finalize_features(X_raw, feature_stats)
+    del X_raw
     print(f"   Создано признаков: {X.shape[1]}")
     print(f"   Размер данных: {X.shape[0]} записей × {X.shape[1]} признаков")
     
@@ -759,38 +1042,101 @@ def train_model(train_path="simple-train.csv", use_gpu=False, test_size=0.2, ran
     print(f"     • max_depth: {params['max_depth']}")
     print(f"     • scale_pos_weight: {scale_pos_weight:.2f}")
     print(f"     • tree_method: {params['tree_method']}")
+    if monotone_price:
+        print(f"     • monotone_constraints: {len(price_monotone_constraints(X.columns))} ценовых признаков")
     
-    model = xgb.XGBClassifier(**params)
-    
-    model.fit(
-        X_train, y_train,
-        eval_set=[(X_test, y_test)],
-        verbose=False
-    )
+    with stage('fit_xgboost'):
+        model = _fit_xgboost(params, X_train, y_train, X_test, y_test, monotone_price)
     
     print("\n🎲 Калибровка вероятностей...")
-    calibrated_model = CalibratedClassifierCV(
-        model, 
-        method='sigmoid',
-        cv='prefit'
-    )
-    calibrated_model.fit(X_train, y_train)
+    with stage('calibration'):
+        calibrated_model = _calibrate(model, X_train, y_train)
     
-    print("\n📈 Оценка качества модели:")
+    # Полный набор признаков нужен суррогату и после отбора признаков
+    X_all = X
     
-    y_train_pred = calibrated_model.predict_proba(X_train)[:, 1]
-    train_auc = roc_auc_score(y_train, y_train_pred)
+    if slim_features:
+        print(f"\n✂️  Отбор признаков (допустимая потеря ROC-AUC: {max_auc_drop}):")
+        
+        def fit_subset(X_fit, y_fit, X_eval, y_eval):
+            subset_model = _fit_xgboost(params, X_fit, y_fit, X_eval, y_eval, monotone_price)
+            return subset_model, _calibrate(subset_model, X_fit, y_fit)
+        
+        # Ранжирование, eval_set и выбор K — по валидационной части train;
+        # X_test остаётся только для итоговой оценки ниже
+        X_fit, X_val, y_fit, y_val = train_test_split(
+            X_train, y_train, test_size=VALIDATION_SIZE, random_state=random_state, stratify=y_train
+        )
+        print(f"   Валидация: {len(X_val)} записей из train")
+        with stage('feature_slimming'):
+            ranking_model = _fit_xgboost(params, X_fit, y_fit, X_val, y_val, monotone_price)
+            ranking = rank_features_by_gain(ranking_model, X.columns.tolist())
+            subsets = sweep_feature_subsets(fit_subset, X_fit, y_fit, X_val, y_val, ranking, slim_k_values)
+        chosen = choose_subset(subsets, max_auc_drop)
+        save_slimming_report(subsets, chosen, ranking, max_auc_drop, artifact(FEATURE_SLIMMING_FILENAME),
+                             validation_rows=len(X_val))
+        if chosen['k'] < X.shape[1]:
+            selected = chosen['features']
+            X, X_train, X_test = X[selected], X_train[selected], X_test[selected]
+            feature_stats = select_feature_stats(feature_stats, selected)
+            # Итоговая модель на выбранных признаках — на всём train, как без отбора
+            with stage('fit_xgboost_slim'):
+                model = _fit_xgboost(params, X_train, y_train, X_test, y_test, monotone_price)
+                calibrated_model = _calibrate(model, X_train, y_train)
+        print(f"   Выбрано признаков: {chosen['k']} (отчёт: {FEATURE_SLIMMING_FILENAME})")
+    elif os.path.exists(artifact(FEATURE_SLIMMING_FILENAME)):
+        # Отчёт прошлого отбора не относится к этой модели
+        os.remove(artifact(FEATURE_SLIMMING_FILENAME))
     
-    y_test_pred = calibrated_model.predict_proba(X_test)[:, 1]
-    test_auc = roc_auc_score(y_test, y_test_pred)
+    print("\n📈 Оценка качества модели:")
     
-    precision, recall, _ = precision_recall_curve(y_test, y_test_pred)
-    pr_auc = auc(recall, precision)
+    with stage('evaluation'):
+        y_train_pred = calibrated_model.predict_proba(X_train)[:, 1]
+        train_auc = roc_auc_score(y_train, y_train_pred)
+        
+        y_test_pred = calibrated_model.predict_proba(X_test)[:, 1]
+        test_auc = roc_auc_score(y_test, y_test_pred)
+        
+        precision, recall, _ = precision_recall_curve(y_test, y_test_pred)
+        pr_auc = auc(recall, precision)
     
     print(f"   ROC-AUC (train): {train_auc:.4f}")
     print(f"   ROC-AUC (test):  {test_auc:.4f}")
     print(f"   PR-AUC (test):   {pr_auc:.4f}")
     
+    if monotone_price:
+        with stage('monotone_check'):
+            violation = price_monotonicity_violation(calibrated_model, X_all.loc[X_test.index], feature_stats, random_state)
+        if violation <= MONOTONE_TOLERANCE:
+            calibrated_model.monotone_price = MONOTONE_DECREASING
+            print("   Вероятность не растёт с ценой: границы зон будут искаться делением интервала")
+        else:
+            print(f"[WARN] Модель не монотонна по цене (рост вероятности до {violation:.2e}): "
+                  f"рекомендация останется на сеточном поиске")
+    
+    surrogate_spec = None
+    if surrogate:
+        print("\n⚡ Дистилляция суррогатной модели...")
+        teacher_input = lambda frame: finalize_features(frame, feature_stats)
+        with stage('surrogate'):
+            surrogate_spec = distill_surrogate(
+                calibrated_model, X_all.loc[X_train.index], expand_price_grids, teacher_input, random_state
+            )
+            surrogate_spec['agreement'] = evaluate_agreement(
+                SurrogateModel(surrogate_spec), calibrated_model, X_all.loc[X_test.index], y_test.to_numpy(),
+                expand_price_grids, teacher_input, random_state,
+            )
+        agreement = surrogate_spec['agreement']
+        print(f"   Согласие с моделью: MAE {agreement['mae']:.4f}, p95 {agreement['p95_abs_error']:.4f}, "
+              f"совпадение зон {agreement['zone_agreement'] * 100:.1f}%")
+        if 'roc_auc' in agreement:
+            print(f"   ROC-AUC суррогата: {agreement['roc_auc']:.4f} (модель: {agreement['teacher_roc_auc']:.4f})")
+        problems = agreement_problems(agreement)
+        if problems:
+            print(f"[WARN] Суррогат расходится с моделью ({'; '.join(problems)}): "
+                  f"{SURROGATE_FILENAME} не сохраняется, быстрого пути у этой модели не будет")
+            surrogate_spec = None
+    
     print("\n🔝 Топ-10 важных признаков:")
     feature_importance = pd.DataFrame({
         'feature': X.columns,
@@ -801,29 +1147,99 @@ def train_model(train_path="simple-train.csv", use_gpu=False, test_size=0.2, ran
         print(f"   {row['feature']:30s} {row['importance']:.4f}")
     
     print("\n💾 Сохранение модели...")
-    joblib.dump(calibrated_model, "model_enhanced.joblib")
+    joblib.dump(calibrated_model, artifact("model_enhanced.joblib"))
     print("   ✓ Модель сохранена: model_enhanced.joblib")
     
-    joblib.dump(X.columns.tolist(), "feature_names.joblib")
+    joblib.dump(X.columns.tolist(), artifact("feature_names.joblib"))
     print("   ✓ Признаки сохранены: feature_names.joblib")
     
+    stats_path = save_feature_stats(feature_stats, artifact("model_enhanced.joblib"))
+    print(f"   ✓ Статистики признаков сохранены: {os.path.basename(stats_path)}")
+    
+    if surrogate_spec is not None:
+        save_surrogate(surrogate_spec, artifact(SURROGATE_FILENAME))
+        print(f"   ✓ Суррогатная модель: {SURROGATE_FILENAME} ({len(surrogate_spec['weights']) + 1} коэффициентов)")
+    elif os.path.exists(artifact(SURROGATE_FILENAME)):
+        os.remove(artifact(SURROGATE_FILENAME))
+    
+    # Эталон для мониторинга дрейфа: сырые поля отложенной выборки и сигналы рекомендации
+    # на её заказах (X имеет RangeIndex, поэтому индексы X_test — позиции строк в df)
+    with stage('drift_profile'):
+        held_out = df.iloc[X_test.index.to_numpy()]
+        drift_profile = build_reference_profile(
+            held_out, recommendation_signals(held_out, calibrated_model, feature_stats, random_state)
+        )
+        save_reference_profile(drift_profile, artifact(DRIFT_PROFILE_FILENAME))
+    print(f"   ✓ Профиль для мониторинга дрейфа: {DRIFT_PROFILE_FILENAME} "
+          f"({len(drift_profile['numeric']) + len(drift_profile['categorical'])} признаков)")
+    
+    with stage('export_bundle'):
+        manifest = export_model_bundle(
+            calibrated_model, X.columns.tolist(), feature_stats, artifact(BUNDLE_DIRNAME),
+            smoke_features=X_test.head(SMOKE_TEST_ROWS),
+            monotone_price=getattr(calibrated_model, 'monotone_price', None),
+        )
+    print(f"   ✓ Нативный бандл сохранён: {BUNDLE_DIRNAME}/ "
+          f"({bundle_size_bytes(artifact(BUNDLE_DIRNAME)) / 1024:.0f} КБ, sha256 {manifest['content_hash'][:12]})")
+    
+    # Отчёт пишется до публикации, чтобы попасть в каталог версии вместе с моделью
+    save_training_profile(
+        profiler.report(train_path=train_path, rows=int(len(df)), features=int(X.shape[1])),
+        artifact(TRAINING_PROFILE_FILENAME),
+    )
+    
+    if models_dir:
+        version = publish_model_version(models_dir, manifest['content_hash'], source_dir=output_dir)
+        print(f"   ✓ Опубликована версия: {models_dir}/{version} (CURRENT обновлён)")
+    
     print("\n" + "="*70)
     print("✅ ОБУЧЕНИЕ ЗАВЕРШЕНО УСПЕШНО!")
     print("="*70)
     
     return calibrated_model, feature_importance
 
-if __name__ == "__main__":
+def main(argv=None):
+    """Точка входа CLI (python ./src/train_model.py, pricepilot.py train)."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Обучение модели PricePilot")
+    parser.add_argument("--train-path", default="simple-train.csv", help="CSV с обучающими данными")
+    parser.add_argument("--slim", action="store_true", help="Отбор признаков по gain (отчёт: feature_slimming.json)")
+    parser.add_argument("--slim-k", type=int, nargs="+", default=list(DEFAULT_SLIM_K_VALUES),
+                        help="Размеры проверяемых подмножеств признаков")
+    parser.add_argument("--max-auc-drop", type=float, default=DEFAULT_MAX_AUC_DROP,
+                        help="Допустимая потеря ROC-AUC при отборе признаков")
+    parser.add_argument("--no-surrogate", action="store_true", help="Не обучать суррогатную модель быстрого пути")
+    parser.add_argument("--monotone-price", action="store_true",
+                        help="Ограничить модель: вероятность принятия не растёт с ценой")
+    parser.add_argument("--segment",
+                        help="Модель сегмента: class-<класс>, city-<город> или city-<город>.class-<класс> "
+                             "(публикуется в models/segments/<сегмент>/)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Пики памяти Python по этапам через tracemalloc (обучение медленнее)")
+    args = parser.parse_args(argv)
     try:
         model, importance = train_model(
-            train_path="simple-train.csv",
+            train_path=args.train_path,
             use_gpu=False,
             test_size=0.2,
-            random_state=42
+            random_state=42,
+            slim_features=args.slim,
+            slim_k_values=args.slim_k,
+            max_auc_drop=args.max_auc_drop,
+            surrogate=not args.no_surrogate,
+            monotone_price=args.monotone_price,
+            trace_memory=args.trace_memory,
+            segment=args.segment,
         )
         print("\n🎉 Модель готова к использованию!")
+        return 0
         
     except Exception as e:
         print(f"\n❌ Ошибка при обучении: {e}")
         import traceback
         traceback.print_exc()
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+"""atomic_open replaces the target only after a complete write."""
+
+import json
+
+import pytest
+
+from src.atomic_write import TMP_SUFFIX, atomic_open
+
+
+def test_replaces_target_after_write(tmp_path):
+    path = tmp_path / "report.json"
+    path.write_text('{"old": true}', encoding="utf-8")
+
+    with atomic_open(path) as handle:
+        json.dump({"new": True}, handle)
+        # Readers still see the old file until the write completes
+        assert json.loads(path.read_text(encoding="utf-8")) == {"old": True}
+
+    assert json.loads(path.read_text(encoding="utf-8")) == {"new": True}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["report.json"]
+
+
+def test_failed_write_keeps_target_and_removes_temporary(tmp_path):
+    path = tmp_path / "booster.ubj"
+    path.write_bytes(b"old")
+
+    with pytest.raises(RuntimeError):
+        with atomic_open(path, "wb") as handle:
+            handle.write(b"partial")
+            raise RuntimeError("disk full")
+
+    assert path.read_bytes() == b"old"
+    assert not (tmp_path / f"booster.ubj{TMP_SUFFIX}").exists()
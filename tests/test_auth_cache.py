@@ -0,0 +1,66 @@
+"""Verified-token cache: hits skip verification, and a key rotation during verification is not cached."""
+
+import pytest
+from fastapi import HTTPException
+
+from app import auth
+from app.config import settings
+
+
+class RecordingDecode:
+    """jwt.decode that records the key it was given and can run hooks after verifying."""
+
+    def __init__(self, decode):
+        self.decode = decode
+        self.keys = []
+        self.after = []
+
+    def __call__(self, *args, **kwargs):
+        self.keys.append(args[1])
+        payload = self.decode(*args, **kwargs)
+        for hook in self.after:
+            hook()
+        return payload
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    monkeypatch.setattr(settings, "secret_key", "first-key")
+    monkeypatch.setattr(auth, "_TOKEN_CACHE", auth.VerifiedTokenCache(16))
+    recorder = RecordingDecode(auth.jwt.decode)
+    monkeypatch.setattr(auth.jwt, "decode", recorder)
+    return recorder
+
+
+@pytest.fixture
+def token():
+    return auth.create_access_token({"sub": settings.test_user_email})
+
+
+def test_verified_token_is_cached(decodes, token):
+    assert auth._resolve_user(token).email == settings.test_user_email
+    assert auth._resolve_user(token).email == settings.test_user_email
+    assert len(decodes.keys) == 1
+
+
+def test_rotation_during_verification_is_not_cached(decodes, token, monkeypatch):
+    # The key rotates after the token was verified against the old one
+    decodes.after.append(lambda: monkeypatch.setattr(settings, "secret_key", "second-key"))
+    assert auth._resolve_user(token).email == settings.test_user_email
+    decodes.after.clear()
+
+    assert len(auth._TOKEN_CACHE) == 0
+    with pytest.raises(HTTPException) as raised:
+        auth._resolve_user(token)
+    assert raised.value.status_code == 401
+    assert decodes.keys == ["first-key", "second-key"]
+
+
+def test_clear_during_verification_is_not_cached(decodes, token):
+    decodes.after.append(auth.clear_token_cache)
+    auth._resolve_user(token)
+    decodes.after.clear()
+
+    assert len(auth._TOKEN_CACHE) == 0
+    auth._resolve_user(token)
+    assert len(decodes.keys) == 2 and len(auth._TOKEN_CACHE) == 1
@@ -0,0 +1,100 @@
+"""Capture segments rotate by age without traffic, on close, and are gzipped off the writer thread."""
+
+import gzip
+import json
+import threading
+
+import pytest
+
+from app import background, capture, schemas
+
+ORDER = schemas.OrderRequest(
+    order_timestamp=1741000000,
+    distance_in_meters=5200,
+    duration_in_seconds=900,
+    pickup_in_meters=700,
+    pickup_in_seconds=140,
+    driver_rating=4.8,
+    platform="android",
+    price_start_local=180.0,
+)
+
+
+def _segments(directory, pattern="requests-*"):
+    return sorted(directory.glob(pattern))
+
+
+def _lines(path):
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        return handle.read().splitlines()
+
+
+def test_tick_rotates_idle_segment(tmp_path):
+    writer = capture.SegmentWriter(tmp_path / "requests.jsonl", max_bytes=0, max_age_seconds=60)
+    writer.write(["a\n", "b\n"])
+
+    writer.tick()
+    assert _segments(tmp_path) == []
+
+    writer._opened_at -= 60
+    writer.tick()
+    (segment,) = _segments(tmp_path)
+    assert segment.name.endswith(".jsonl.gz")
+    assert _lines(segment) == ["a", "b"]
+    assert not (tmp_path / "requests.jsonl").exists()
+
+
+def test_close_rotates_non_empty_segment(tmp_path):
+    writer = capture.SegmentWriter(tmp_path / "requests.jsonl", max_bytes=0, max_age_seconds=3600)
+    writer.write(["a\n"])
+    writer.close()
+
+    (segment,) = _segments(tmp_path)
+    assert _lines(segment) == ["a"]
+    assert not (tmp_path / "requests.jsonl").exists()
+
+    # Nothing written since: nothing to rotate
+    writer.close()
+    assert len(_segments(tmp_path)) == 1
+
+
+def test_compression_is_handed_off(tmp_path):
+    handed = []
+    writer = capture.SegmentWriter(
+        tmp_path / "requests.jsonl", max_bytes=4, max_age_seconds=0, compressor=handed.append
+    )
+    writer.write(["first\n"])
+    writer.write(["second\n"])
+
+    (closed,) = handed
+    assert closed.suffix == ".jsonl" and closed.read_text(encoding="utf-8") == "first\n"
+    assert _segments(tmp_path, "*.gz") == []
+    assert (tmp_path / "requests.jsonl").read_text(encoding="utf-8") == "second\n"
+    assert capture.compress_segment(closed).exists() and not closed.exists()
+
+
+def test_worker_ticks_while_idle():
+    ticked = threading.Event()
+    worker = background.BoundedWorker("tick-test", lambda batch: None, tick=ticked.set, tick_interval=0.01)
+    worker.start()
+    try:
+        assert ticked.wait(timeout=2.0)
+    finally:
+        worker.stop()
+
+
+def test_capture_close_leaves_only_compressed_segments(tmp_path):
+    writer = capture.SegmentWriter(tmp_path / "requests.jsonl", max_bytes=0, max_age_seconds=3600)
+    recorder = capture.RequestCapture(writer, queue_size=100)
+    try:
+        for latency in (0.01, 0.02, 0.03):
+            assert recorder.record(ORDER, None, latency)
+    finally:
+        recorder.close()
+        background.WORKERS.pop("capture", None)
+        background.WORKERS.pop("capture-compress", None)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [path.name for path in _segments(tmp_path, "*.gz")]
+    (segment,) = _segments(tmp_path)
+    records = [json.loads(line) for line in _lines(segment)]
+    assert [record["response"]["latency_ms"] for record in records] == pytest.approx([10.0, 20.0, 30.0])
@@ -0,0 +1,137 @@
+"""Concurrent identical pricing requests share one computation (app.services single-flight)."""
+
+import asyncio
+import pytest
+
+from app import schemas, services
+from app.config import settings
+
+ORDER = {
+    "order_timestamp": 1741000000,
+    "distance_in_meters": 5200,
+    "duration_in_seconds": 900,
+    "pickup_in_meters": 700,
+    "pickup_in_seconds": 140,
+    "driver_rating": 4.8,
+    "platform": "android",
+    "price_start_local": 180.0,
+    "driver_id": 7,
+}
+WAITERS = 5
+
+
+def _response(start_price):
+    return {
+        "zones": [],
+        "optimal_price": {
+            "price": 250.0,
+            "probability_percent": 60.0,
+            "normalized_probability_percent": 80.0,
+            "expected_value": 150.0,
+            "zone_id": 3,
+            "net_profit": 190.0,
+        },
+        "fuel_economics": {
+            "fuel_cost": 60.0,
+            "fuel_liters": 0.5,
+            "distance_km": 5.2,
+            "fuel_price_per_liter": 60.0,
+            "consumption_per_100km": 9.0,
+            "min_profitable_price": 60.0,
+            "net_profit_from_optimal": 190.0,
+        },
+        "analysis": {
+            "start_price": start_price,
+            "max_probability_percent": 90.0,
+            "max_probability_price": start_price,
+            "scan_range": {"min": start_price, "max": 600.0},
+            "timestamp": "2025-03-03 12:00:00",
+        },
+    }
+
+
+class GatedHandler:
+    """Async ML handler that blocks until released, so every request arrives while it runs."""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+        self.release = None
+
+    async def price(self, order_dict, output_json=False):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return _response(order_dict["price_start_local"])
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    handler = GatedHandler()
+    monkeypatch.setattr(services, "_load_ml_callable", lambda: handler.price)
+    monkeypatch.setattr(services, "_load_fast_callable", lambda: None)
+    monkeypatch.setattr(services, "_shadow_slot", lambda: None)
+    monkeypatch.setattr(services, "_submit_drift_observation", lambda order_dict, response: None)
+    monkeypatch.setattr(settings, "coalesce_enabled", True)
+    monkeypatch.setattr(settings, "ml_allow_stub_fallback", False)
+    monkeypatch.setattr(settings, "default_deadline_ms", None)
+    return handler
+
+
+async def _fire(handler, orders):
+    handler.release = asyncio.Event()
+    tasks = [asyncio.ensure_future(services.call_pricing_model(schemas.OrderRequest(**order))) for order in orders]
+    # Let every request reach the shared computation before it finishes
+    for _ in range(10):
+        await asyncio.sleep(0)
+    handler.release.set()
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_identical_requests_share_one_computation(handler):
+    coalesced_before = services.COALESCED_COUNT
+    results = asyncio.run(_fire(handler, [ORDER] * WAITERS))
+
+    assert handler.calls == 1
+    assert services.COALESCED_COUNT - coalesced_before == WAITERS - 1
+    assert all(isinstance(result, schemas.ModelResponse) for result in results)
+    assert all(result == results[0] for result in results)
+    assert results[0].analysis.start_price == ORDER["price_start_local"]
+    assert services._coalescing == {}
+
+
+def test_error_reaches_every_waiter(handler):
+    handler.error = RuntimeError("model failed")
+    results = asyncio.run(_fire(handler, [ORDER] * WAITERS))
+
+    assert handler.calls == 1
+    assert len(results) == WAITERS
+    assert all(isinstance(result, RuntimeError) and str(result) == "model failed" for result in results)
+    assert services._coalescing == {}
+
+
+def test_different_drivers_are_not_coalesced(handler):
+    orders = [ORDER, {**ORDER, "driver_id": 8}, ORDER]
+    results = asyncio.run(_fire(handler, orders))
+
+    assert handler.calls == 2
+    assert all(isinstance(result, schemas.ModelResponse) for result in results)
+
+
+def test_cancelled_waiter_does_not_cancel_shared_computation(handler):
+    async def scenario():
+        handler.release = asyncio.Event()
+        first = asyncio.ensure_future(services.call_pricing_model(schemas.OrderRequest(**ORDER)))
+        second = asyncio.ensure_future(services.call_pricing_model(schemas.OrderRequest(**ORDER)))
+        for _ in range(10):
+            await asyncio.sleep(0)
+        first.cancel()
+        handler.release.set()
+        return await asyncio.gather(first, second, return_exceptions=True)
+
+    first, second = asyncio.run(scenario())
+
+    assert handler.calls == 1
+    assert isinstance(first, asyncio.CancelledError)
+    assert isinstance(second, schemas.ModelResponse)
@@ -0,0 +1,74 @@
+"""PSI and alert levels of the drift monitor on synthetic unshifted and shifted traffic."""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import drift_monitor as dm
+
+ROWS = 4_000
+
+
+def _orders(rng, rows, distance_shift=1.0, ios_share=0.3):
+    return pd.DataFrame({
+        "distance_in_meters": rng.lognormal(8.3, 0.6, rows) * distance_shift,
+        "duration_in_seconds": rng.lognormal(6.6, 0.5, rows),
+        "pickup_in_meters": rng.uniform(100, 4_000, rows),
+        "pickup_in_seconds": rng.uniform(30, 900, rows),
+        "driver_rating": rng.choice([4.6, 4.8, 5.0], rows),
+        "price_start_local": rng.normal(250, 60, rows),
+        "platform": np.where(rng.random(rows) < ios_share, "ios", "android"),
+    })
+
+
+@pytest.fixture
+def profile_path(tmp_path):
+    profile = dm.build_reference_profile(_orders(np.random.default_rng(0), ROWS))
+    return dm.save_reference_profile(profile, str(tmp_path / dm.DRIFT_PROFILE_FILENAME))
+
+
+def _report(profile_path, live):
+    monitor = dm.DriftMonitor(lambda: ("v1", profile_path), window_seconds=3600.0)
+    for order in live.to_dict("records"):
+        monitor.observe(order)
+    return monitor.report()["features"]
+
+
+def test_unshifted_traffic_stays_stable(profile_path):
+    features = _report(profile_path, _orders(np.random.default_rng(1), 2_000))
+
+    for name in dm.MONITORED_FEATURES + dm.MONITORED_CATEGORIES:
+        assert features[name]["psi"] < dm.PSI_WARNING, name
+        assert features[name]["level"] == "stable"
+
+
+def test_shifted_traffic_raises_alert(profile_path):
+    features = _report(profile_path, _orders(np.random.default_rng(1), 2_000, distance_shift=2.0, ios_share=0.6))
+
+    assert features["distance_in_meters"]["psi"] > dm.PSI_ALERT
+    assert features["distance_in_meters"]["level"] == "alert"
+    assert features["platform"]["level"] in ("warning", "alert")
+    assert features["duration_in_seconds"]["level"] == "stable"
+
+
+def test_psi_needs_minimum_observations(profile_path):
+    features = _report(profile_path, _orders(np.random.default_rng(1), dm.MIN_PSI_OBSERVATIONS - 1, distance_shift=3.0))
+
+    assert features["distance_in_meters"]["psi"] is None
+    assert features["distance_in_meters"]["level"] is None
+
+
+def test_population_stability_index_thresholds():
+    reference = [0.25, 0.25, 0.25, 0.25]
+    assert dm.population_stability_index([250, 250, 250, 250], reference) == pytest.approx(0.0)
+    assert dm.drift_level(dm.population_stability_index([300, 250, 250, 200], reference)) == "stable"
+    assert dm.drift_level(dm.population_stability_index([400, 300, 200, 100], reference)) == "warning"
+    assert dm.drift_level(dm.population_stability_index([700, 200, 80, 20], reference)) == "alert"
+
+
+def test_old_profile_format_is_rejected(tmp_path):
+    path = tmp_path / dm.DRIFT_PROFILE_FILENAME
+    path.write_text(json.dumps({"format_version": 1, "numeric": {}, "categorical": {}}), encoding="utf-8")
+    assert dm.load_reference_profile(str(path)) is None
@@ -0,0 +1,78 @@
+"""Online record_outcome updates must give the same history features as rebuilding the cache from the CSV."""
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.benchmark import generate_synthetic_orders
+from src.build_history_cache import calculate_driver_history, calculate_user_history
+from src.history_store import HistoryStore
+
+CACHED_ROWS = 2_000
+
+
+@pytest.fixture
+def orders(tmp_path):
+    df = generate_synthetic_orders(3_000, seed=11)
+    # Later outcomes also bring users and drivers the cache has never seen
+    later = df.index >= CACHED_ROWS
+    df.loc[later & (df.index % 7 == 0), "user_id"] += 10_000
+    df.loc[later & (df.index % 5 == 0), "driver_id"] += 10_000
+    csv_path = tmp_path / "train.csv"
+    df.to_csv(csv_path, index=False)
+    return pd.read_csv(csv_path)
+
+
+@pytest.fixture
+def store(tmp_path, orders):
+    cached = orders.iloc[:CACHED_ROWS]
+    user_path, driver_path = tmp_path / "user_history.joblib", tmp_path / "driver_history.joblib"
+    joblib.dump(calculate_user_history(cached), user_path)
+    joblib.dump(calculate_driver_history(cached), driver_path)
+    store = HistoryStore(str(user_path), str(driver_path))
+    assert store.load()
+    store.record_outcomes(orders.iloc[CACHED_ROWS:].to_dict("records"))
+    return store
+
+
+def _assert_features_match(actual, expected_row, names):
+    for name in names:
+        assert actual[name] == pytest.approx(float(expected_row[name]), rel=1e-9), name
+
+
+def test_incremental_updates_match_full_rebuild(store, orders):
+    users = calculate_user_history(orders).set_index("user_id")
+    drivers = calculate_driver_history(orders).set_index("driver_id")
+
+    assert set(store.users.rows) == set(users.index)
+    assert set(store.drivers.rows) == set(drivers.index)
+    for user_id, row in users.iterrows():
+        _assert_features_match(store.user_features(user_id), row, store.users.feature_names)
+    for driver_id, row in drivers.iterrows():
+        _assert_features_match(store.driver_features(driver_id), row, store.drivers.feature_names)
+
+
+def test_defaults_for_unknown_ids_match_rebuilt_means(store, orders):
+    users = calculate_user_history(orders)
+    drivers = calculate_driver_history(orders)
+
+    unknown_user = store.user_features(-1)
+    unknown_driver = store.driver_features(-1)
+    for name in store.users.feature_names:
+        assert unknown_user[name] == pytest.approx(users[name].mean(), rel=1e-9), name
+    for name in store.drivers.feature_names:
+        assert unknown_driver[name] == pytest.approx(drivers[name].mean(), rel=1e-9), name
+
+
+def test_snapshot_matches_full_rebuild(store, orders):
+    assert store.snapshot(force=True)
+
+    for path, rebuilt, key in (
+        (store.user_path, calculate_user_history(orders), "user_id"),
+        (store.driver_path, calculate_driver_history(orders), "driver_id"),
+    ):
+        snapshot = joblib.load(path).set_index(key).sort_index()
+        rebuilt = rebuilt.set_index(key).sort_index()
+        assert list(snapshot.columns) == list(rebuilt.columns)
+        np.testing.assert_allclose(snapshot.to_numpy(dtype=float), rebuilt.to_numpy(dtype=float), rtol=1e-9)
@@ -0,0 +1,78 @@
+"""The native bundle must predict exactly what the pickled CalibratedClassifierCV predicts."""
+
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import model_bundle as mb
+from src import train_model as tm
+from src.feature_stats import fit_feature_stats
+
+FEATURES = ["price_increase_pct", "distance_km", "driver_rating", "hour_sin", "user_acceptance_rate"]
+
+
+@pytest.fixture(scope="module")
+def trained(tmp_path_factory):
+    rng = np.random.default_rng(3)
+    rows = 2_000
+    X = pd.DataFrame({
+        "price_increase_pct": rng.uniform(-10, 120, rows),
+        "distance_km": rng.lognormal(1.5, 0.6, rows),
+        "driver_rating": rng.choice([4.2, 4.6, 4.8, 5.0], rows),
+        "hour_sin": np.sin(rng.uniform(0, 2 * np.pi, rows)),
+        "user_acceptance_rate": rng.uniform(0, 1, rows),
+    })
+    logit = 1.5 - 0.04 * X["price_increase_pct"] + 0.1 * X["distance_km"] + 2.0 * (X["user_acceptance_rate"] - 0.5)
+    y = pd.Series((rng.random(rows) < 1 / (1 + np.exp(-logit))).astype(int))
+    train, valid, test = slice(0, 1200), slice(1200, 1600), slice(1600, rows)
+
+    params = dict(n_estimators=200, max_depth=3, learning_rate=0.1, early_stopping_rounds=10, eval_metric="logloss")
+    model = tm._fit_xgboost(params, X[train], y[train], X[valid], y[valid])
+    calibrated = tm._calibrate(model, X[valid], y[valid])
+
+    workdir = tmp_path_factory.mktemp("bundle")
+    joblib_path = str(workdir / "model_enhanced.joblib")
+    joblib.dump(calibrated, joblib_path)
+    bundle_dir = str(workdir / mb.BUNDLE_DIRNAME)
+    stats = fit_feature_stats(X[train])
+    mb.export_model_bundle(calibrated, FEATURES, stats, bundle_dir, smoke_features=X[test].head(8))
+    return joblib_path, bundle_dir, X[test], stats
+
+
+def test_bundle_predictions_match_joblib(trained):
+    joblib_path, bundle_dir, X_test, _ = trained
+    expected = joblib.load(joblib_path).predict_proba(X_test)
+    bundle = mb.load_model_bundle(bundle_dir)
+
+    np.testing.assert_allclose(bundle.predict_proba(X_test), expected, rtol=0, atol=1e-6)
+    # Column order is restored from the manifest
+    shuffled = X_test[FEATURES[::-1]]
+    np.testing.assert_allclose(bundle.predict_proba(shuffled), expected, rtol=0, atol=1e-6)
+
+
+def test_bundle_round_trips_feature_stats_and_smoke_test(trained):
+    joblib_path, bundle_dir, X_test, stats = trained
+    bundle = mb.load_model_bundle(bundle_dir)
+
+    assert bundle.feature_stats["feature_names"] == stats["feature_names"]
+    for key in ("median", "mean", "std", "lower", "upper"):
+        np.testing.assert_array_equal(bundle.feature_stats[key], np.asarray(stats[key], dtype=np.float32))
+    features, reference = bundle.smoke_test
+    np.testing.assert_allclose(bundle.predict_proba(features)[:, 1], reference, rtol=0, atol=1e-6)
+
+
+def test_bundle_rejects_other_format_versions(trained, tmp_path):
+    _, bundle_dir, _, _ = trained
+    for name in os.listdir(bundle_dir):
+        (tmp_path / name).write_bytes(open(os.path.join(bundle_dir, name), "rb").read())
+    manifest_path = tmp_path / mb.MANIFEST_FILENAME
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    manifest["format_version"] = 1
+    manifest_path.write_text(json.dumps(manifest), encoding="utf-8")
+
+    with pytest.raises(ValueError, match="версия бандла"):
+        mb.load_model_bundle(str(tmp_path))
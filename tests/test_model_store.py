@@ -0,0 +1,71 @@
+"""Version publishing: unique names within one second, and pruning that spares served versions."""
+
+from datetime import datetime
+
+import pytest
+
+from src import model_store
+from src.model_store import ModelStore, list_versions, publish_model_version
+
+
+class FrozenDatetime:
+    @staticmethod
+    def now():
+        return datetime(2025, 1, 1, 3, 0, 0)
+
+
+@pytest.fixture
+def source_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_store, "datetime", FrozenDatetime)
+    source = tmp_path / "artifacts"
+    source.mkdir()
+    (source / model_store.MODEL_FILENAME).write_bytes(b"model")
+    return source
+
+
+def _publish(models_dir, source_dir, content_hash="1a2b3c4d5e", keep=5):
+    return publish_model_version(str(models_dir), content_hash, source_dir=str(source_dir), keep=keep)
+
+
+def _current(models_dir):
+    return (models_dir / model_store.CURRENT_FILENAME).read_text(encoding="utf-8").strip()
+
+
+def test_same_second_publishes_get_distinct_names(tmp_path, source_dir):
+    models_dir = tmp_path / "models"
+    names = [_publish(models_dir, source_dir) for _ in range(3)]
+
+    assert names == ["20250101-030000-1a2b3c4d", "20250101-030000-1a2b3c4d-2", "20250101-030000-1a2b3c4d-3"]
+    assert list_versions(str(models_dir)) == names
+    assert _current(models_dir) == names[-1]
+    # No staging directories are left behind
+    assert sorted(p.name for p in models_dir.iterdir()) == sorted(names + [model_store.CURRENT_FILENAME])
+
+
+def test_pruning_keeps_previous_current(tmp_path, source_dir):
+    models_dir = tmp_path / "models"
+    names = [_publish(models_dir, source_dir, content_hash=f"{i:08d}", keep=1) for i in range(3)]
+
+    # keep=1, but the version CURRENT pointed to before the switch may still be serving
+    assert list_versions(str(models_dir)) == names[1:]
+
+
+def test_pinned_version_survives_pruning(tmp_path, source_dir):
+    models_dir = tmp_path / "models"
+    pinned = _publish(models_dir, source_dir, content_hash="00000000")
+    _publish(models_dir, source_dir, content_hash="00000001")
+
+    store = ModelStore(loader=lambda path: (object(), None), models_dir=str(models_dir))
+    assert store.reload(pinned)["status"] == "swapped"
+    assert (models_dir / model_store.PINNED_FILENAME).read_text(encoding="utf-8").strip() == pinned
+
+    for i in range(2, 6):
+        _publish(models_dir, source_dir, content_hash=f"{i:08d}", keep=1)
+    assert pinned in list_versions(str(models_dir))
+
+    # Following CURRENT again releases the pin
+    store.reload()
+    assert not (models_dir / model_store.PINNED_FILENAME).exists()
+    latest = _publish(models_dir, source_dir, content_hash="00000009", keep=1)
+    assert pinned not in list_versions(str(models_dir))
+    assert latest in list_versions(str(models_dir))
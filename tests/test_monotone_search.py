@@ -0,0 +1,96 @@
+"""The monotone boundary search must reproduce the full-grid recommendation."""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+import xgboost as xgb
+
+from src import recommend_price as rp
+from src.train_model import price_monotone_constraints
+
+ORDERS = 40
+
+
+def _order(rng):
+    distance = int(rng.uniform(800, 25_000))
+    duration = int(distance / rng.uniform(5, 11)) + 60
+    pickup = int(rng.uniform(100, 3_000))
+    return {
+        "order_timestamp": int(datetime(2025, 3, 3, int(rng.integers(0, 24)), 15).timestamp()),
+        "distance_in_meters": distance,
+        "duration_in_seconds": duration,
+        "pickup_in_meters": pickup,
+        "pickup_in_seconds": int(pickup / 6) + 20,
+        "driver_rating": float(rng.choice([4.6, 4.8, 5.0])),
+        "platform": str(rng.choice(["android", "ios"])),
+        "price_start_local": float(round(100 + distance / 1000 * 14)),
+        "carname": "LADA",
+        "carmodel": "GRANTA",
+    }
+
+
+class GridOnly:
+    """The same model without the monotone marker: forces the full-grid path."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict_proba(self, features):
+        return self.model.predict_proba(features)
+
+
+@pytest.fixture(scope="module")
+def orders():
+    rng = np.random.default_rng(7)
+    return [_order(rng) for _ in range(ORDERS)]
+
+
+@pytest.fixture(scope="module")
+def monotone_model():
+    """Small XGBoost trained with the price constraints used by train_model --monotone-price."""
+    rng = np.random.default_rng(0)
+    train_orders = [_order(rng) for _ in range(300)]
+    base = rp.build_order_features(train_orders)
+    references = [rp.estimate_reference_price(order) for order in train_orders]
+    grids = [reference * rng.uniform(0.4, 3.0, 20) for reference in references]
+    features = rp.expand_price_grids(base, grids, references)
+    ratio = np.concatenate(grids) / np.repeat(references, 20)
+    distance = np.repeat([order["distance_in_meters"] for order in train_orders], 20) / 10_000
+    labels = rng.random(len(ratio)) < 1 / (1 + np.exp(4.0 * (ratio - 1.3) - distance))
+    model = xgb.XGBClassifier(
+        n_estimators=80, max_depth=4, learning_rate=0.1, tree_method="hist", random_state=0,
+        monotone_constraints=price_monotone_constraints(features.columns),
+    )
+    model.fit(features, labels)
+    model.monotone_price = rp.MONOTONE_DECREASING
+    return model
+
+
+def _zone_edges(result):
+    return {zone["zone_id"]: zone["price_range"] for zone in result["zones"]}
+
+
+def test_monotone_search_matches_full_grid(orders, monotone_model):
+    # Tolerance: zone edges, max_price and the optimum are exact grid points,
+    # so both paths must agree to float precision.
+    monotone = rp.compute_price_curves(orders, monotone_model)
+    grid = rp.compute_price_curves(orders, GridOnly(monotone_model))
+    for order, fast, full in zip(orders, monotone, grid):
+        assert fast["max_price"] == pytest.approx(full["max_price"], abs=1e-9)
+        fast_result = rp.evaluate_strategy(order, fast)
+        full_result = rp.evaluate_strategy(order, full)
+        assert _zone_edges(fast_result) == _zone_edges(full_result)
+        assert fast_result["optimal_price"] == full_result["optimal_price"]
+
+
+def test_monotone_search_evaluates_fewer_points(orders, monotone_model):
+    curves = rp.compute_price_curves(orders, monotone_model)
+    full_cost = rp.COARSE_SCAN_POINTS + 500
+    evaluations = [curve["model_evaluations"] for curve in curves]
+    assert max(evaluations) < full_cost
+    # The optimum is always taken from a real model output
+    for order, curve in zip(orders, curves):
+        price = rp.evaluate_strategy(order, curve)["optimal_price"]["price"]
+        index = int(np.argmin(np.abs(curve["prices"] - price)))
+        assert curve["evaluated"][index]
@@ -0,0 +1,107 @@
+"""Per-client token bucket limiter on a fake clock, and the 429 it produces."""
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app import auth, ratelimit, schemas
+from app.ratelimit import TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_burst_then_limited(clock):
+    limiter = TokenBucketLimiter(rate=2.0, burst=3, clock=clock)
+
+    assert [limiter.acquire("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("a") == pytest.approx(0.5)
+
+
+def test_refill_at_rate_up_to_burst(clock):
+    limiter = TokenBucketLimiter(rate=2.0, burst=3, clock=clock)
+    for _ in range(3):
+        limiter.acquire("a")
+
+    clock.advance(0.25)
+    assert limiter.acquire("a") == pytest.approx(0.25)
+    clock.advance(0.25)
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("a") > 0
+
+    # A long idle period refills to the burst, not beyond it
+    clock.advance(3600)
+    assert [limiter.acquire("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("a") > 0
+
+
+def test_clients_are_isolated(clock):
+    limiter = TokenBucketLimiter(rate=1.0, burst=2, clock=clock)
+    for _ in range(2):
+        limiter.acquire("a")
+
+    assert limiter.acquire("a") > 0
+    assert limiter.acquire("b") == 0.0
+    assert limiter.acquire("b") == 0.0
+    assert limiter.acquire("b") > 0
+
+
+def test_least_recent_client_is_forgotten(clock):
+    limiter = TokenBucketLimiter(rate=1.0, burst=1, max_clients=2, clock=clock)
+    limiter.acquire("a")
+    limiter.acquire("b")
+    limiter.acquire("c")
+
+    assert len(limiter) == 2
+    assert limiter.acquire("b") > 0
+    # "a" was evicted and comes back with a full bucket
+    assert limiter.acquire("a") == 0.0
+
+
+def test_zero_rate_disables_limit(clock):
+    limiter = TokenBucketLimiter(rate=0.0, burst=1, clock=clock)
+    assert all(limiter.acquire("a") == 0.0 for _ in range(100))
+
+
+@pytest.fixture
+def client(monkeypatch, clock):
+    monkeypatch.setattr(ratelimit, "LIMITER", TokenBucketLimiter(rate=0.4, burst=2, clock=clock))
+    app = FastAPI()
+
+    @app.get("/priced")
+    async def priced(user: schemas.User = Depends(ratelimit.rate_limited_user)):
+        return {"user": user.email}
+
+    users = iter(["alice@example.com"] * 3 + ["bob@example.com"] + ["alice@example.com"] * 10)
+    app.dependency_overrides[auth.get_current_user] = lambda: schemas.User(email=next(users))
+    return TestClient(app)
+
+
+def test_exhausted_client_gets_429_with_retry_after(client, clock):
+    assert client.get("/priced").status_code == 200
+    assert client.get("/priced").status_code == 200
+
+    limited = client.get("/priced")
+    assert limited.status_code == 429
+    # One token at 0.4/s takes 2.5 s; Retry-After is rounded up to whole seconds
+    assert limited.headers["Retry-After"] == "3"
+
+    # Another client is not affected
+    assert client.get("/priced").json() == {"user": "bob@example.com"}
+
+    clock.advance(2.5)
+    assert client.get("/priced").status_code == 200
+    assert client.get("/priced").status_code == 429
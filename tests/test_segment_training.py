@@ -0,0 +1,38 @@
+"""Segment training writes into its own build directory without leaving the working directory."""
+
+import os
+
+import joblib
+
+from scripts.benchmark import generate_synthetic_orders
+from src import recommend_price
+from src import train_model as tm
+from src.build_history_cache import calculate_driver_history, calculate_user_history
+from src.history_store import HistoryStore
+from src.model_store import CURRENT_FILENAME, list_versions
+
+
+def test_segment_artifacts_and_history_cache(tmp_path, monkeypatch):
+    df = generate_synthetic_orders(3_000, seed=5)
+    df["city"] = "Kazan"
+    df.to_csv(tmp_path / "train.csv", index=False)
+    joblib.dump(calculate_user_history(df), tmp_path / "user_history.joblib")
+    joblib.dump(calculate_driver_history(df), tmp_path / "driver_history.joblib")
+
+    monkeypatch.chdir(tmp_path)
+    # Default relative paths: the cache is only found if training stays in this directory
+    store = HistoryStore()
+    monkeypatch.setattr(recommend_price, "HISTORY_STORE", store)
+
+    tm.train_model("train.csv", segment="city-kazan", surrogate=False)
+
+    assert os.getcwd() == str(tmp_path)
+    assert store.users.rows and store.drivers.rows
+    assert not (tmp_path / "model_enhanced.joblib").exists()
+
+    segment_dir = tmp_path / "models" / "segments" / "city-kazan"
+    assert (segment_dir / ".build" / "model_enhanced.joblib").exists()
+    (version,) = list_versions(str(segment_dir))
+    assert (segment_dir / CURRENT_FILENAME).read_text(encoding="utf-8").strip() == version
+    published = sorted(path.name for path in (segment_dir / version).iterdir())
+    assert {"model_enhanced.joblib", "feature_stats.joblib", "model_bundle", "drift_profile.json"} <= set(published)
@@ -0,0 +1,102 @@
+"""Surrogate export gate and degraded marking of fast-path responses."""
+
+import asyncio
+import os
+import threading
+
+import pytest
+
+from app import schemas, services
+from app.config import settings
+from src import recommend_price as rp
+from src import surrogate as sg
+
+ORDER = {
+    "order_timestamp": 1741000000,
+    "distance_in_meters": 5200,
+    "duration_in_seconds": 900,
+    "pickup_in_meters": 700,
+    "pickup_in_seconds": 140,
+    "driver_rating": 4.8,
+    "platform": "android",
+    "price_start_local": 180.0,
+}
+GOOD_AGREEMENT = {"mae": 0.01, "p95_abs_error": 0.03, "max_abs_error": 0.08, "zone_agreement": 0.95}
+
+
+def _spec(agreement):
+    knots = [0.0, 50.0]
+    weights = {name: 0.0 for name in sg._weight_names(knots)}
+    weights["price_increase_pct"] = -0.02
+    return {
+        "format_version": sg.SURROGATE_FORMAT_VERSION,
+        "knots": knots,
+        "pct_range": [-50.0, 200.0],
+        "intercept": 1.0,
+        "weights": weights,
+        "agreement": agreement,
+    }
+
+
+@pytest.mark.parametrize("agreement", [
+    {**GOOD_AGREEMENT, "zone_agreement": sg.MIN_ZONE_AGREEMENT - 0.01},
+    {**GOOD_AGREEMENT, "p95_abs_error": sg.MAX_P95_ABS_ERROR + 0.01},
+    None,
+])
+def test_save_refuses_surrogate_below_agreement_threshold(tmp_path, agreement):
+    path = tmp_path / sg.SURROGATE_FILENAME
+    with pytest.raises(ValueError):
+        sg.save_surrogate(_spec(agreement), str(path))
+    assert not path.exists()
+    assert not os.listdir(tmp_path)
+
+
+def test_save_accepts_agreeing_surrogate(tmp_path):
+    path = tmp_path / sg.SURROGATE_FILENAME
+    sg.save_surrogate(_spec(GOOD_AGREEMENT), str(path))
+    assert sg.load_surrogate(str(path)) is not None
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    sg.save_surrogate(_spec(GOOD_AGREEMENT), str(tmp_path / sg.SURROGATE_FILENAME))
+    yield str(tmp_path / "model_enhanced.joblib")
+    rp._SURROGATE_CACHE.pop(str(tmp_path), None)
+
+
+def test_recommend_price_fast_is_marked_degraded(model_path):
+    result = rp.recommend_price_fast(dict(ORDER), output_json=False, model_path=model_path)
+    analysis = result["analysis"]
+    assert analysis["model_kind"] == "surrogate"
+    assert analysis["degraded"] is True
+    assert analysis["degraded_reason"] == "surrogate"
+
+
+@pytest.fixture
+def service(monkeypatch, model_path):
+    threads = []
+
+    def fast(order_dict, output_json=False):
+        threads.append(threading.get_ident())
+        return rp.recommend_price_fast(order_dict, output_json=output_json, model_path=model_path)
+
+    def failing(order_dict, output_json=False):
+        raise RuntimeError("model failed")
+
+    monkeypatch.setattr(services, "_load_ml_callable", lambda: failing)
+    monkeypatch.setattr(services, "_load_fast_callable", lambda: fast)
+    monkeypatch.setattr(services, "_shadow_slot", lambda: None)
+    monkeypatch.setattr(services, "_submit_drift_observation", lambda order_dict, response: None)
+    monkeypatch.setattr(settings, "ml_allow_stub_fallback", False)
+    monkeypatch.setattr(settings, "default_deadline_ms", None)
+    return threads
+
+
+@pytest.mark.parametrize("fast,reason", [(True, "surrogate"), (False, "fallback")])
+def test_service_fast_path_runs_in_executor_and_is_degraded(service, fast, reason):
+    loop_thread = threading.get_ident()
+    response = asyncio.run(services.call_pricing_model(schemas.OrderRequest(**ORDER), fast=fast))
+
+    assert response.analysis.degraded is True
+    assert response.analysis.degraded_reason == reason
+    assert service and all(thread != loop_thread for thread in service)
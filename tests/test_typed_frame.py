@@ -0,0 +1,80 @@
+"""prepare_typed_frame must give the same timestamp features as parsing in every stage did."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.benchmark import generate_synthetic_orders
+from src import train_model as tm
+
+
+@pytest.fixture(scope="module")
+def raw():
+    df = generate_synthetic_orders(300, seed=7)
+    # Pre-1970 registration, future registration, bid before order, missing and garbage stamps
+    df.loc[0, "driver_reg_date"] = "1965-05-01 13:45:10"
+    df.loc[1, "driver_reg_date"] = "2030-01-01 00:00:00"
+    df.loc[2, "tender_timestamp"] = "2024-12-31 23:59:59"
+    df.loc[3, "tender_timestamp"] = None
+    df.loc[4, "order_timestamp"] = "not a date"
+    df.loc[5, "driver_reg_date"] = None
+    df.loc[6, "tender_timestamp"] = str(pd.to_datetime(df.loc[6, "order_timestamp"]) + pd.Timedelta(minutes=9))
+    return df
+
+
+@pytest.fixture(scope="module")
+def legacy(raw):
+    """Per-stage parsing as before the typed frame: pd.to_datetime and timedelta accessors."""
+    order_ts = pd.to_datetime(raw["order_timestamp"], errors="coerce")
+    tender_ts = pd.to_datetime(raw["tender_timestamp"], errors="coerce")
+    driver_reg = pd.to_datetime(raw["driver_reg_date"], errors="coerce")
+    return {
+        "order_ts": order_ts,
+        "tender_ts": tender_ts,
+        "driver_reg": driver_reg,
+        "order_hour": order_ts.dt.hour.astype(float),
+        "order_weekday": order_ts.dt.weekday.astype(float),
+        "order_day": order_ts.dt.day.astype(float),
+        "response_time_seconds": (tender_ts - order_ts).dt.total_seconds(),
+        "driver_experience_days": (order_ts - driver_reg).dt.days.astype(float),
+    }
+
+
+def _assert_same(actual, expected):
+    np.testing.assert_array_equal(np.asarray(actual, dtype=float), np.asarray(expected, dtype=float))
+
+
+def test_typed_columns_match_per_stage_parsing(raw, legacy):
+    typed = tm.prepare_typed_frame(raw)
+
+    for column in ("order_hour", "order_weekday", "order_day", "response_time_seconds", "driver_experience_days"):
+        _assert_same(typed[column], legacy[column])
+    for column, parsed in (("order_ts_s", "order_ts"), ("tender_ts_s", "tender_ts"), ("driver_reg_s", "driver_reg")):
+        missing = legacy[parsed].isna().to_numpy()
+        assert ((typed[column] == tm.MISSING_TS).to_numpy() == missing).all()
+        expected = (legacy[parsed][~missing] - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+        _assert_same(typed[column][~missing], expected)
+
+
+def test_quality_flags_match_per_stage_parsing(raw, legacy):
+    quality = tm.calculate_data_quality_features(tm.prepare_typed_frame(raw))
+    response_time = legacy["response_time_seconds"].fillna(30)
+
+    _assert_same(quality["flag_future_driver"], legacy["driver_reg"] > legacy["order_ts"])
+    _assert_same(quality["flag_future_bid"], legacy["tender_ts"] < legacy["order_ts"])
+    _assert_same(quality["flag_slow_response"], response_time > 300)
+    _assert_same(quality["response_time_score"], np.clip(response_time / 300, 0, 2))
+    assert quality["flag_future_driver"].sum() >= 1 and quality["flag_future_bid"].sum() >= 1
+
+
+def test_raw_features_match_per_stage_parsing(raw, legacy):
+    features = tm.build_raw_features(raw)
+    experience = np.clip(legacy["driver_experience_days"].fillna(365).to_numpy(), 0, 3650)
+    response_time = np.clip(legacy["response_time_seconds"].fillna(30).to_numpy(), 0, 600)
+    day_of_month = legacy["order_day"].fillna(15)
+
+    _assert_same(features["driver_experience_days"], experience)
+    _assert_same(features["is_new_driver"], experience < 30)
+    _assert_same(features["response_time_seconds"], response_time)
+    _assert_same(features["day_of_month"], day_of_month)
+    _assert_same(features["hour_quartile"], legacy["order_hour"].fillna(0) // 6)
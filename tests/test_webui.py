@@ -0,0 +1,117 @@
+"""Static web UI: validators, negotiation headers, HEAD, hashed immutable paths and lookups outside the bundle."""
+
+import re
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.testclient import TestClient
+
+from app import webui
+
+CSS = "body { background: url('/assets/logo.svg'); }\n" * 50
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    static_dir = tmp_path / "static"
+    static_dir.mkdir()
+    (static_dir / "app.css").write_text(CSS, encoding="utf-8")
+    (static_dir / "logo.svg").write_text("<svg></svg>", encoding="utf-8")
+    (tmp_path / "secret.txt").write_text("not an asset", encoding="utf-8")
+    index_file = tmp_path / "index.html"
+    index_file.write_text('<html><head><link href="/assets/app.css"></head></html>', encoding="utf-8")
+    return webui.WebUIBundle(static_dir, index_file)
+
+
+@pytest.fixture
+def client(bundle):
+    # Same routes as app.main, without the model/history startup
+    app = FastAPI()
+
+    @app.api_route("/assets/{asset_path:path}", methods=["GET", "HEAD"])
+    async def serve_asset(asset_path: str, request: Request) -> Response:
+        response = bundle.serve_asset(request, asset_path)
+        if response is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+        return response
+
+    @app.api_route("/", methods=["GET", "HEAD"])
+    async def serve_frontend(request: Request) -> Response:
+        return bundle.serve_index(request)
+
+    return TestClient(app)
+
+
+def _hashed_css_path(client):
+    match = re.search(r"/assets/app\.[0-9a-f]{12}\.css", client.get("/").text)
+    assert match is not None
+    return match.group(0)
+
+
+def test_strong_and_weak_etags_revalidate(client):
+    first = client.get("/assets/app.css", headers={"Accept-Encoding": "identity"})
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and not etag.startswith("W/")
+
+    for tag in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        revalidated = client.get("/assets/app.css", headers={"Accept-Encoding": "identity", "If-None-Match": tag})
+        assert revalidated.status_code == 304, tag
+        assert revalidated.content == b""
+        assert revalidated.headers["ETag"] == etag
+
+    stale = client.get("/assets/app.css", headers={"Accept-Encoding": "identity", "If-None-Match": '"other"'})
+    assert stale.status_code == 200
+
+
+def test_each_encoding_has_its_own_etag_and_varies(client):
+    plain = client.get("/assets/app.css", headers={"Accept-Encoding": "identity"})
+    packed = client.get("/assets/app.css", headers={"Accept-Encoding": "gzip"})
+
+    assert plain.headers["Vary"] == packed.headers["Vary"] == "Accept-Encoding"
+    assert "content-encoding" not in plain.headers
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert plain.headers["ETag"] != packed.headers["ETag"]
+    assert packed.text == plain.text  # httpx decodes gzip
+
+    # A gzip tag does not validate the identity representation
+    cross = client.get("/assets/app.css", headers={"Accept-Encoding": "identity", "If-None-Match": packed.headers["ETag"]})
+    assert cross.status_code == 200
+
+
+def test_head_has_headers_but_no_body(client):
+    get = client.get("/assets/app.css", headers={"Accept-Encoding": "identity"})
+    head = client.head("/assets/app.css", headers={"Accept-Encoding": "identity"})
+
+    assert head.status_code == 200
+    assert head.content == b""
+    assert head.headers["Content-Length"] == str(len(get.content))
+    assert head.headers["ETag"] == get.headers["ETag"]
+
+
+def test_hashed_paths_are_immutable(client):
+    hashed = _hashed_css_path(client)
+
+    response = client.get(hashed)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == webui.IMMUTABLE_CACHE_CONTROL
+    # Hashed URLs are rewritten inside CSS as well
+    assert re.search(r"/assets/logo\.[0-9a-f]{12}\.svg", response.text)
+
+    assert client.get("/assets/app.css").headers["Cache-Control"] == webui.REVALIDATE_CACHE_CONTROL
+    assert client.get("/").headers["Cache-Control"] == webui.REVALIDATE_CACHE_CONTROL
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/assets/../secret.txt",
+        "/assets/%2e%2e/secret.txt",
+        "/assets/..%2fsecret.txt",
+        "/assets/%2e%2e%2f%2e%2e%2fetc%2fpasswd",
+        "/assets/missing.css",
+    ],
+)
+def test_paths_outside_the_bundle_are_404(client, path):
+    response = client.get(path)
+    assert response.status_code == 404
+    assert b"not an asset" not in response.content